@@ -6,16 +6,137 @@ function checkBranch(branch) {
     return true
 }
 
-function forceBranch(branch, categories) {
+// Ask the master to force builds of a branch on every builder of some
+// categories, reporting progress beside the button, then show the branch.
+function forceBranch(branch, categories, button) {
     if (!checkBranch(branch)) {
         return
     }
+    var status = document.getElementById("force-status")
+    if (!status) {
+        status = document.createElement("span")
+        status.id = "force-status"
+        button.parentNode.appendChild(status)
+    }
+    var report = function (text) {
+        status.textContent = " " + text
+    }
+    var failed = function (error) {
+        report("Forcing " + branch + " failed: " + error)
+        button.disabled = false
+    }
+
+    var body = "branch=" + encodeURIComponent(branch)
     for (var i = 0; i < categories.length; i++) {
-        var xhr = new XMLHttpRequest();
-        var query = "?forcescheduler=force-" + escape(categories[i]) + "&branch=" + escape(branch)
-        var path = "builders/_all/forceall"
-        xhr.open("get", path + query, false)
-        xhr.send()
+        body += "&category=" + encodeURIComponent(categories[i])
+    }
+    var xhr = new XMLHttpRequest()
+    xhr.open("post", "force-branch", true)
+    xhr.setRequestHeader("Content-Type", "application/x-www-form-urlencoded")
+    xhr.onload = function () {
+        var result
+        try {
+            result = JSON.parse(xhr.responseText)
+        } catch (e) {
+            failed(xhr.statusText)
+            return
+        }
+        if (xhr.status != 200) {
+            failed(result.error)
+            return
+        }
+        report("Queued " + result.builders.length + " builds of " + branch)
+        window.location = "?branch=" + encodeURIComponent(branch)
+    }
+    xhr.onerror = function () {
+        failed("could not reach the buildmaster")
+    }
+    button.disabled = true
+    report("Forcing " + branch + " on " + categories.join(", ") + "...")
+    xhr.send(body)
+}
+
+function boxCell(box, root) {
+    var cell = document.createElement("td")
+    cell.setAttribute("align", "center")
+    cell.setAttribute("bgcolor", box.color)
+    cell.className = "LastBuild box " + box["class"]
+    var link = document.createElement("a")
+    link.href = root + box.url
+    link.appendChild(document.createTextNode(box.label))
+    cell.appendChild(link)
+    cell.appendChild(document.createElement("br"))
+    for (var i = 0; i < box.text.length; i++) {
+        cell.appendChild(document.createTextNode(box.text[i]))
+        cell.appendChild(document.createElement("br"))
+    }
+    return cell
+}
+
+// The links of the boxes are relative to the root of the web status, and
+// the table knows the way there from the page it is on.
+function updateBoxes(table, builders) {
+    var root = table.getAttribute("data-root") || ""
+    var rows = {}
+    for (var i = 0; i < table.rows.length; i++) {
+        rows[table.rows[i].getAttribute("data-builder")] = table.rows[i]
+    }
+    for (var i = 0; i < builders.length; i++) {
+        var builder = builders[i]
+        var row = rows[builder.name]
+        if (!row) {
+            continue
+        }
+        while (row.cells.length > 1) {
+            row.removeChild(row.cells[1])
+        }
+        row.cells[0].className = "box " + builder.state
+        if (builder.boxes.length == 0) {
+            var cell = document.createElement("td")
+            cell.className = "LastBuild box"
+            cell.appendChild(document.createTextNode("no build"))
+            row.appendChild(cell)
+        }
+        for (var j = 0; j < builder.boxes.length; j++) {
+            row.appendChild(boxCell(builder.boxes[j], root))
+        }
+    }
+}
+
+// Long-poll the json child of the boxes page, which responds when the
+// boxes change, and update the table in place.
+function watchBoxes(table, version) {
+    var path = window.location.pathname.replace(/\/$/, "") + "/json"
+    var query = window.location.search
+    if (version !== null && version !== "") {
+        query += (query ? "&" : "?") + "version=" + encodeURIComponent(version)
+    }
+    var retry = function () {
+        setTimeout(function () { watchBoxes(table, version) }, 30000)
+    }
+    var xhr = new XMLHttpRequest()
+    xhr.open("get", path + query, true)
+    xhr.onload = function () {
+        if (xhr.status != 200) {
+            retry()
+            return
+        }
+        var boxes = JSON.parse(xhr.responseText)
+        updateBoxes(table, boxes.builders)
+        if (boxes.version === null) {
+            // The server can't tell us about changes, so just refresh.
+            retry()
+        } else {
+            watchBoxes(table, boxes.version)
+        }
     }
-    window.location = "?branch=" + escape(branch)
+    xhr.onerror = retry
+    xhr.send()
 }
+
+window.addEventListener("load", function () {
+    var table = document.getElementById("boxes")
+    if (table) {
+        watchBoxes(table, table.getAttribute("data-version"))
+    }
+})
@@ -13,16 +13,19 @@ from buildbot.steps.slave import RemoveDirectory
 from txbuildbot.pypy import Translate
 
 from twisted_steps import ProcessDocs, ReportPythonModuleVersions, \
-    Trial, RemovePYCs, RemoveTrialTemp, LearnVersion, \
-    SetBuildProperty
+    Trial, ReactorsTrial, PreviousFailuresTrial, RemovePYCs, RemoveTrialTemp, \
+    LearnVersion, SetBuildProperty
 
 from txbuildbot.lint import (
         CheckDocumentation,
         CheckCodesByTwistedChecker,
+        FindChangedModules,
         PyFlakes,
         )
+from txbuildbot.impact import FindImpactedTests, ImpactedTests
 
-TRIAL_FLAGS = ["--reporter=bwverbose"]
+# The timing reporter is bwverbose with each test's duration after it.
+TRIAL_FLAGS = ["--reporter=timing"]
 WARNING_FLAGS = ["--unclean-warnings"]
 FORCEGC_FLAGS = ["--force-gc"]
 
@@ -35,7 +38,14 @@ class TwistedBuild(Build):
 ### work fine with the factory support introduced in 0.8.7. Rather than
 ### change the steps, we will just ignore the warnings for now.
 
-class TwistedTrial(Trial):
+class TwistedTrialMixin:
+    """
+    The settings for running Twisted's own tests with a L{Trial} step.
+
+    The steps are old-style classes, so these have to come before the step
+    class in the bases of a step using them; a subclass of L{TwistedTrial}
+    would find the methods of L{Trial} before those of any other base.
+    """
     tests = "twisted"
     # the Trial in Twisted >=2.1.0 has --recurse on by default, and -to
     # turned into --reporter=bwverbose .
@@ -44,10 +54,30 @@ class TwistedTrial(Trial):
     testpath = None
     trial = "./bin/trial"
 
+class TwistedTrial(TwistedTrialMixin, Trial):
+    pass
+
+class TwistedReactorsTrial(TwistedTrialMixin, ReactorsTrial):
+    pass
+
+class TwistedPreviousFailuresTrial(TwistedTrialMixin, PreviousFailuresTrial):
+    pass
+
 class TwistedBaseFactory(BuildFactory):
     """
     @ivar python: The path to the Python executable to use.  This is a
         list, to allow additional arguments to be passed.
+
+    @ivar trialJobs: The number of trial worker processes to run the tests
+        in, or C{None} to run them in a single process.
+
+    @ivar impactSelection: If true, branch builds run only the tests affected
+        by the branch's changes, as found by L{FindImpactedTests}. They are
+        ordered by the durations recorded by the builder's trial runs, which
+        are only recorded without C{trialJobs}.
+
+    @ivar failuresFirst: If true, the tests which failed in the previous
+        build of the branch are run on their own before the first full run.
     """
     buildClass = TwistedBuild
     # bin/trial expects its parent directory to be named "Twisted": it uses
@@ -55,6 +85,7 @@ class TwistedBaseFactory(BuildFactory):
     workdir = "Twisted"
 
     forceGarbageCollection = False
+    _addedPreviousFailures = False
 
     def _fixPermissions(self, source):
         # Hack for Windows
@@ -70,7 +101,8 @@ class TwistedBaseFactory(BuildFactory):
         source.insert(0, fixPermissions)
 
 
-    def __init__(self, python, source, uncleanWarnings, trialTests=None, trialMode=None):
+    def __init__(self, python, source, uncleanWarnings, trialTests=None, trialMode=None,
+                 trialJobs=None, impactSelection=False, failuresFirst=False):
         if not isinstance(source, list):
             source = [source]
         else:
@@ -90,8 +122,13 @@ class TwistedBaseFactory(BuildFactory):
         self.python = python
         self.uncleanWarnings = uncleanWarnings
         self.trialMode = trialMode
+        self.trialJobs = trialJobs
+        self.impactSelection = impactSelection
+        self.failuresFirst = failuresFirst
         if trialTests is None:
             trialTests = [WithProperties("%(test-case-name:~twisted)s")]
+        if impactSelection:
+            trialTests = ImpactedTests(trialTests)
         self.trialTests = trialTests
 
         self.addStep(
@@ -116,8 +153,11 @@ class TwistedBaseFactory(BuildFactory):
                 ("zope.interface", "zope.interface"),
                 ])
 
+        if impactSelection:
+            self.addStep(FindImpactedTests, python=self.python)
 
-    def addTrialStep(self, **kw):
+
+    def addTrialStep(self, trialClass=TwistedTrial, **kw):
         if self.trialMode is not None:
             trialMode = self.trialMode
         else:
@@ -131,7 +171,14 @@ class TwistedBaseFactory(BuildFactory):
             kw['tests'] = self.trialTests
         if 'python' not in kw:
             kw['python'] = self.python
-        self.addStep(TwistedTrial, trialMode=trialMode, **kw)
+        if 'jobs' not in kw:
+            kw['jobs'] = self.trialJobs
+        if self.failuresFirst and not self._addedPreviousFailures:
+            # Only before the first full run.
+            self._addedPreviousFailures = True
+            self.addStep(TwistedPreviousFailuresTrial, trialMode=trialMode,
+                         python=kw['python'])
+        self.addStep(trialClass, trialMode=trialMode, **kw)
 
 
 
@@ -233,8 +280,9 @@ class FullTwistedBuildFactory(TwistedBaseFactory):
                  runTestsRandomly=False,
                  compileOpts=[], compileOpts2=[],
                  uncleanWarnings=True, trialMode=None,
-                 trialTests=None, buildExtensions=True):
-        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings, trialTests=trialTests, trialMode=trialMode)
+                 trialTests=None, buildExtensions=True, trialJobs=None):
+        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings, trialTests=trialTests, trialMode=trialMode,
+                                    trialJobs=trialJobs)
 
         assert isinstance(compileOpts, list)
         assert isinstance(compileOpts2, list)
@@ -263,8 +311,9 @@ class GoodTwistedBuildFactory(TwistedBaseFactory):
                  compileOpts=[], compileOpts2=[],
                  uncleanWarnings=True,
                  extraTrialArguments={},
-                 forceGarbageCollection=False):
-        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings)
+                 forceGarbageCollection=False, trialJobs=None):
+        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings,
+                                    trialJobs=trialJobs)
         self.forceGarbageCollection = forceGarbageCollection
         if processDocs:
             self.addStep(ProcessDocs)
@@ -284,8 +333,31 @@ class TwistedReactorsBuildFactory(TwistedBaseFactory):
 
     def __init__(self, source, RemovePYCs=RemovePYCs,
                  python="python", compileOpts=[], compileOpts2=[],
-                 reactors=["select"], uncleanWarnings=True):
-        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings)
+                 reactors=["select"], uncleanWarnings=True, trialJobs=None,
+                 parallelReactors=None, cpuLock=None,
+                 cleanBytecodeOnce=False, impactSelection=False,
+                 failuresFirst=False):
+        """
+        @param parallelReactors: if given, run the tests for all the reactors
+            in one step, with up to this many trial processes at once.
+
+        @param cpuLock: a L{SlaveLock} for the slave's CPUs, which the step
+            running the reactors in parallel takes exclusively.
+
+        @param cleanBytecodeOnce: if C{True}, remove the bytecode files once,
+            rather than before the tests for each reactor, so that the later
+            runs can use the modules the earlier ones compiled.
+
+        @param impactSelection: if C{True}, branch builds run only the tests
+            affected by the branch.
+
+        @param failuresFirst: if C{True}, first run the tests which failed in
+            the previous build of the branch.
+        """
+        TwistedBaseFactory.__init__(self, python, source, uncleanWarnings,
+                                    trialJobs=trialJobs,
+                                    impactSelection=impactSelection,
+                                    failuresFirst=failuresFirst)
 
         assert isinstance(compileOpts, list)
         assert isinstance(compileOpts2, list)
@@ -294,8 +366,22 @@ class TwistedReactorsBuildFactory(TwistedBaseFactory):
 
         self.addStep(shell.Compile, command=cmd, warnOnFailure=True)
 
-        for reactor in reactors:
+        if parallelReactors:
+            locks = []
+            if cpuLock is not None:
+                locks = [cpuLock.access('exclusive')]
             self.addStep(RemovePYCs)
+            self.addTrialStep(
+                trialClass=TwistedReactorsTrial, reactors=reactors,
+                parallel=parallelReactors, locks=locks, flunkOnFailure=True,
+                warnOnFailure=False)
+            return
+
+        if cleanBytecodeOnce:
+            self.addStep(RemovePYCs)
+        for reactor in reactors:
+            if not cleanBytecodeOnce:
+                self.addStep(RemovePYCs)
             self.addStep(RemoveTrialTemp, python=self.python)
             self.addTrialStep(
                 name=reactor, reactor=reactor, flunkOnFailure=True,
@@ -966,8 +1052,22 @@ class TwistedPython3Tests(TwistedBaseFactory):
             shell.ShellCommand,
             command=self.python + [ "admin/run-python3-tests" ])
 
+def isBranchBuild(step):
+    """
+    Is the step part of a build of a branch, rather than of trunk?
+
+    This is a module-level function, rather than a lambda, so that the steps
+    which use it compare equal and reconfiguring doesn't restart builders.
+    """
+    return bool(step.getProperty('branch'))
+
 class TwistedCheckerBuildFactory(TwistedBaseFactory):
-    def __init__(self, source, python="python"):
+    def __init__(self, source, python="python", incremental=False, shards=1):
+        """
+        @param incremental: on builds of branches, only check the modules
+            which changed since the trunk revision the branch was merged with.
+        @param shards: number of twistedchecker processes to run at once.
+        """
         # Add twistedchecker Git step first, so got_revision is twisted's
         source = [
             Git(
@@ -980,7 +1080,12 @@ class TwistedCheckerBuildFactory(TwistedBaseFactory):
         ] + source
         TwistedBaseFactory.__init__(self, python, source, False)
 
+        if incremental:
+            self.addStep(FindChangedModules, doStepIf=isBranchBuild)
         self.addStep(CheckCodesByTwistedChecker,
+                     incremental=incremental,
+                     shards=shards,
+                     python=self.python,
                      want_stderr=False,
                      env={"PATH": ["../twistedchecker/bin","${PATH}"],
                           "PYTHONPATH": ["../twistedchecker","${PYTHONPATH}"]})
@@ -990,7 +1095,10 @@ class PyFlakesBuildFactory(TwistedBaseFactory):
     A build factory which just runs PyFlakes over the specified source.
     """
 
-    def __init__(self, source, python="python"):
+    def __init__(self, source, python="python", shards=1):
+        """
+        @param shards: number of pyflakes processes to run at once.
+        """
         TwistedBaseFactory.__init__(self, python, source, False)
 
-        self.addStep(PyFlakes)
+        self.addStep(PyFlakes, shards=shards, python=self.python)
@@ -1,6 +1,7 @@
 # -*- test-case-name: buildbot.test.test_twisted -*-
 
 from twisted.python import log
+from twisted.internet import defer
 
 from buildbot.status import builder
 from buildbot.status.builder import SUCCESS, FAILURE, WARNINGS, SKIPPED
@@ -8,6 +9,14 @@ from buildbot.process.buildstep import LogLineObserver, OutputProgressObserver
 from buildbot.process.buildstep import RemoteShellCommand, BuildStep
 from buildbot.steps.shell import ShellCommand, SetProperty
 
+from txbuildbot.trial import SubunitParser, SubunitObserver, parseTrialOutput
+from txbuildbot.trial import formatSlowestTests, saveTestDurations
+from txbuildbot.trial import workerLogFiles
+from txbuildbot.durations import TestDurationDatabase, moduleDurations
+from txbuildbot.impact import previousBuildsOfBranch, failedTests
+from txbuildbot.postprocess import deferToPostProcessor
+from txbuildbot.slavescript import pythonScript
+
 try:
     import cStringIO
     StringIO = cStringIO
@@ -135,9 +144,16 @@ def countFailedTests(output):
 
 class TrialTestCaseCounter(LogLineObserver):
     _line_re = re.compile(r'^([\w\.]+) \.\.\. \[([^\]]+)\]$')
+    # --reporter=timing follows each test with a line like "(0.013 secs)"
+    _time_re = re.compile(r'^\((\d+\.\d+) secs\)$')
     numTests = 0
     finished = False
 
+    def __init__(self):
+        LogLineObserver.__init__(self)
+        self.durations = []
+        self._lastTest = None
+
     def outLineReceived(self, line):
         # different versions of Twisted emit different per-test lines with
         # the bwverbose reporter.
@@ -152,11 +168,20 @@ class TrialTestCaseCounter(LogLineObserver):
             self.finished = True
             return
 
-        m = self._line_re.search(line.strip())
+        line = line.strip()
+        m = self._line_re.search(line)
         if m:
             testname, result = m.groups()
             self.numTests += 1
             self.step.setProgress('tests', self.numTests)
+            self._lastTest = testname
+            return
+
+        if self._lastTest is not None:
+            m = self._time_re.match(line)
+            if m:
+                self.durations.append((self._lastTest, float(m.group(1))))
+            self._lastTest = None
 
 
 UNSPECIFIED=() # since None is a valid choice
@@ -251,6 +276,9 @@ class Trial(ShellCommand):
     recurse = False
     reactor = None
     randomly = False
+    subunit = False
+    jobs = None
+    slowestTests = 100
     tests = None # required
 
     def __init__(self, reactor=UNSPECIFIED, python=None, trial=None,
@@ -258,6 +286,7 @@ class Trial(ShellCommand):
                  tests=None, testChanges=None,
                  recurse=None, randomly=None,
                  trialMode=None, trialArgs=None,
+                 subunit=None, jobs=None,
                  **kwargs):
         """
         @type  testpath: string
@@ -326,6 +355,18 @@ class Trial(ShellCommand):
                          (like failing to make registerAdapter calls before
                          lookups are done).
 
+        @type  subunit: boolean
+        @param subunit: if True, run trial with --reporter=subunit instead of
+                        'trialMode', and work out the results from the subunit
+                        stream as it arrives, rather than from the
+                        human-readable summary at the end of the output.
+
+        @type  jobs: int
+        @param jobs: if more than 1, pass --jobs to trial to run the tests in
+                     that many worker processes (which needs Twisted 12.3 or
+                     newer). The test.log of each worker is added as a log
+                     of the step.
+
         @type  kwargs: dict
         @param kwargs: parameters. The following parameters are inherited from
                        L{ShellCommand} and may be useful to set: workdir,
@@ -334,6 +375,12 @@ class Trial(ShellCommand):
                        timeout.
         """
         ShellCommand.__init__(self, **kwargs)
+        self.addFactoryArguments(reactor=reactor, python=python, trial=trial,
+                                 testpath=testpath, tests=tests,
+                                 testChanges=testChanges, recurse=recurse,
+                                 randomly=randomly, trialMode=trialMode,
+                                 trialArgs=trialArgs, subunit=subunit,
+                                 jobs=jobs)
         self.workdir = self.remote_kwargs['workdir']
 
         if python:
@@ -384,19 +431,33 @@ class Trial(ShellCommand):
             self.recurse = recurse
         if randomly is not None:
             self.randomly = randomly
+        if subunit is not None:
+            self.subunit = subunit
+        if jobs is not None:
+            self.jobs = jobs
 
         # build up most of the command, then stash it until start()
         command = []
         if self.python:
             command.extend(self.python)
         command.append(self.trial)
-        command.extend(self.trialMode)
+        if self.subunit:
+            # Only replace the reporter, keeping flags like --unclean-warnings.
+            command.append("--reporter=subunit")
+            command.extend([arg for arg in self.trialMode
+                            if not arg.startswith("--reporter=")])
+        else:
+            command.extend(self.trialMode)
         if self.recurse:
             command.append("--recurse")
         if self.reactor:
             command.append("--reactor=%s" % reactor)
         if self.randomly:
             command.append("--random=0")
+        if self.jobs and self.jobs > 1:
+            command.append("--jobs=%d" % (self.jobs,))
+            self.logfiles = dict(self.logfiles)
+            self.logfiles.update(workerLogFiles(self.jobs))
         command.extend(self.trialArgs)
         self.command = command
 
@@ -409,7 +470,12 @@ class Trial(ShellCommand):
             self.descriptionDone = ["tests"]
 
         # this counter will feed Progress along the 'test cases' metric
-        self.addLogObserver('stdio', TrialTestCaseCounter())
+        if self.subunit:
+            self.subunitObserver = SubunitObserver(SubunitParser())
+            self.addLogObserver('stdio', self.subunitObserver)
+        else:
+            self.testCounter = TrialTestCaseCounter()
+            self.addLogObserver('stdio', self.testCounter)
         # this one just measures bytes of output in _trial_temp/test.log
         self.addLogObserver('test.log', OutputProgressObserver('test.log'))
 
@@ -476,9 +542,11 @@ class Trial(ShellCommand):
         d.addCallback(lambda res: self._gotTestDotLog(cmd))
         return d
 
-    def rtext(self, fmt='%s'):
-        if self.reactor:
-            rtext = fmt % self.reactor
+    def rtext(self, fmt='%s', reactor=None):
+        if reactor is None:
+            reactor = self.reactor
+        if reactor:
+            rtext = fmt % reactor
             return rtext.replace("reactor", "")
         return ""
 
@@ -488,16 +556,38 @@ class Trial(ShellCommand):
 
         # 'cmd' is the original trial command, so cmd.logs['stdio'] is the
         # trial output. We don't have access to test.log from here.
-        output = cmd.logs['stdio'].getText()
-        counts = countFailedTests(output)
+        if self.subunit:
+            self.subunitObserver.finish()
+            counts = self.subunitObserver.parser.getCounts()
+        else:
+            output = cmd.logs['stdio'].getText()
+            counts = countFailedTests(output)
 
+        results, text, text2 = self.describeCounts(counts, cmd.rc,
+                                                   self.reactor)
+        self.results = results
+        self.text = text
+        self.text2 = [text2]
+
+    def describeCounts(self, counts, rc, reactor):
+        """
+        Work out the result and the status text of a trial run.
+
+        @param counts: the number of tests with each outcome, as returned by
+            L{countFailedTests}
+        @param rc: the exit code of trial
+        @param reactor: the reactor the tests ran with, or C{None}
+
+        @return: a tuple of the result, the list of words for the step's text
+            and the string for the build's text
+        """
         total = counts['total']
         failures, errors = counts['failures'], counts['errors']
         parsed = (total != None)
         text = []
         text2 = ""
 
-        if cmd.rc == 0:
+        if rc == 0:
             if parsed:
                 results = SUCCESS
                 if total:
@@ -553,14 +643,12 @@ class Trial(ShellCommand):
                 if not text2:
                     text2 = "tests"
 
-        if self.reactor:
-            text.append(self.rtext('(%s)'))
+        if reactor:
+            text.append(self.rtext('(%s)', reactor))
             if text2:
-                text2 = "%s %s" % (text2, self.rtext('(%s)'))
+                text2 = "%s %s" % (text2, self.rtext('(%s)', reactor))
 
-        self.results = results
-        self.text = text
-        self.text2 = [text2]
+        return results, text, text2
 
     def addTestResult(self, testname, results, text, tlog):
         if self.reactor is not None:
@@ -569,88 +657,116 @@ class Trial(ShellCommand):
         #self.step_status.build.addTestResult(tr)
         self.build.build_status.addTestResult(tr)
 
+    def getDurations(self):
+        """
+        @return: L{list} of C{(testId, seconds)} for each test whose duration
+            was reported. Only trial's timing reporter reports durations:
+            its subunit reporter doesn't write the C{time:} lines they would
+            be worked out from, so none are reported in subunit mode.
+        """
+        if self.subunit:
+            return []
+        return self.testCounter.durations
+
+    def getDurationRuns(self):
+        """
+        @return: L{list} of C{(reactor, durations)} for each trial run of the
+            step, as C{durations} are returned by L{getDurations}. The
+            C{reactor} is C{None} for a step which runs trial once.
+        """
+        return [(None, self.getDurations())]
+
+    def reportDurations(self):
+        """
+        Add a log of the slowest tests, save the duration of every test
+        alongside the builder's build pickles, and record the duration of
+        each test module in the master's L{TestDurationDatabase}.
+
+        Each trial run of the step is reported on its own, so that a test
+        run under several reactors is neither listed several times nor
+        counted several times in its module's duration.
+
+        Nothing is reported for runs with several workers: trial's
+        DistReporter replays each test's startTest just before its stopTest,
+        so the timing reporter says every test took no time at all.
+
+        @return: a L{Deferred} firing once the durations are recorded
+        """
+        if self.jobs and self.jobs > 1:
+            return defer.succeed(None)
+        return defer.gatherResults([
+            self._reportRunDurations(reactor, durations)
+            for reactor, durations in self.getDurationRuns()])
+
+    def _reportRunDurations(self, reactor, durations):
+        if not durations:
+            return defer.succeed(None)
+        if reactor is None:
+            logName, stepName = "slowest tests", self.name
+        else:
+            logName = "slowest tests (%s)" % (reactor,)
+            stepName = "%s-%s" % (self.name, reactor)
+        self.addCompleteLog(logName,
+                            formatSlowestTests(durations, self.slowestTests))
+        status = self.build.build_status
+        builder = status.getBuilder()
+        try:
+            saveTestDurations(builder.basedir, status.getNumber(),
+                              stepName, durations)
+        except (IOError, OSError):
+            log.err(None, "Failed to save test durations")
+        database = TestDurationDatabase.forBuilder(builder)
+        d = deferToPostProcessor(database.record, builder.getName(),
+                                 status.getNumber(), stepName,
+                                 moduleDurations(durations))
+        d.addErrback(log.err, "Failed to record test durations")
+        return d
+
     def createSummary(self, loog):
-        output = loog.getText()
-        problems = ""
-        sio = StringIO.StringIO(output)
-        warnings = {}
-        while 1:
-            line = sio.readline()
-            if line == "":
-                break
-            if line.find(" exceptions.DeprecationWarning: ") != -1:
-                # no source
-                warning = line # TODO: consider stripping basedir prefix here
-                warnings[warning] = warnings.get(warning, 0) + 1
-            elif (line.find(" DeprecationWarning: ") != -1 or
-                line.find(" UserWarning: ") != -1):
-                # next line is the source
-                warning = line + sio.readline()
-                warnings[warning] = warnings.get(warning, 0) + 1
-            elif line.find("Warning: ") != -1:
-                warning = line
-                warnings[warning] = warnings.get(warning, 0) + 1
-
-            if line.find("=" * 60) == 0 or line.find("-" * 60) == 0:
-                problems += line
-                problems += sio.read()
-                break
+        d = self.reportDurations()
+        if self.subunit:
+            d.addCallback(lambda ignored: self._summarizeSubunit())
+            return d
+        d.addCallback(lambda ignored: deferToPostProcessor(parseTrialOutput,
+                                                           loog.getText()))
+        d.addCallback(self._gotProblems)
+        return d
 
+    def _gotProblems(self, parsed):
+        problems, warnings, tests = parsed
         if problems:
             self.addCompleteLog("problems", problems)
-            # now parse the problems for per-test results
-            pio = StringIO.StringIO(problems)
-            pio.readline() # eat the first separator line
-            testname = None
-            done = False
-            while not done:
-                while 1:
-                    line = pio.readline()
-                    if line == "":
-                        done = True
-                        break
-                    if line.find("=" * 60) == 0:
-                        break
-                    if line.find("-" * 60) == 0:
-                        # the last case has --- as a separator before the
-                        # summary counts are printed
-                        done = True
-                        break
-                    if testname is None:
-                        # the first line after the === is like:
-# EXPECTED FAILURE: testLackOfTB (twisted.test.test_failure.FailureTestCase)
-# SKIPPED: testRETR (twisted.test.test_ftp.TestFTPServer)
-# FAILURE: testBatchFile (twisted.conch.test.test_sftp.TestOurServerBatchFile)
-                        r = re.search(r'^([^:]+): (\w+) \(([\w\.]+)\)', line)
-                        if not r:
-                            # TODO: cleanup, if there are no problems,
-                            # we hit here
-                            continue
-                        result, name, case = r.groups()
-                        testname = tuple(case.split(".") + [name])
-                        results = {'SKIPPED': SKIPPED,
-                                   'EXPECTED FAILURE': SUCCESS,
-                                   'UNEXPECTED SUCCESS': WARNINGS,
-                                   'FAILURE': FAILURE,
-                                   'ERROR': FAILURE,
-                                   'SUCCESS': SUCCESS, # not reported
-                                   }.get(result, WARNINGS)
-                        text = result.lower().split()
-                        loog = line
-                        # the next line is all dashes
-                        loog += pio.readline()
-                    else:
-                        # the rest goes into the log
-                        loog += line
-                if testname:
-                    self.addTestResult(testname, results, text, loog)
-                    testname = None
+            # now add the per-test results
+            for testname, results, text, testLog in tests:
+                self.addTestResult(testname, results, text, testLog)
 
         if warnings:
             lines = warnings.keys()
             lines.sort()
             self.addCompleteLog("warnings", "".join(lines))
 
+    def _summarizeSubunit(self):
+        """
+        Add a test result and a 'problems' log entry for every test that
+        didn't succeed, from the subunit stream.
+        """
+        parser = self.subunitObserver.parser
+        problems = []
+        for result in parser.results:
+            if result.outcome == 'success':
+                continue
+            status = parser.getStatus(result.outcome)
+            heading = "%s: %s" % (result.outcome.upper(), result.testId)
+            if result.duration is not None:
+                heading += " (%.3fs)" % (result.duration,)
+            entry = "%s\n%s\n%s" % (heading, "-" * 79, result.details)
+            problems.append(entry)
+            self.addTestResult(tuple(result.testId.split(".")), status,
+                               [result.outcome], entry)
+        if problems:
+            self.addCompleteLog("problems", "".join([
+                "=" * 79 + "\n" + entry for entry in problems]))
+
     def evaluateCommand(self, cmd):
         return self.results
 
@@ -659,6 +775,190 @@ class Trial(ShellCommand):
     def getText2(self, cmd, results):
         return self.text2
 
+
+class PreviousFailuresTrial(Trial):
+    """
+    I run just the tests which failed in the previous build of the same
+    branch on this builder, so that whether they have been fixed is known
+    before the whole suite has run. If there were no failures, I am skipped.
+
+    Failing again only makes me WARNINGS: the full run after me decides the
+    result of the build. For the same reason I don't record any test results,
+    which the next build would otherwise take for those of the full run.
+    """
+
+    name = "trial-previous-failures"
+    flunkOnFailure = False
+    warnOnFailure = True
+    # More failures than this are probably not going to be fixed one by one.
+    maxTests = 200
+    package = "twisted"
+
+    def start(self):
+        previous = list(previousBuildsOfBranch(self.build.build_status, 1, 50))
+        if not previous:
+            return SKIPPED
+        failed = failedTests(previous[0], self.package)
+        if not failed or len(failed) > self.maxTests:
+            return SKIPPED
+        self.tests = sorted(failed)
+        return Trial.start(self)
+
+    def createSummary(self, loog):
+        # Don't record these durations, which the full run records too.
+        d = deferToPostProcessor(parseTrialOutput, loog.getText())
+        d.addCallback(self._gotProblems)
+        return d
+
+    def addTestResult(self, testname, results, text, tlog):
+        pass
+
+
+class ReactorsTrial(Trial):
+    """
+    I run the tests once for each of several reactors, running up to
+    'parallel' of the trial processes at once.
+
+    Each trial process uses its own temp directory, _trial_temp-REACTOR, and
+    writes its output to _trial_temp-REACTOR.out next to it. Those files are
+    pulled up to the master as the 'stdio (REACTOR)' and 'test.log (REACTOR)'
+    logs, and each reactor gets its own results, just like the separate
+    Trial steps for each reactor would. With 'jobs', the logs of each
+    reactor's workers are pulled up from its temp directory as
+    'test.log-N (REACTOR)'.
+
+    The script which starts the processes is run with 'python', so that has
+    to be given (as it is for Twisted's own bin/trial).
+    """
+
+    name = "trial-reactors"
+    progressMetrics = ('output', 'tests')
+
+    # Arguments: how many processes to run at once, the number of reactors,
+    # the number of words of the command before trial's options, the
+    # reactors, then the trial command.
+    launcherSource = (
+        "import sys, time, subprocess\n"
+        "parallel, count, prefix = map(int, sys.argv[1:4])\n"
+        "reactors = sys.argv[4:4 + count]\n"
+        "command = sys.argv[4 + count:]\n"
+        "running = {}\n"
+        "rc = 0\n"
+        "while reactors or running:\n"
+        "    while reactors and len(running) < parallel:\n"
+        "        reactor = reactors.pop(0)\n"
+        "        temp = '_trial_temp-' + reactor\n"
+        "        out = open(temp + '.out', 'w')\n"
+        "        running[reactor] = subprocess.Popen(\n"
+        "            command[:prefix] + ['--reactor=' + reactor,\n"
+        "                               '--temp-directory=' + temp] +\n"
+        "            command[prefix:], stdout=out, stderr=subprocess.STDOUT)\n"
+        "        out.close()\n"
+        "        print 'Started', reactor\n"
+        "        sys.stdout.flush()\n"
+        "    for reactor, process in running.items():\n"
+        "        if process.poll() is not None:\n"
+        "            del running[reactor]\n"
+        "            print 'Finished %s: exit code %d' % (\n"
+        "                reactor, process.returncode)\n"
+        "            sys.stdout.flush()\n"
+        "            rc = rc or process.returncode\n"
+        "    time.sleep(1)\n"
+        "sys.exit(rc)\n")
+
+    _finished_re = re.compile(r'^Finished (\S+): exit code (-?\d+)$', re.M)
+
+    def __init__(self, reactors, parallel=None, **kwargs):
+        """
+        @type  reactors: list of strings
+        @param reactors: the reactors to run the tests with
+
+        @type  parallel: int
+        @param parallel: the most trial processes to run at once. Defaults to
+                         one for every reactor.
+        """
+        kwargs['subunit'] = False
+        Trial.__init__(self, **kwargs)
+        self.addFactoryArguments(reactors=reactors, parallel=parallel)
+        self.reactors = list(reactors)
+        self.parallel = parallel or len(self.reactors)
+        self.description = ["testing", "(%s)" % (", ".join(self.reactors),)]
+
+        # Replace the logs of a single trial process with those of each
+        # reactor's.
+        self.logfiles = {}
+        self.testCounters = {}
+        for reactor in self.reactors:
+            temp = "_trial_temp-%s" % (reactor,)
+            self.logfiles["stdio (%s)" % (reactor,)] = temp + ".out"
+            self.logfiles["test.log (%s)" % (reactor,)] = temp + "/test.log"
+            if self.jobs and self.jobs > 1:
+                self.logfiles.update(
+                    workerLogFiles(self.jobs, temp, " (%s)" % (reactor,)))
+            self.testCounters[reactor] = TrialTestCaseCounter()
+            self.addLogObserver("stdio (%s)" % (reactor,),
+                                self.testCounters[reactor])
+
+    def setProgress(self, metric, value):
+        # Each reactor's counter reports its own count of tests.
+        if metric == 'tests':
+            value = sum([counter.numTests
+                         for counter in self.testCounters.values()])
+        Trial.setProgress(self, metric, value)
+
+    def startCommand(self, cmd, errorMessages=[]):
+        cmd.args['command'] = pythonScript(
+            self.python or ["python"], self.launcherSource,
+            str(self.parallel), str(len(self.reactors)),
+            str(len(self.python or []) + 1),
+            *(self.reactors + list(cmd.args['command'])))
+        return Trial.startCommand(self, cmd, errorMessages)
+
+    def _gotTestDotLog(self, cmd):
+        exitCodes = dict(
+            (reactor, int(rc)) for reactor, rc
+            in self._finished_re.findall(cmd.logs['stdio'].getText()))
+        self.results = SUCCESS
+        self.text = []
+        self.text2 = []
+        for reactor in self.reactors:
+            output = self.getLog("stdio (%s)" % (reactor,)).getText()
+            # A process which never finished has failed.
+            results, text, text2 = self.describeCounts(
+                countFailedTests(output), exitCodes.get(reactor, -1), reactor)
+            self.results = max(self.results, results)
+            self.text.extend(text)
+            if text2:
+                self.text2.append(text2)
+
+    def getDurationRuns(self):
+        return [(reactor, self.testCounters[reactor].durations)
+                for reactor in self.reactors]
+
+    def createSummary(self, loog):
+        d = self.reportDurations()
+        for reactor in self.reactors:
+            d.addCallback(self._parseReactorOutput, reactor)
+        return d
+
+    def _parseReactorOutput(self, ignored, reactor):
+        output = self.getLog("stdio (%s)" % (reactor,)).getText()
+        d = deferToPostProcessor(parseTrialOutput, output)
+        d.addCallback(self._gotReactorProblems, reactor)
+        return d
+
+    def _gotReactorProblems(self, parsed, reactor):
+        problems, warnings, tests = parsed
+        if problems:
+            self.addCompleteLog("problems (%s)" % (reactor,), problems)
+            for testname, results, text, testLog in tests:
+                self.addTestResult((reactor,) + testname, results, text,
+                                   testLog)
+        if warnings:
+            lines = warnings.keys()
+            lines.sort()
+            self.addCompleteLog("warnings (%s)" % (reactor,), "".join(lines))
+
     
 class ProcessDocs(ShellCommand):
     """
@@ -676,8 +976,8 @@ class ProcessDocs(ShellCommand):
     descriptionDone = ["docs"]
     # TODO: track output and time
 
-    def createSummary(self, log):
-        output = log.getText()
+    @staticmethod
+    def findWarnings(output):
         # hlint warnings are of the format: 'WARNING: file:line:col: stuff
         # latex warnings start with "WARNING: LaTeX Warning: stuff", but
         # sometimes wrap around to a second line.
@@ -692,7 +992,14 @@ class ProcessDocs(ShellCommand):
                 wantNext = True
             if wantThis:
                 warningLines.append(line)
+        return warningLines
+
+    def createSummary(self, log):
+        d = deferToPostProcessor(self.findWarnings, log.getText())
+        d.addCallback(self._gotWarnings)
+        return d
 
+    def _gotWarnings(self, warningLines):
         if warningLines:
             self.addCompleteLog("warnings", "\n".join(warningLines) + "\n")
         self.warnings = len(warningLines)
@@ -823,18 +1130,28 @@ class BuildDebs(ShellCommand):
         """
         ShellCommand.__init__(self, **kwargs)
 
-    def commandComplete(self, cmd):
+    @staticmethod
+    def findProblems(output):
         errors, warnings = 0, 0
-        output = cmd.logs['stdio'].getText()
-        summary = ""
+        summary = []
         sio = StringIO.StringIO(output)
         for line in sio.readlines():
             if line.find("E: ") == 0:
-                summary += line
+                summary.append(line)
                 errors += 1
             if line.find("W: ") == 0:
-                summary += line
+                summary.append(line)
                 warnings += 1
+        return "".join(summary), errors, warnings
+
+    def commandComplete(self, cmd):
+        d = deferToPostProcessor(self.findProblems,
+                                 cmd.logs['stdio'].getText())
+        d.addCallback(self._gotProblems)
+        return d
+
+    def _gotProblems(self, found):
+        summary, errors, warnings = found
         if summary:
             self.addCompleteLog("problems", summary)
         self.errors = errors
@@ -901,10 +1218,7 @@ class RemoveTrialTemp(ShellCommand):
 
     def __init__(self, python):
         ShellCommand.__init__(self)
-        self.command = python + [
-            "-c",
-            'exec "%s".decode("hex")' % (self.source.encode('hex'),),
-            "_trial_temp"]
+        self.command = pythonScript(python, self.source, "_trial_temp")
 
 
 class LearnVersion(SetProperty):
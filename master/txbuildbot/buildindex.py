@@ -0,0 +1,194 @@
+"""
+Persistent per-builder indexes of finished builds, so that steps can find
+interesting builds without unpickling every L{BuildStatus} in the history.
+"""
+
+import os
+import glob
+import json
+from operator import itemgetter
+
+from twisted.python import log
+
+from buildbot.status.base import StatusReceiverMultiService
+
+
+
+def readJSON(path, default=None):
+    """
+    Load a JSON document written by L{writeJSON}.
+
+    @type path: L{str}
+    @param path: file to read
+
+    @param default: value to return if the file is missing or unreadable
+
+    @return: the decoded document, or C{default}
+    """
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return default
+    try:
+        try:
+            return json.load(f)
+        except ValueError:
+            log.err(None, "Discarding corrupt index %s" % (path,))
+            return default
+    finally:
+        f.close()
+
+
+
+def writeJSON(path, data):
+    """
+    Atomically replace the contents of C{path} with C{data} encoded as JSON.
+
+    @type path: L{str}
+    @param path: file to write
+
+    @param data: a JSON-serializable object
+    """
+    temporary = path + '.tmp'
+    f = open(temporary, 'wb')
+    try:
+        json.dump(data, f, sort_keys=True, separators=(',', ':'))
+    finally:
+        f.close()
+    os.rename(temporary, path)
+
+
+
+def writeJSONAndPrune(path, data, pattern, keep):
+    """
+    Write C{data} to C{path} with L{writeJSON}, creating its directory if
+    necessary, then remove all but the C{keep} most recently written files in
+    that directory matching C{pattern}.
+
+    @type pattern: L{str}
+    @param pattern: glob pattern matching files like C{path}
+
+    @type keep: L{int}
+    @param keep: number of files to keep
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    writeJSON(path, data)
+    paths = glob.glob(os.path.join(directory, pattern))
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for old in paths[keep:]:
+        os.remove(old)
+
+
+
+class TrunkBuildIndex(object):
+    """
+    A mapping from revision to the number of the most recent finished trunk
+    build of that revision, stored next to a builder's build pickles.
+
+    @ivar path: file the index is stored in
+    @ivar maxEntries: number of revisions to remember; the oldest builds are
+        dropped first.
+    """
+    filename = 'trunk-revisions.json'
+    maxEntries = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._revisions = None
+
+
+    @classmethod
+    def forBuilder(cls, builderStatus):
+        """
+        Get the index for a builder.
+
+        @type builderStatus: L{BuilderStatus}
+        """
+        return cls(os.path.join(builderStatus.basedir, cls.filename))
+
+
+    def _load(self):
+        if self._revisions is None:
+            self._revisions = readJSON(self.path, {})
+        return self._revisions
+
+
+    def lookup(self, revision):
+        """
+        @type revision: L{str}
+        @param revision: revision to look for
+
+        @return: the number of the most recent trunk build of C{revision}, or
+            C{None} if there isn't one
+        """
+        if not revision:
+            return None
+        return self._load().get(revision)
+
+
+    def latest(self):
+        """
+        @return: C{(revision, number)} for the most recent trunk build, or
+            C{None} if the index is empty
+        """
+        revisions = self._load()
+        if not revisions:
+            return None
+        return max(revisions.iteritems(), key=itemgetter(1))
+
+
+    def record(self, revision, number):
+        """
+        Note that build C{number} was a trunk build of C{revision}.
+
+        @type revision: L{str}
+        @type number: L{int}
+        """
+        revisions = self._load()
+        if revisions.get(revision, -1) >= number:
+            return
+        revisions[revision] = number
+        if len(revisions) > self.maxEntries:
+            oldest = sorted(revisions.iteritems(), key=itemgetter(1))
+            for expired, _ in oldest[:len(revisions) - self.maxEntries]:
+                del revisions[expired]
+        writeJSON(self.path, revisions)
+
+
+
+class TrunkBuildIndexer(StatusReceiverMultiService):
+    """
+    Status receiver that keeps each builder's L{TrunkBuildIndex} up to date
+    as builds finish.
+    """
+
+    def setServiceParent(self, parent):
+        StatusReceiverMultiService.setServiceParent(self, parent)
+        self.master_status = self.parent
+        self.master_status.subscribe(self)
+
+
+    def disownServiceParent(self):
+        self.master_status.unsubscribe(self)
+        return StatusReceiverMultiService.disownServiceParent(self)
+
+
+    def builderAdded(self, name, builder):
+        return self
+
+
+    def buildFinished(self, builderName, build, results):
+        properties = build.getProperties()
+        if properties.getProperty('branch'):
+            return
+        revision = properties.getProperty('got_revision')
+        if not revision:
+            return
+        try:
+            TrunkBuildIndex.forBuilder(build.getBuilder()).record(
+                revision, build.getNumber())
+        except (IOError, OSError):
+            log.err(None, "Failed to index build %d of %s" % (
+                build.getNumber(), builderName))
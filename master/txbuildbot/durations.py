@@ -0,0 +1,197 @@
+"""
+A database of how long test modules take to run on each builder.
+
+The Trial steps record the time each test module took after every build, and
+the rolling median of the recent builds is used to order the test modules
+chosen by L{txbuildbot.impact.FindImpactedTests}, and to estimate how long
+running them will take.
+
+The database is an SQLite file in the master's base directory, beside
+C{state.sqlite}. Every method opens its own connection, so they can be called
+from the post-processing threads of L{txbuildbot.postprocess}.
+"""
+
+import os
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+
+
+
+def moduleForTest(testId):
+    """
+    Get the test module a test belongs to.
+
+    @type testId: L{str}
+    @param testId: the id of a test, like
+        C{twisted.test.test_defer.DeferredTests.test_callback}
+
+    @return: the name of the module, like C{twisted.test.test_defer}
+    """
+    parts = testId.rsplit('.', 2)
+    if len(parts) < 3:
+        return testId
+    return parts[0]
+
+
+
+def moduleDurations(durations):
+    """
+    Add up the durations of the tests in each test module.
+
+    @type durations: L{list} of C{(testId, seconds)}
+
+    @return: a L{dict} mapping module names to the total seconds their tests
+        took
+    """
+    modules = {}
+    for testId, seconds in durations:
+        module = moduleForTest(testId)
+        modules[module] = modules.get(module, 0.0) + seconds
+    return modules
+
+
+
+def slowestFirst(medians, modules):
+    """
+    Order test modules so that the slowest run first, which keeps the workers
+    of C{trial --jobs} busy until the end of the run.
+
+    @param medians: the median seconds of each module, as returned by
+        L{TestDurationDatabase.getMedians}
+
+    @param modules: the names of the modules
+
+    @return: a L{list} of the modules, with those without any history first,
+        as they might be the slowest of all, then the slowest first
+    """
+    return sorted(modules,
+                  key=lambda module: (module in medians,
+                                      -medians.get(module, 0.0), module))
+
+
+
+def estimateDuration(medians, modules, default=0.0):
+    """
+    Estimate how long running some test modules will take.
+
+    @param medians: the median seconds of each module, as returned by
+        L{TestDurationDatabase.getMedians}
+
+    @param modules: the names of the modules
+
+    @param default: the seconds to assume for modules without any history
+
+    @return: the estimated number of seconds, or C{None} if none of the
+        modules has any history to estimate from
+    """
+    if not [module for module in modules if module in medians]:
+        return None
+    return sum([medians.get(module, default) for module in modules])
+
+
+
+def _median(values):
+    """
+    @param values: a sorted, non-empty L{list} of numbers
+    """
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+
+class TestDurationDatabase(object):
+    """
+    The durations of test modules in the most recent builds of each builder.
+
+    Each Trial step of a build records its durations separately, so builds
+    which run the tests several times, once for each reactor, have a sample
+    from each run.
+
+    @ivar path: the SQLite database file
+    @ivar window: number of recent builds of a builder that the medians are
+        taken over; older samples are deleted.
+    """
+
+    filename = 'test_durations.sqlite'
+    window = 10
+
+    def __init__(self, path):
+        self.path = path
+
+
+    @classmethod
+    def forBuilder(cls, builderStatus):
+        """
+        Get the database for the master a builder belongs to.
+
+        @type builderStatus: L{BuilderStatus}
+        """
+        masterdir = os.path.dirname(os.path.abspath(builderStatus.basedir))
+        return cls(os.path.join(masterdir, cls.filename))
+
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS module_durations ("
+            " builder TEXT NOT NULL,"
+            " build INTEGER NOT NULL,"
+            " step TEXT NOT NULL,"
+            " module TEXT NOT NULL,"
+            " seconds REAL NOT NULL)")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS module_durations_builder"
+            " ON module_durations (builder, build)")
+        return connection
+
+
+    def record(self, builderName, number, stepName, modules):
+        """
+        Record the durations of the test modules run by a step of a build,
+        replacing anything recorded for that step before, and forget builds
+        which have fallen out of the window.
+
+        @type modules: L{dict} mapping L{str} to L{float}
+        @param modules: the seconds each test module took, as returned by
+            L{moduleDurations}
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM module_durations"
+                    " WHERE builder = ? AND build = ? AND step = ?",
+                    (builderName, number, stepName))
+                connection.executemany(
+                    "INSERT INTO module_durations"
+                    " (builder, build, step, module, seconds)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [(builderName, number, stepName, module, seconds)
+                     for module, seconds in modules.iteritems()])
+                connection.execute(
+                    "DELETE FROM module_durations WHERE builder = ? AND build NOT IN"
+                    " (SELECT DISTINCT build FROM module_durations WHERE builder = ?"
+                    "  ORDER BY build DESC LIMIT ?)",
+                    (builderName, builderName, self.window))
+        finally:
+            connection.close()
+
+
+    def getMedians(self, builderName):
+        """
+        @return: a L{dict} mapping each test module run by the recent builds
+            of C{builderName} to the median of the seconds it took
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT module, seconds FROM module_durations WHERE builder = ?"
+                " ORDER BY module, seconds", (builderName,)).fetchall()
+        finally:
+            connection.close()
+        return dict(
+            (module, _median([seconds for _, seconds in samples]))
+            for module, samples in groupby(rows, itemgetter(0)))
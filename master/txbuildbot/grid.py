@@ -0,0 +1,116 @@
+"""
+A revision by builder matrix of the results of recent builds, kept up to date
+as builds finish, for the grid views of the web status.
+"""
+
+from twisted.python import log
+
+from txbuildbot.buildindex import readJSON, writeJSON
+from txbuildbot.receiver import BuilderWatcher
+from txbuildbot.summaries import summarizeBuild
+
+
+
+class GridModel(BuilderWatcher):
+    """
+    The most recent build of each builder for each of the last few revisions
+    built on each branch.
+
+    Revisions are ordered by when their first build finished, which is nearly
+    always the order they were committed in. Builds on the default branch
+    are kept under C{""}.
+
+    @ivar path: file the model is saved to, or C{None} before L{load}
+    @ivar maxRevisions: number of revisions kept for each branch
+    @ivar maxBranches: number of branches kept; the branch built least
+        recently is dropped first.
+    """
+
+    filename = 'grid.json'
+
+    def __init__(self, maxRevisions=30, maxBranches=50):
+        BuilderWatcher.__init__(self)
+        self.maxRevisions = maxRevisions
+        self.maxBranches = maxBranches
+        self.path = None
+        self._branches = {}
+        self._lastBuilt = []
+
+
+    def load(self, path):
+        """
+        Load the model saved in C{path}, and save it there from now on.
+        """
+        self.path = path
+        saved = readJSON(path, {})
+        self._branches = saved.get('branches', {})
+        self._lastBuilt = saved.get('lastBuilt', [])
+
+
+    def save(self):
+        """
+        Save the model to L{path}.
+        """
+        if self.path is None:
+            return
+        try:
+            writeJSON(self.path, {'branches': self._branches,
+                                  'lastBuilt': self._lastBuilt})
+        except (IOError, OSError):
+            log.err(None, "Failed to save the grid to %s" % (self.path,))
+
+
+    def record(self, builderName, branch, summary):
+        """
+        Put the summary of a finished build in its revision's row, unless a
+        later build of the revision is already there.
+
+        @param summary: the summary returned by L{summarizeBuild}; builds
+            without a revision are ignored.
+        """
+        revision = summary['revision']
+        if not revision:
+            return
+        branch = branch or ""
+        if branch in self._lastBuilt:
+            self._lastBuilt.remove(branch)
+        self._lastBuilt.append(branch)
+        for expired in self._lastBuilt[:-self.maxBranches]:
+            self._branches.pop(expired, None)
+        del self._lastBuilt[:-self.maxBranches]
+
+        rows = self._branches.setdefault(branch, [])
+        for row in rows:
+            if row[0] == revision:
+                break
+        else:
+            row = [revision, {}]
+            rows.append(row)
+            del rows[:-self.maxRevisions]
+        builds = row[1]
+        previous = builds.get(builderName)
+        if previous is None or previous['number'] < summary['number']:
+            builds[builderName] = summary
+
+
+    def getRows(self, branch, count=None):
+        """
+        @param branch: the branch, or C{None} for the default branch
+
+        @param count: number of revisions to return, or C{None} for all of
+            them
+
+        @return: a L{list} of C{(revision, builds)} for the most recent
+            revisions of the branch, most recent first, where C{builds} maps
+            builder names to the summary of their latest build of the
+            revision
+        """
+        rows = self._branches.get(branch or "", [])
+        if count is not None:
+            rows = rows[-count:]
+        return [(revision, builds) for revision, builds in reversed(rows)]
+
+
+    def buildFinished(self, builderName, build, results):
+        self.record(builderName, build.getSourceStamp().branch,
+                    summarizeBuild(build))
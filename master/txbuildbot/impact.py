@@ -0,0 +1,352 @@
+"""
+Selection of the tests affected by the changes on a branch.
+"""
+
+from zope.interface import implements
+
+from twisted.python import log
+
+from buildbot.interfaces import IRenderable
+from buildbot.status.builder import FAILURE
+from buildbot.steps.shell import ShellCommand
+from buildbot.process.properties import Property
+from buildbot.util import ComparableMixin, formatInterval
+
+from txbuildbot.git import isTrunk
+from txbuildbot.durations import TestDurationDatabase, moduleForTest
+from txbuildbot.durations import slowestFirst, estimateDuration
+from txbuildbot.postprocess import deferToPostProcessor
+from txbuildbot.slavescript import pythonScript
+
+
+
+def parseImpactedTests(output):
+    """
+    Parse the output of L{FindImpactedTests.source}.
+
+    @return: the L{set} of names of the test modules to run, or C{None} if
+        the whole suite should run
+    """
+    modules = set()
+    for line in output.splitlines():
+        line = line.strip()
+        if line == '*':
+            return None
+        if line:
+            modules.add(line)
+    return modules or None
+
+
+
+def testIdForResult(name, package):
+    """
+    Get the id of a test from the name its result was recorded with by
+    L{Trial.addTestResult}, which may start with the name of a reactor.
+
+    @type name: L{tuple}
+    @param name: the parts of the name of the test
+
+    @param package: the top-level package of the tests
+
+    @return: the id of the test, like
+        C{twisted.test.test_defer.DeferredTests.test_callback}, or C{None} if
+        it isn't in C{package}
+    """
+    if package not in name:
+        return None
+    return '.'.join(name[list(name).index(package):])
+
+
+
+def previousBuildsOfBranch(buildStatus, count, search):
+    """
+    Find the most recent finished builds of the same branch as a build, on
+    the same builder.
+
+    @param count: the most builds to find
+
+    @param search: the number of earlier builds to look through
+
+    @return: an iterator of the build statuses, most recent first
+    """
+    branch = buildStatus.getSourceStamp().branch
+    build = buildStatus.getPreviousBuild()
+    for i in range(search):
+        if build is None or count == 0:
+            break
+        if build.isFinished() and build.getSourceStamp().branch == branch:
+            count -= 1
+            yield build
+        build = build.getPreviousBuild()
+
+
+
+def failedTests(buildStatus, package):
+    """
+    @return: the L{set} of ids of the tests in C{package} which failed in a
+        build
+    """
+    try:
+        results = buildStatus.getTestResults()
+    except Exception:
+        log.err(None, "Failed to load the test results of %r" % (buildStatus,))
+        return set()
+    failed = set()
+    for name, result in results.iteritems():
+        if result.getResults() == FAILURE:
+            testId = testIdForResult(name, package)
+            if testId is not None:
+                failed.add(testId)
+    return failed
+
+
+
+def isNotTrunkBuild(step):
+    """
+    Is the step part of a build of something other than trunk?
+    """
+    return not isTrunk(step.getProperty('branch'))
+
+
+
+class ImpactedTests(ComparableMixin):
+    """
+    The test modules chosen by L{FindImpactedTests}, or the default tests if
+    it didn't choose any (such as in trunk builds, where it doesn't run).
+    """
+    implements(IRenderable)
+
+    compare_attrs = ('default',)
+
+    def __init__(self, default):
+        self.default = default
+
+
+    def getRenderingFor(self, props):
+        impacted = props.getProperty(FindImpactedTests.property)
+        if impacted:
+            return list(impacted)
+        return props.render(self.default)
+
+
+
+class FindImpactedTests(ShellCommand):
+    """
+    Work out which test modules are affected by the changes made on a branch
+    since it left trunk, and set the C{impacted_tests} property to them.
+
+    The modules are found on the slave by L{source}, from the
+    C{test-case-name} tags of the changed files and an index of the imports
+    of every module in the package. The imports are read with L{ast}, so
+    relative imports and imports over several lines are found, and so are
+    the names of modules in the package given as strings, as to C{namedAny}
+    and in the plugins. Modules which can't be parsed are taken to be
+    changed. The test modules which failed in the most recent builds of the
+    branch on this builder are added to them.
+
+    The modules are ordered slowest first, by their median durations in the
+    builder's L{TestDurationDatabase}, and the step's text shows how long
+    they are expected to take.
+
+    If the selection can't be made, because the changes aren't all to Python
+    files, or they affect most of the tests anyway, the property isn't set
+    and the whole suite runs.
+
+    @cvar source: script run on the slave. Its arguments are the package and
+        the revision the branch is compared with. It writes the names of the
+        affected test modules, one per line, or C{*} for the whole suite.
+
+    @cvar historyBuilds: number of the most recent builds of the branch whose
+        failed tests are run again.
+
+    @cvar historySearch: number of the most recent builds of the builder to
+        look through for builds of the branch.
+    """
+    name = 'find-impacted-tests'
+    description = ['finding', 'impacted', 'tests']
+    descriptionDone = ['find', 'impacted', 'tests']
+
+    property = 'impacted_tests'
+    historyBuilds = 5
+    historySearch = 50
+
+    source = (
+        "import ast, os, re, sys, subprocess\n"
+        "package, base = sys.argv[1:3]\n"
+        "tagPattern = re.compile(r'test-case-name:\\s*([\\w., ]+)')\n"
+        "namePattern = re.compile(re.escape(package) + r'(\\.\\w+)+$')\n"
+        "def moduleName(path):\n"
+        "    parts = path[:-3].split('/')\n"
+        "    if parts[-1] == '__init__':\n"
+        "        parts.pop()\n"
+        "    return '.'.join(parts)\n"
+        "def isTestModule(name):\n"
+        "    parts = name.split('.')\n"
+        "    return (len(parts) > 1 and parts[-2] == 'test' and\n"
+        "            parts[-1].startswith('test_'))\n"
+        "def withParents(name):\n"
+        "    parts = name.split('.')\n"
+        "    return ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]\n"
+        "def importedNames(name, path, source):\n"
+        "    tree = ast.parse(source, path)\n"
+        "    if path.endswith('/__init__.py'):\n"
+        "        here = name\n"
+        "    else:\n"
+        "        here = name.rpartition('.')[0]\n"
+        "    for node in ast.walk(tree):\n"
+        "        if isinstance(node, ast.Import):\n"
+        "            for alias in node.names:\n"
+        "                yield alias.name\n"
+        "                yield here + '.' + alias.name\n"
+        "        elif isinstance(node, ast.ImportFrom):\n"
+        "            if node.level:\n"
+        "                parts = here.split('.')\n"
+        "                parts = parts[:len(parts) + 1 - node.level]\n"
+        "                module = '.'.join(parts)\n"
+        "                if node.module:\n"
+        "                    module += '.' + node.module\n"
+        "            else:\n"
+        "                module = node.module\n"
+        "                yield here + '.' + module\n"
+        "            yield module\n"
+        "            for alias in node.names:\n"
+        "                if alias.name != '*':\n"
+        "                    yield module + '.' + alias.name\n"
+        "        elif isinstance(node, ast.Str):\n"
+        "            if namePattern.match(node.s):\n"
+        "                yield node.s\n"
+        "diff = subprocess.Popen(['git', 'diff', '--name-only', base, 'HEAD'],\n"
+        "                        stdout=subprocess.PIPE)\n"
+        "changedPaths = diff.communicate()[0].split()\n"
+        "if diff.returncode:\n"
+        "    sys.exit(diff.returncode)\n"
+        "changed = set()\n"
+        "tests = set()\n"
+        "for path in changedPaths:\n"
+        "    if not path.startswith(package + '/'):\n"
+        "        continue\n"
+        "    if not path.endswith('.py'):\n"
+        "        print '*'\n"
+        "        sys.exit(0)\n"
+        "    name = moduleName(path)\n"
+        "    changed.add(name)\n"
+        "    if isTestModule(name):\n"
+        "        tests.add(name)\n"
+        "    if os.path.exists(path):\n"
+        "        for line in open(path).readlines()[:5]:\n"
+        "            match = tagPattern.search(line)\n"
+        "            if match:\n"
+        "                tests.update(filter(None, [\n"
+        "                    tag.strip() for tag in match.group(1).split(',')]))\n"
+        "importers = {}\n"
+        "testModules = set()\n"
+        "for directory, dirnames, filenames in os.walk(package):\n"
+        "    for filename in filenames:\n"
+        "        if not filename.endswith('.py'):\n"
+        "            continue\n"
+        "        path = os.path.join(directory, filename).replace(os.sep, '/')\n"
+        "        name = moduleName(path)\n"
+        "        if isTestModule(name):\n"
+        "            testModules.add(name)\n"
+        "        try:\n"
+        "            imported = set(importedNames(name, path,\n"
+        "                                         open(path).read()))\n"
+        "        except (SyntaxError, TypeError):\n"
+        "            changed.add(name)\n"
+        "            continue\n"
+        "        for module in imported:\n"
+        "            for parent in withParents(module):\n"
+        "                importers.setdefault(parent, set()).add(name)\n"
+        "seen = set(changed)\n"
+        "pending = list(changed)\n"
+        "while pending:\n"
+        "    for importer in importers.get(pending.pop(), ()):\n"
+        "        if importer not in seen:\n"
+        "            seen.add(importer)\n"
+        "            pending.append(importer)\n"
+        "tests.update(seen & testModules)\n"
+        "if len(tests) * 2 > len(testModules):\n"
+        "    print '*'\n"
+        "else:\n"
+        "    for name in sorted(tests):\n"
+        "        print name\n")
+
+    def __init__(self, python=("python",), package='twisted', **kwargs):
+        """
+        @param python: L{list} of words used to run Python on the slave.
+
+        @param package: the top-level package of the code and its tests.
+        """
+        kwargs.setdefault('doStepIf', isNotTrunkBuild)
+        ShellCommand.__init__(self, **kwargs)
+        self.addFactoryArguments(python=python, package=package)
+        self.python = list(python)
+        self.package = package
+        self.modules = None
+        self.estimate = None
+        self.command = pythonScript(self.python, self.source,
+                                    package, Property('lint_revision'))
+
+
+    def describe(self, done=False):
+        description = ShellCommand.describe(self, done)
+        if done and self.estimate is not None:
+            description = description + [
+                "(~%s)" % (formatInterval(int(self.estimate)),)]
+        return description
+
+
+    def commandComplete(self, cmd):
+        self.modules = None
+        self.estimate = None
+        if cmd.rc != 0:
+            return
+        modules = parseImpactedTests(cmd.logs['stdio'].getText())
+        if modules is None:
+            return
+        modules.update(self.getFailedModules())
+        self.modules = modules
+
+
+    def createSummary(self, stdio):
+        if not self.modules:
+            return
+        builder = self.build.build_status.getBuilder()
+        database = TestDurationDatabase.forBuilder(builder)
+        d = deferToPostProcessor(database.getMedians, builder.getName())
+        d.addErrback(self._medianFailed)
+        d.addCallback(self.orderModules)
+        return d
+
+
+    def _medianFailed(self, reason):
+        log.err(reason, "Failed to load test durations")
+        return {}
+
+
+    def orderModules(self, medians):
+        """
+        Set the property to the impacted test modules, slowest first, and
+        estimate how long they will take.
+
+        @param medians: the median seconds each test module took on this
+            builder, as returned by L{TestDurationDatabase.getMedians}
+        """
+        modules = slowestFirst(medians, self.modules)
+        self.estimate = estimateDuration(medians, modules)
+        self.setProperty(self.property, modules, self.name)
+        self.addCompleteLog('impacted tests', '\n'.join(modules))
+
+
+    def getFailedModules(self):
+        """
+        @return: the L{set} of test modules which failed in the most recent
+            builds of this build's branch
+        """
+        modules = set()
+        for build in previousBuildsOfBranch(self.build.build_status,
+                                            self.historyBuilds,
+                                            self.historySearch):
+            modules.update(map(moduleForTest,
+                               failedTests(build, self.package)))
+        return modules
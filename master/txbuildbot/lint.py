@@ -1,9 +1,17 @@
-import itertools
-from twisted.python import log, util
-from buildbot.status.builder import SUCCESS, WARNINGS
-from buildbot.steps.shell import ShellCommand
+import os
+import glob
+from collections import OrderedDict
+from twisted.python import log
+from twisted.internet import defer
+from buildbot.status.builder import SUCCESS, WARNINGS, SKIPPED
+from buildbot.steps.shell import ShellCommand, SetProperty
 from buildbot.process.properties import Property
 
+from txbuildbot.buildindex import TrunkBuildIndex, readJSON, writeJSONAndPrune
+from txbuildbot.postprocess import deferToPostProcessor
+from txbuildbot.slavescript import pythonScript
+from txbuildbot.logobserver import PartialLineObserver
+
 try:
     import cStringIO
     StringIO = cStringIO
@@ -11,27 +19,381 @@ except ImportError:
     import StringIO
 import re
 
+def moduleNameForPath(path):
+    """
+    @type path: L{str}
+    @param path: path of a Python source file, relative to the top of the
+        checkout
+
+    @return: the fully qualified name of the module in C{path}, or C{None} if
+        it isn't a Python source file
+    """
+    if not path.endswith('.py'):
+        return None
+    parts = path[:-len('.py')].split('/')
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+
+def isInPackage(moduleName, package):
+    """
+    @return: whether C{moduleName} is C{package} or one of its submodules
+    """
+    return moduleName == package or moduleName.startswith(package + '.')
+
+
+
+def extractChangedModules(rc, stdout, stderr):
+    """
+    Parse the output of C{git diff --name-status}.
+
+    @return: L{dict} of properties; C{lint_changed_files} is the list of Python
+        source files which were added or modified, and C{lint_deleted_modules}
+        the names of the modules which were removed.  If the command failed, no
+        properties are set.
+    """
+    if rc != 0:
+        return {}
+    changed = []
+    deleted = []
+    for line in stdout.splitlines():
+        fields = line.split('\t')
+        if len(fields) < 2:
+            continue
+        status = fields[0][:1]
+        if status == 'D':
+            deleted.append(fields[1])
+        elif status == 'R':
+            deleted.append(fields[1])
+            changed.append(fields[-1])
+        else:
+            changed.append(fields[-1])
+    return {
+        'lint_changed_files': sorted(
+            [path for path in changed if moduleNameForPath(path)]),
+        'lint_deleted_modules': sorted(
+            filter(None, map(moduleNameForPath, deleted))),
+        }
+
+
+
+def lintResultsPath(basedir, number, stepName):
+    """
+    @type basedir: L{str}
+    @param basedir: directory of the builder
+
+    @return: the path of the results saved by the lint step C{stepName} of
+        build C{number}
+    """
+    return os.path.join(basedir, LintStep.resultsDirectory,
+                        '%d-%s.json' % (number, stepName))
+
+
+
+def loadLintResults(basedir, number):
+    """
+    Load the results saved by the lint steps of a build.
+
+    @type basedir: L{str}
+    @param basedir: directory of the builder
+
+    @type number: L{int}
+    @param number: number of the build
+
+    @return: L{dict} mapping step names to the results saved by
+        L{LintStep.saveResults}
+    """
+    results = {}
+    prefix = os.path.join(basedir, LintStep.resultsDirectory, '%d-' % (number,))
+    for path in glob.glob(prefix + '*.json'):
+        stepResults = readJSON(path)
+        if stepResults is not None:
+            results[path[len(prefix):-len('.json')]] = stepResults
+    return results
+
+
+
+class BaselineCache(object):
+    """
+    A size-bounded cache of parsed baselines, shared by all the lint steps of
+    the master so that concurrent builds comparing against the same trunk
+    revision only load it once.
+
+    The cached errors are shared, so they must not be modified.
+
+    @ivar maxEntries: number of baselines to keep; the least recently used is
+        evicted first.
+    """
+
+    def __init__(self, maxEntries=20):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._parsing = {}
+
+
+    def get(self, key):
+        """
+        @param key: C{(builder directory, step name, revision)}
+
+        @return: the cached errors, or C{None}
+        """
+        errors = self._entries.pop(key, None)
+        if errors is not None:
+            self._entries[key] = errors
+        return errors
+
+
+    def put(self, key, errors):
+        """
+        Cache C{errors}, evicting the least recently used entry if the cache
+        is full.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = errors
+        while len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+
+
+    def invalidate(self, key):
+        """
+        Forget any errors cached for C{key}.
+        """
+        self._entries.pop(key, None)
+
+
+    def parse(self, key, parser):
+        """
+        Get the errors cached for C{key}, or parse them with C{parser} and
+        cache them. Lookups of C{key} while it is being parsed wait for that
+        parse rather than starting another.
+
+        @param parser: called with no arguments to parse the errors, returning
+            a L{Deferred} firing with them
+
+        @return: a L{Deferred} firing with the errors, which must not be
+            modified
+        """
+        errors = self.get(key)
+        if errors is not None:
+            return defer.succeed(errors)
+        if key in self._parsing:
+            d = defer.Deferred()
+            self._parsing[key].append(d)
+            return d
+        waiting = self._parsing[key] = []
+        def parsed(errors):
+            del self._parsing[key]
+            self.put(key, errors)
+            for d in waiting:
+                d.callback(errors)
+            return errors
+        def failed(reason):
+            del self._parsing[key]
+            for d in waiting:
+                d.errback(reason)
+            return reason
+        return defer.maybeDeferred(parser).addCallbacks(parsed, failed)
+
+
+
+class FindChangedModules(SetProperty):
+    """
+    Find the Python modules that have changed since C{lint_revision}, for
+    L{CheckCodesByTwistedChecker} to check incrementally.
+    """
+    name = 'find-changed-modules'
+    description = ['finding', 'changed', 'modules']
+    descriptionDone = ['find', 'changed', 'modules']
+
+    def __init__(self, **kwargs):
+        SetProperty.__init__(
+            self,
+            command=['git', 'diff', '--name-status',
+                     Property('lint_revision'), 'HEAD'],
+            extract_fn=extractChangedModules, **kwargs)
+
+
+
+class LintParser(object):
+    """
+    Incrementally collects the errors reported by a lint command, one line
+    of output at a time.
+    """
+
+    def lineReceived(self, line):
+        """
+        @type line: L{str}
+        @param line: a line of output, without the trailing newline
+        """
+        raise NotImplementedError("Must implement lineReceived for a Lint parser")
+
+
+    def getErrors(self):
+        """
+        Called once all the output has been received.
+
+        @return: L{dict} of L{set}s containing errors generated by lint, grouped by
+            type
+        """
+        raise NotImplementedError("Must implement getErrors for a Lint parser")
+
+
+
+class LintLogObserver(PartialLineObserver):
+    """
+    Feeds the output of a lint command to a L{LintParser} while the command
+    runs, so the errors are known as soon as it finishes.
+    """
+
+    def __init__(self, parser):
+        PartialLineObserver.__init__(self)
+        self.parser = parser
+
+
+    def outLineReceived(self, line):
+        self.parser.lineReceived(line)
+
+    errLineReceived = outLineReceived
+
+
+    def getErrors(self):
+        """
+        Parse any output after the last newline, and return the errors.
+        """
+        self.flushLines()
+        return self.parser.getErrors()
+
+
+
 class LintStep(ShellCommand):
     """
     A L{ShellCommand} that generates summary information of errors generated
     during a build, and new errors generated vs. the most recent trunk build.
+
+    The errors found by builds of trunk are saved as a baseline, so that later
+    builds don't need to parse the output of the trunk build again.
     
     @ivar worse: a L{bool} indicating whether this build is worse with respect
         to reported errors than the most recent trunk build.
+
+    @cvar baselineVersion: version of the format of saved baselines. This
+        should be increased whenever C{computeErrors} changes what it returns,
+        so that baselines saved by older versions are ignored.
+    @cvar baselineDirectory: directory, relative to the builder's, in which
+        baselines are saved.
+    @cvar maxBaselines: number of baselines to keep for each step of a builder.
+    @cvar resultsDirectory: directory, relative to the builder's, in which the
+        new, fixed and unchanged errors of each build are saved.
+    @cvar maxResults: number of builds to keep results for, for each step of a
+        builder.
+    @cvar baselineCache: L{BaselineCache} of loaded baselines, shared by all
+        lint steps.
+    @cvar shardSource: script run on the slave to split the command across
+        several processes. Its arguments are the number of shards, the number
+        of words in the lint tool's command line, then that command line
+        followed by the paths or packages to check. Packages are split into
+        their modules and subpackages, in sorted order, and each shard checks
+        a contiguous run of them. The output of each shard is written out in
+        order once they are all done, so the errors are the same as those of
+        a single process.
     """
     flunkOnWarnings = True
 
+    baselineVersion = 1
+    baselineDirectory = 'lint-baselines'
+    maxBaselines = 50
+    resultsDirectory = 'lint-results'
+    maxResults = 1000
+    baselineCache = BaselineCache()
+
+    shardSource = (
+        "import os, sys, subprocess, tempfile\n"
+        "shards, words = int(sys.argv[1]), int(sys.argv[2])\n"
+        "command = sys.argv[3:3 + words]\n"
+        "targets = []\n"
+        "for target in sys.argv[3 + words:]:\n"
+        "    path = target\n"
+        "    if not os.path.exists(path):\n"
+        "        path = target.replace('.', os.sep)\n"
+        "    if not os.path.isdir(path):\n"
+        "        targets.append(target)\n"
+        "        continue\n"
+        "    for name in sorted(os.listdir(path)):\n"
+        "        child = os.path.join(path, name)\n"
+        "        if (name.endswith('.py') or\n"
+        "            os.path.exists(os.path.join(child, '__init__.py'))):\n"
+        "            targets.append(child)\n"
+        "size = max(1, -(-len(targets) // shards))\n"
+        "running = []\n"
+        "for i in range(0, len(targets), size):\n"
+        "    out, err = tempfile.TemporaryFile(), tempfile.TemporaryFile()\n"
+        "    process = subprocess.Popen(command + targets[i:i + size],\n"
+        "                               stdout=out, stderr=err)\n"
+        "    running.append((process, out, err))\n"
+        "rc = 0\n"
+        "for process, out, err in running:\n"
+        "    rc = max(rc, process.wait())\n"
+        "    for f, stream in ((out, sys.stdout), (err, sys.stderr)):\n"
+        "        f.seek(0)\n"
+        "        stream.write(f.read())\n"
+        "        stream.flush()\n"
+        "sys.exit(rc)\n")
+
+    def __init__(self, shards=1, python=("python",), **kwargs):
+        """
+        @param shards: number of processes to split the command across. The
+            command must be the lint tool followed by the paths or packages to
+            check.
+
+        @param python: L{list} of words used to run Python on the slave, for
+            the script which runs the shards.
+        """
+        ShellCommand.__init__(self, **kwargs)
+        self.addFactoryArguments(shards=shards, python=python)
+        self.shards = shards
+        self.python = list(python)
+
+
+    def start(self):
+        self.observer = LintLogObserver(self.makeParser())
+        self.addLogObserver('stdio', self.observer)
+        if self.shards > 1:
+            self.setCommand(
+                pythonScript(self.python, self.shardSource,
+                             str(self.shards), "1", *self.command))
+        return ShellCommand.start(self)
+
+
     def createSummary(self, logObj):
-        logText = logObj.getText()
-        self.worse = self.processLogs(self.getPreviousLog(), logText)
+        currentErrors = self.observer.getErrors()
+        d = self.getPreviousErrors()
+        d.addCallback(self._gotPreviousErrors, currentErrors)
+        return d
 
 
-    def processLogs(self, oldText, newText):
-        currentErrors = self.computeErrors(newText)
-        previousErrors = self.computeErrors(oldText)
+    def _gotPreviousErrors(self, previousErrors, currentErrors):
+        self.worse = self.processErrors(currentErrors, previousErrors)
+        self.saveResults(currentErrors, previousErrors)
+        self.saveBaseline(currentErrors)
 
+
+    def processErrors(self, currentErrors, previousErrors):
+        """
+        Add logs describing the errors found by this build and the errors that
+        are new since the last trunk build.
+
+        @type currentErrors: L{dict} of L{set}s
+        @param currentErrors: errors from this build
+
+        @type previousErrors: L{dict} of L{set}s
+        @param previousErrors: errors from the last trunk build
+
+        @return: whether there are new errors
+        @rtype: L{bool}
+        """
         self.addCompleteLog('%s errors' % self.lintChecker, '\n'.join(self.formatErrors(currentErrors)))
-        self.formatErrors(previousErrors)
 
         newErrors = self.computeDifference(currentErrors, previousErrors)
 
@@ -42,7 +404,16 @@ class LintStep(ShellCommand):
         return bool(newErrors)
 
 
-    def computeErrors(self, logText):
+    @classmethod
+    def makeParser(cls):
+        """
+        @return: a L{LintParser} for the output of the lint command
+        """
+        raise NotImplementedError("Must implement makeParser for a Lint step")
+
+
+    @classmethod
+    def computeErrors(cls, logText):
         """
         @type logText: L{str}
         @param logText: output of lint command
@@ -50,7 +421,11 @@ class LintStep(ShellCommand):
         @return: L{dict} of L{set}s containing errors generated by lint, grouped by
             type
         """
-        raise NotImplementedError("Must implement computeErrors for a Lint step")
+        parser = cls.makeParser()
+        for line in StringIO.StringIO(logText):
+            # Mostly get rid of the trailing \n
+            parser.lineReceived(line.strip("\n"))
+        return parser.getErrors()
 
 
     def formatErrors(self, newErrors):
@@ -102,6 +477,163 @@ class LintStep(ShellCommand):
         return ""
 
 
+    def getPreviousErrors(self):
+        """
+        Gets the errors found by the last build of trunk, from its saved
+        baseline if there is one, otherwise by parsing its output with
+        L{deferToPostProcessor}. The parsed errors are kept in
+        C{baselineCache} too.
+
+        @return: L{Deferred} firing with the errors from the last trunk build,
+            a L{dict} of L{set}s
+        """
+        revision = self.getProperty('lint_revision')
+        errors = self.loadBaseline(revision)
+        if errors is not None:
+            return defer.succeed(errors)
+        parse = lambda: deferToPostProcessor(self.computeErrors,
+                                             self.getPreviousLog())
+        if not revision:
+            return parse()
+        # Builds of the same revision share the parse, and its result.
+        return self.baselineCache.parse(self._getBaselineKey(revision), parse)
+
+
+    @staticmethod
+    def loadError(text):
+        """
+        Recreate an error from a saved baseline.
+
+        @type text: L{str}
+        @param text: the C{str} of an error returned by C{computeErrors}
+
+        @return: an error equal to the one that was saved
+        """
+        return text
+
+
+    def _getBaselinePath(self, revision):
+        builder = self.build.build_status.getBuilder()
+        return os.path.join(builder.basedir, self.baselineDirectory,
+                            '%s-%s.json' % (self.name, revision))
+
+
+    def _getBaselineKey(self, revision):
+        builder = self.build.build_status.getBuilder()
+        return (builder.basedir, self.name, revision)
+
+
+    def loadBaseline(self, revision):
+        """
+        Load the errors saved by the trunk build of C{revision}, from
+        C{baselineCache} if another step has already loaded them.
+
+        @type revision: L{str}
+        @param revision: trunk revision
+
+        @return: the saved errors, which must not be modified, or C{None} if
+            there is no usable baseline
+        @rtype: L{dict} of L{set}s
+        """
+        if not revision:
+            return None
+        key = self._getBaselineKey(revision)
+        errors = self.baselineCache.get(key)
+        if errors is not None:
+            log.msg("Using cached baseline for %s" % (revision,))
+            return errors
+        path = self._getBaselinePath(revision)
+        baseline = readJSON(path)
+        if baseline is None:
+            log.msg("No baseline for %s, parsing previous log" % (revision,))
+            return None
+        if baseline.get('version') != self.baselineVersion:
+            log.msg("Ignoring baseline for %s with version %r" % (
+                revision, baseline.get('version')))
+            return None
+        log.msg("Loaded baseline for %s from %s" % (revision, path))
+        errors = {}
+        for errorType, messages in baseline['errors'].iteritems():
+            # JSON gives back unicode, but logs are read as bytes
+            errors[errorType.encode('utf-8')] = set([
+                self.loadError(message.encode('utf-8'))
+                for message in messages])
+        self.baselineCache.put(key, errors)
+        return errors
+
+
+    def saveBaseline(self, errors):
+        """
+        Save the errors found by a build of trunk, so later builds can compare
+        against them without parsing this build's output.
+
+        Nothing is saved for builds of branches.
+
+        @type errors: L{dict} of L{set}s
+        @param errors: errors from this build
+        """
+        revision = self.getProperty('got_revision')
+        if self.getProperty('branch') or not revision:
+            return
+        self.baselineCache.invalidate(self._getBaselineKey(revision))
+        path = self._getBaselinePath(revision)
+        baseline = {
+            'version': self.baselineVersion,
+            'errors': self._serializeErrors(errors),
+            }
+        try:
+            writeJSONAndPrune(path, baseline, '%s-*.json' % (self.name,),
+                              self.maxBaselines)
+        except (IOError, OSError, ValueError):
+            log.err(None, "Failed to save lint baseline for %s" % (revision,))
+
+
+    def saveResults(self, currentErrors, previousErrors):
+        """
+        Save the errors which are new, fixed and unchanged in this build
+        compared to the last trunk build, for L{loadLintResults}.
+
+        @type currentErrors: L{dict} of L{set}s
+        @param currentErrors: errors from this build
+
+        @type previousErrors: L{dict} of L{set}s
+        @param previousErrors: errors from the last trunk build
+        """
+        unchanged = {}
+        for errorType, errors in currentErrors.iteritems():
+            common = errors & previousErrors.get(errorType, set())
+            if common:
+                unchanged[errorType] = common
+        status = self.build.build_status
+        results = {
+            'lint_revision': self.getProperty('lint_revision'),
+            'new': self._serializeErrors(
+                self.computeDifference(currentErrors, previousErrors)),
+            'fixed': self._serializeErrors(
+                self.computeDifference(previousErrors, currentErrors)),
+            'unchanged': self._serializeErrors(unchanged),
+            }
+        path = lintResultsPath(status.getBuilder().basedir, status.getNumber(),
+                               self.name)
+        try:
+            writeJSONAndPrune(path, results, '*-%s.json' % (self.name,),
+                              self.maxResults)
+        except (IOError, OSError, ValueError):
+            log.err(None, "Failed to save lint results for build %d" % (
+                status.getNumber(),))
+
+
+    @staticmethod
+    def _serializeErrors(errors):
+        """
+        @type errors: L{dict} of L{set}s
+        @return: C{errors} as a L{dict} of sorted L{list}s of L{str}s
+        """
+        return dict([
+            (errorType, sorted(map(str, typeErrors)))
+            for (errorType, typeErrors) in errors.iteritems()])
+
+
     def _getLastBuild(self):
         """
         Gets the L{BuildStatus} object of the most recent build of trunk.
@@ -119,6 +651,10 @@ class LintStep(ShellCommand):
         targetRevision = self.getProperty('lint_revision')
         log.msg(format='Looking for build of %(revision)s', revision=targetRevision)
 
+        build = self._getIndexedBuild(builder, targetRevision)
+        if build is not None:
+            return build
+
         count = 0
         lastTrunkBuild = None
         while count < 200 and number > 0:
@@ -147,6 +683,9 @@ class LintStep(ShellCommand):
                         number=number, revision=revision, branch=branch)
         log.msg(format="falling off the end after searching %(count)d builds",
                 count=status.getNumber() - number)
+        build = self._getLatestIndexedBuild(builder, targetRevision)
+        if build is not None:
+            return build
         if lastTrunkBuild:
             revision, build = lastTrunkBuild
             log.msg(format="Using build %(number)d at %(revision)s instead of %(targetRevision)s",
@@ -155,6 +694,56 @@ class LintStep(ShellCommand):
         return None
 
 
+    def _getIndexedBuild(self, builder, targetRevision):
+        """
+        Look up the trunk build of a revision in the builder's
+        L{TrunkBuildIndex}, avoiding a scan through old builds.
+
+        @type builder: L{BuilderStatus}
+        @param builder: builder to look in
+
+        @type targetRevision: L{str}
+        @param targetRevision: preferred trunk revision
+
+        @return: the build of C{targetRevision}, or C{None} if it isn't
+            indexed
+        @rtype: L{BuildStatus}
+        """
+        number = TrunkBuildIndex.forBuilder(builder).lookup(targetRevision)
+        if number is None:
+            log.msg(format="No indexed build of %(revision)s, searching build history",
+                    revision=targetRevision)
+            return None
+        log.msg(format="Found indexed build %(number)d of trunk at %(revision)s",
+                number=number, revision=targetRevision)
+        return builder.getBuild(number)
+
+
+    def _getLatestIndexedBuild(self, builder, targetRevision):
+        """
+        Look up the most recent trunk build in the builder's
+        L{TrunkBuildIndex}, for when there is no build of the preferred
+        revision.
+
+        @type builder: L{BuilderStatus}
+        @param builder: builder to look in
+
+        @type targetRevision: L{str}
+        @param targetRevision: preferred trunk revision, for logging
+
+        @return: the most recent indexed trunk build, or C{None} if the index
+            is empty
+        @rtype: L{BuildStatus}
+        """
+        latest = TrunkBuildIndex.forBuilder(builder).latest()
+        if latest is None:
+            return None
+        revision, number = latest
+        log.msg(format="Using indexed build %(number)d at %(revision)s instead of %(targetRevision)s",
+                number=number, revision=revision, targetRevision=targetRevision)
+        return builder.getBuild(number)
+
+
     def evaluateCommand(self, cmd):
         if self.worse:
             return WARNINGS
@@ -162,6 +751,40 @@ class LintStep(ShellCommand):
 
 
 
+class PydoctorParser(LintParser):
+    """
+    Collects errors from the output of pydoctor.
+    """
+
+    def __init__(self):
+        self.errors = {}
+
+
+    def lineReceived(self, line):
+        try:
+            line = line.strip()
+            if 'invalid ref to' in line:
+                key = 'invalid ref'
+                # Discard the line number since it's pretty unstable
+                # over time
+                fqpnlineno, rest = line.split(' ', 1)
+                fqpn, lineno = fqpnlineno.split(':')
+                value = '%s: %s' % (fqpn, rest)
+            elif 'found unknown field on' in line:
+                key = 'unknown fields'
+                value = line
+            else:
+                return
+            self.errors.setdefault(key, set()).add(value)
+        except: # TODO: This should be handled better.
+            log.err()
+
+
+    def getErrors(self):
+        return self.errors
+
+
+
 class CheckDocumentation(LintStep):
     """
     Run Pydoctor over the source to check for errors in API
@@ -178,29 +801,9 @@ class CheckDocumentation(LintStep):
 
     lintChecker = 'pydoctor'
 
-    @staticmethod
-    def computeErrors(logText):
-        errors = {}
-        for line in StringIO.StringIO(logText):
-            try:
-                # Mostly get rid of the trailing \n
-                line = line.strip()
-                if 'invalid ref to' in line:
-                    key = 'invalid ref'
-                    # Discard the line number since it's pretty unstable
-                    # over time
-                    fqpnlineno, rest = line.split(' ', 1)
-                    fqpn, lineno = fqpnlineno.split(':')
-                    value = '%s: %s' % (fqpn, rest)
-                elif 'found unknown field on' in line:
-                    key = 'unknown fields'
-                    value = line
-                else:
-                    continue
-                errors.setdefault(key, set()).add(value)
-            except: # TODO: This should be handled better.
-                log.err()
-        return errors
+    @classmethod
+    def makeParser(cls):
+        return PydoctorParser()
 
 
     def formatErrors(self, newErrors):
@@ -217,43 +820,141 @@ class CheckDocumentation(LintStep):
         return ShellCommand.getText(self, cmd, results)
 
 
-class TwistedCheckerError(util.FancyEqMixin, object):
+class LintError(object):
+    """
+    Base class for a single error reported by a lint tool.
+
+    There are tens of thousands of these in the output of a full run, and
+    every one is hashed and compared when working out which errors are new.
+    So instances have no C{__dict__}, their fields are interned, and the keys
+    used for equality and ordering are computed once when they're created.
+
+    @ivar msg: the line(s) of output describing the error
+    """
+    __slots__ = ('msg', '_key', '_hash', '_sortKey')
+
+    def _setKeys(self, key, sortKey):
+        """
+        @param key: L{tuple} of the fields identifying this error; errors with
+            equal keys are considered the same error, even at different
+            locations.
+        @param sortKey: L{tuple} of the fields to order errors by
+        """
+        self._key = key
+        self._hash = hash(key)
+        self._sortKey = sortKey
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        if not isinstance(other, self.__class__):
+            return NotImplemented
+        return self._key != other._key
+
+    def __cmp__(self, other):
+        return cmp(self._sortKey, other._sortKey)
+
+    def __str__(self):
+        return self.msg
+
+
+
+class TwistedCheckerError(LintError):
+    __slots__ = ('type', 'line', 'indent', 'text')
     regex = re.compile(r"^(?P<type>[WCEFR]\d{4}):(?P<line>\s*\d+),(?P<indent>\d+):(?P<text>.*)")
-    compareAttributes = ('type', 'text')
 
-    def __init__(self, msg):
+    def __init__(self, msg, match=None):
+        """
+        @type msg: L{str}
+        @param msg: the output of twistedchecker for this error
+
+        @param match: the result of matching the first line of C{msg} against
+            C{regex}, if the caller already has it
+        """
         self.msg = msg
-        m = self.regex.match(msg)
+        m = match or self.regex.match(msg)
         if m:
-            d = m.groupdict()
-            self.type = d['type']
-            self.line = d['line']
-            self.indent = d['indent']
-            self.text = d['text']
+            self.type, self.line, self.indent, self.text = map(intern, m.groups())
         else:
             self.type = "UXXXX"
             self.line = "9999"
             self.indent = "9"
             self.text = "Unparseable"
             log.err(Exception, "unparseable")
-
-    def __hash__(self):
-        return hash((self.type, self.text))
-
-    def __str__(self):
-        return self.msg
-
-    def __cmp__(self, other):
-        return cmp(
-                (self.line, self.indent, self.type, self.text),
-                (other.line, other.indent, other.type, other.text),
-                )
+        self._setKeys((self.type, self.text),
+                      (self.line, self.indent, self.type, self.text))
 
     def __repr__(self):
         return ("<TwistedCheckerError type=%s line=%d indent=%d, text=%r>" %
             (self.type, int(self.line), int(self.indent), self.text))
 
 
+
+class TwistedCheckerParser(LintParser):
+    """
+    Collects errors from the output of twistedchecker, grouped by module.
+
+    An error starts with a line matching C{regexLineStart}, and carries on
+    until the start of the next error or module.
+
+    @ivar prefixModuleName: text introducing the errors for a module
+    @ivar regexLineStart: compiled pattern matching the first line of an error
+    """
+
+    def __init__(self, prefixModuleName, regexLineStart):
+        self.prefixModuleName = prefixModuleName
+        self.regexLineStart = re.compile(regexLineStart)
+        self.warnings = {}
+        self.currentModule = None
+        self.warningsCurrentModule = set()
+        self._warningLines = []
+        self._warningMatch = None
+
+
+    def lineReceived(self, line):
+        if line.startswith(self.prefixModuleName):
+            # Save results for previous module
+            self._saveModule()
+            # Initial results for current module
+            self.currentModule = line[len(self.prefixModuleName):]
+            self.warningsCurrentModule = set()
+        elif self.regexLineStart.match(line):
+            self._saveWarning()
+            self._warningLines.append(line)
+            self._warningMatch = TwistedCheckerError.regex.match(line)
+        elif self._warningLines:
+            self._warningLines.append(line)
+        else:
+            log.msg("Bad result format for %s" % self.currentModule)
+
+
+    def _saveWarning(self):
+        if self._warningLines:
+            self.warningsCurrentModule.add(TwistedCheckerError(
+                "\n".join(self._warningLines), self._warningMatch))
+            self._warningLines = []
+            self._warningMatch = None
+
+
+    def _saveModule(self):
+        self._saveWarning()
+        if self.currentModule:
+            self.warnings[self.currentModule] = self.warningsCurrentModule
+
+
+    def getErrors(self):
+        # Save warnings for last module
+        self._saveModule()
+        return self.warnings
+
+
+
 class CheckCodesByTwistedChecker(LintStep):
     """
     Run TwistedChecker over source codes to check for new warnings
@@ -268,34 +969,89 @@ class CheckCodesByTwistedChecker(LintStep):
 
     lintChecker = 'twistedchecker'
 
+    loadError = TwistedCheckerError
+
+    def __init__(self, incremental=False, **kwargs):
+        """
+        @param incremental: on builds of branches, only check the modules
+            listed in the C{lint_changed_files} property set by
+            L{FindChangedModules}, and take the errors for every other module
+            from the baseline of C{lint_revision}.
+        """
+        LintStep.__init__(self, **kwargs)
+        self.addFactoryArguments(incremental=incremental)
+        self.incremental = incremental
+        self.baseline = None
+        self.checkedModules = set()
+
+
+    def start(self):
+        if self.incremental and self.getProperty('branch'):
+            paths = self.getIncrementalPaths()
+            if paths is not None:
+                if not paths:
+                    log.msg("No changed modules to check")
+                    return SKIPPED
+                self.addCompleteLog("files", "\n".join(paths) + "\n")
+                self.setCommand(self.command[:-1] + paths)
+        return LintStep.start(self)
+
+
+    def getIncrementalPaths(self):
+        """
+        Work out which files to check for an incremental run.
+
+        @return: L{list} of the changed files in the package being checked, or
+            C{None} if the whole package has to be checked because the changed
+            files or the baseline of C{lint_revision} aren't known.
+        """
+        changed = self.getProperty('lint_changed_files')
+        if changed is None:
+            log.msg("Changed files unknown, checking everything")
+            return None
+        baseline = self.loadBaseline(self.getProperty('lint_revision'))
+        if baseline is None:
+            return None
+        package = self.command[-1]
+        paths = [path for path in changed
+                 if isInPackage(moduleNameForPath(path), package)]
+        self.baseline = baseline
+        self.checkedModules = set(map(moduleNameForPath, paths))
+        return paths
+
+
+    def mergeBaseline(self, checkedErrors):
+        """
+        Combine the errors found in the modules that were checked with the
+        baseline errors for every other module.
+
+        @type checkedErrors: L{dict} of L{set}s
+        @param checkedErrors: errors found in C{checkedModules}
+
+        @return: the errors for the whole package
+        @rtype: L{dict} of L{set}s
+        """
+        removed = self.checkedModules.union(
+            self.getProperty('lint_deleted_modules') or ())
+        errors = dict([
+            (module, moduleErrors)
+            for (module, moduleErrors) in self.baseline.iteritems()
+            if module not in removed])
+        errors.update(checkedErrors)
+        return errors
+
+
+    def createSummary(self, logObj):
+        if self.baseline is None:
+            return LintStep.createSummary(self, logObj)
+        currentErrors = self.mergeBaseline(self.observer.getErrors())
+        self.worse = self.processErrors(currentErrors, self.baseline)
+        self.saveResults(currentErrors, self.baseline)
+
 
     @classmethod
-    def computeErrors(cls, logText):
-        warnings = {}
-        currentModule = None
-        warningsCurrentModule = []
-        for line in StringIO.StringIO(logText):
-            # Mostly get rid of the trailing \n
-            line = line.strip("\n")
-            if line.startswith(cls.prefixModuleName):
-                # Save results for previous module
-                if currentModule:
-                    warnings[currentModule] = set(map(TwistedCheckerError, warningsCurrentModule))
-                # Initial results for current module
-                moduleName = line.replace(cls.prefixModuleName, "")
-                currentModule = moduleName
-                warningsCurrentModule = []
-            elif re.search(cls.regexLineStart, line):
-                warningsCurrentModule.append(line)
-            else:
-                if warningsCurrentModule:
-                    warningsCurrentModule[-1] += "\n" + line
-                else:
-                    log.msg("Bad result format for %s" % currentModule)
-        # Save warnings for last module
-        if currentModule:
-            warnings[currentModule] = set(map(TwistedCheckerError, warningsCurrentModule))
-        return warnings
+    def makeParser(cls):
+        return TwistedCheckerParser(cls.prefixModuleName, cls.regexLineStart)
 
 
     @classmethod
@@ -306,33 +1062,60 @@ class CheckCodesByTwistedChecker(LintStep):
             allNewErrors.extend(sorted(newErrors[modulename]))
         return map(str, allNewErrors)
 
-    def processLogs(self, oldText, newText):
-        currentErrors = self.computeErrors(newText)
-        previousErrors = self.computeErrors(oldText)
-
+    def processErrors(self, currentErrors, previousErrors):
         newErrors = self.computeDifference(currentErrors, previousErrors)
 
         if newErrors:
             allNewErrors = self.formatErrors(newErrors)
             self.addCompleteLog('new %s errors' % self.lintChecker, '\n'.join(allNewErrors))
 
-        for toplevel, modules in itertools.groupby(sorted(currentErrors.keys()), lambda k: ".".join(k.split(".")[0:2])):
-            modules = list(modules)
-            self.addCompleteLog("%s %s errors" % (self.lintChecker, toplevel),
-                    '\n'.join(self.formatErrors(dict([(module, currentErrors[module]) for module in modules]))))
+        self.addToplevelLogs(currentErrors)
 
         return bool(newErrors)
 
 
-class PyFlakesError(util.FancyEqMixin, object):
+    def addToplevelLogs(self, errors):
+        """
+        Add a log of the errors in each top-level package (such as
+        C{twisted.python}), formatted like C{formatErrors}.
+
+        The modules are sorted once, and each log is written as its modules
+        are reached.
+
+        @type errors: L{dict} of L{set}s
+        @param errors: errors from this build, keyed by module
+        """
+        logObj = None
+        currentToplevel = None
+        for module in sorted(errors):
+            moduleErrors = errors[module]
+            toplevel = ".".join(module.split(".")[0:2])
+            if toplevel != currentToplevel:
+                if logObj is not None:
+                    logObj.finish()
+                logObj = self.addLog("%s %s errors" % (self.lintChecker, toplevel))
+                currentToplevel = toplevel
+                separator = ''
+            else:
+                separator = '\n'
+            lines = [self.prefixModuleName + module]
+            lines.extend(map(str, sorted(moduleErrors)))
+            logObj.addStdout(separator + '\n'.join(lines))
+        if logObj is not None:
+            logObj.finish()
+
+
+class PyFlakesError(LintError):
+    __slots__ = ('file', 'line', 'text')
     regex = re.compile(r"^(?P<file>[^:]*):(?P<line>\d+): (?P<text>.*)")
-    compareAttributes = ('file', 'text')
 
     def __init__(self, msg, file, line, text):
         self.msg = msg
-        self.file = file
-        self.line = line
-        self.text = text
+        self.file = intern(file)
+        self.line = intern(line)
+        self.text = intern(text)
+        self._setKeys((self.file, self.text),
+                      (self.file, self.line, self.text))
 
     @classmethod
     def fromLine(cls, msg):
@@ -341,22 +1124,32 @@ class PyFlakesError(util.FancyEqMixin, object):
             d = m.groupdict()
             return cls(msg, d['file'], d['line'], d['text'])
 
-    def __hash__(self):
-        return hash((self.file, self.text))
-
-    def __str__(self):
-        return self.msg
-
-    def __cmp__(self, other):
-        return cmp(
-                (self.file, self.line, self.text),
-                (other.file, other.line, other.text),
-                )
-
     def __repr__(self):
         return ("<PyFlakesError file=%s line=%d text=%r>" %
             (self.file, int(self.line), self.text))
 
+
+
+class PyFlakesParser(LintParser):
+    """
+    Collects errors from the output of pyflakes.
+    """
+
+    def __init__(self):
+        self.warnings = set()
+
+
+    def lineReceived(self, line):
+        error = PyFlakesError.fromLine(line)
+        if error:
+            self.warnings.add(error)
+
+
+    def getErrors(self):
+        return {'pyflakes': self.warnings}
+
+
+
 class PyFlakes(LintStep):
     """
     Run TwistedChecker over source codes to check for new warnings
@@ -369,16 +1162,11 @@ class PyFlakes(LintStep):
 
     lintChecker = 'pyflakes'
 
+    loadError = staticmethod(PyFlakesError.fromLine)
+
     @classmethod
-    def computeErrors(cls, logText):
-        warnings = set() 
-        for line in StringIO.StringIO(logText):
-            # Mostly get rid of the trailing \n
-            line = line.strip("\n")
-            error = PyFlakesError.fromLine(line)
-            if error:
-                warnings.add(error)
-        return {'pyflakes':warnings}
+    def makeParser(cls):
+        return PyFlakesParser()
 
 
     @classmethod
@@ -0,0 +1,25 @@
+"""
+Log observers which parse a step's output line by line as it arrives.
+"""
+
+from buildbot.process.buildstep import LogLineObserver
+
+
+
+class PartialLineObserver(LogLineObserver):
+    """
+    A L{LogLineObserver} which can also be given the output after the last
+    newline, which L{LogLineObserver} never passes on.
+    """
+
+    def flushLines(self):
+        """
+        Pass on any output after the last newline of stdout or stderr, as a
+        final line. Call this once the log is finished.
+        """
+        for receiver in (self.stdoutParser, self.stderrParser):
+            # LineOnlyReceiver keeps a final line without a newline in its
+            # buffer until a newline arrives, which it never will.
+            if receiver._buffer:
+                line, receiver._buffer = receiver._buffer, ''
+                receiver.lineReceived(line)
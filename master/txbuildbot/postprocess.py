@@ -0,0 +1,43 @@
+"""
+Post-processing of build output away from the reactor thread.
+
+Steps parse their logs once the command has finished, and for big logs this
+can take long enough to stall the web status and the slave connections when
+several builds finish together. Functions passed to L{deferToPostProcessor}
+run in the reactor's thread pool instead, with a limit on how many run at
+once so the master isn't swamped either.
+
+Anything run this way must only work on the data it is given, since the
+status objects and the rest of buildbot are not thread-safe. The results are
+delivered on the reactor thread, where they can be applied to the step.
+"""
+
+from twisted.internet import defer, threads, reactor
+
+_semaphore = defer.DeferredSemaphore(2)
+
+
+
+def setConcurrency(limit):
+    """
+    Set how many post-processing jobs may run at once. Jobs which have already
+    been queued are not affected.
+
+    @type limit: L{int}
+    """
+    global _semaphore
+    _semaphore = defer.DeferredSemaphore(limit)
+    # The reactor's thread pool defaults to at most 10 threads.
+    if limit > 10:
+        reactor.suggestThreadPoolSize(limit)
+
+
+
+def deferToPostProcessor(f, *args, **kwargs):
+    """
+    Call C{f(*args, **kwargs)} in a thread, once fewer than the configured
+    number of post-processing jobs are running.
+
+    @return: a L{Deferred} firing with the result of C{f}
+    """
+    return _semaphore.run(threads.deferToThread, f, *args, **kwargs)
@@ -0,0 +1,41 @@
+"""
+Status receivers which watch every builder.
+"""
+
+from buildbot.status.base import StatusReceiver
+
+
+
+class BuilderWatcher(StatusReceiver):
+    """
+    A status receiver which subscribes to every builder it is told about,
+    and remembers them so that it can be unsubscribed from them again, as
+    L{buildbot.status.mail.MailNotifier} does.
+
+    @ivar watched: the L{BuilderStatus}es subscribed to
+    """
+
+    def __init__(self):
+        self.watched = []
+
+
+    def builderAdded(self, name, builder):
+        self.watched.append(builder)
+        return self
+
+
+    def builderRemoved(self, name):
+        self.watched = [builder for builder in self.watched
+                        if builder.getName() != name]
+
+
+    def stopWatching(self, status):
+        """
+        Unsubscribe from C{status} and from every builder subscribed to.
+
+        @type status: L{buildbot.status.master.Status}
+        """
+        status.unsubscribe(self)
+        for builder in self.watched:
+            builder.unsubscribe(self)
+        self.watched = []
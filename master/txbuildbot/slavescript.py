@@ -0,0 +1,31 @@
+"""
+Running small Python scripts on the build slaves.
+
+Some steps need a little more than a single command on the slave: running
+several processes at once, or working out what to run from the checkout.
+Rather than shipping files to every slave, the source of such a script is put
+on the command line of the slave's Python. It is hex encoded there, so that it
+has no newlines or quotes for the slave's shell to mangle on either POSIX or
+Windows.
+"""
+
+
+
+def pythonScript(python, source, *args):
+    """
+    Get a command which runs a Python script with some arguments.
+
+    @type python: L{list} of L{str}
+    @param python: the command to run Python with on the slave
+
+    @type source: L{str}
+    @param source: the source of the script, which gets its arguments as
+        C{sys.argv[1:]}
+
+    @param args: the arguments to the script, which may be renderables such
+        as L{buildbot.process.properties.Property}
+
+    @return: a L{list} suitable for the C{command} of a L{ShellCommand}
+    """
+    return list(python) + [
+        "-c", 'exec "%s".decode("hex")' % (source.encode('hex'),)] + list(args)
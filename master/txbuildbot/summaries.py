@@ -0,0 +1,152 @@
+"""
+An in-memory index of the recent finished builds of each branch on each
+builder, so that the boxes pages can show a branch's builds without
+unpickling every L{BuildStatus} back to the last build of that branch.
+"""
+
+from twisted.python import log
+
+from txbuildbot.buildindex import readJSON, writeJSON
+from txbuildbot.receiver import BuilderWatcher
+
+
+
+def summarizeBuild(build):
+    """
+    Get the summary of a finished build kept by L{BranchSummaries}.
+
+    @type build: L{BuildStatus}
+
+    @return: a L{dict} with the C{number}, C{revision} (C{got_revision}, or
+        C{None}), C{results} and C{text} of the build
+    """
+    try:
+        revision = build.getProperty("got_revision")
+    except KeyError:
+        revision = None
+    return {
+        'number': build.getNumber(),
+        'revision': revision,
+        'results': build.getResults(),
+        'text': list(build.getText()),
+        }
+
+
+
+class BranchSummaries(BuilderWatcher):
+    """
+    Summaries of the most recent finished builds of each branch on each
+    builder, kept up to date as builds finish and saved to C{path} when the
+    master shuts down.
+
+    Builds on the default branch are indexed under C{""}.
+
+    A branch with fewer than C{maxBuilds} builds can't be told from one whose
+    older builds just haven't been indexed, so once the history of a branch
+    has been searched on a builder, that is remembered too (see
+    L{markComplete}). From then on the builds in the index are all there are.
+
+    @ivar path: file the summaries are saved to, or C{None} before L{load}
+    @ivar maxBuilds: number of builds of each branch kept for each builder
+    """
+
+    filename = 'branch-summaries.json'
+
+    def __init__(self, maxBuilds=10):
+        BuilderWatcher.__init__(self)
+        self.maxBuilds = maxBuilds
+        self.path = None
+        self._builders = {}
+        self._complete = {}
+
+
+    def load(self, path):
+        """
+        Load the summaries saved in C{path}, and save them there from now on.
+        """
+        self.path = path
+        saved = readJSON(path, {})
+        self._builders = saved.get('builders', {})
+        self._complete = dict(
+            (builderName, set(branches))
+            for builderName, branches in saved.get('complete', {}).items())
+
+
+    def save(self):
+        """
+        Save the summaries to L{path}.
+        """
+        if self.path is None:
+            return
+        complete = dict((builderName, sorted(branches))
+                        for builderName, branches in self._complete.items())
+        try:
+            writeJSON(self.path, {'builders': self._builders,
+                                  'complete': complete})
+        except (IOError, OSError):
+            log.err(None, "Failed to save branch summaries to %s" % (
+                self.path,))
+
+
+    def record(self, builderName, branch, summary):
+        """
+        Add the summary of a finished build to the index, unless it is
+        already there.
+
+        @param branch: the branch of the build's source stamp
+
+        @param summary: the summary returned by L{summarizeBuild}
+        """
+        builds = self._builders.setdefault(builderName, {}).setdefault(
+            branch or "", [])
+        numbers = [build['number'] for build in builds]
+        if summary['number'] in numbers:
+            return
+        builds.append(summary)
+        builds.sort(key=lambda build: build['number'], reverse=True)
+        del builds[self.maxBuilds:]
+
+
+    def markComplete(self, builderName, branches):
+        """
+        Note that every finished build of some branches on a builder has been
+        recorded, because a search of the builder's history found fewer of
+        them than it was looking for.
+
+        @param branches: the branches, as returned by C{map_branches}; C{None}
+            is the default branch.
+        """
+        self._complete.setdefault(builderName, set()).update(
+            [branch or "" for branch in branches])
+
+
+    def getBuilds(self, builderName, branches, count):
+        """
+        Get the summaries of the most recent builds of some branches.
+
+        @param branches: the branches, as returned by C{map_branches}; C{None}
+            is the default branch.
+
+        @return: a L{list} of up to C{count} summaries, most recent first, or
+            C{None} if fewer than C{count} builds are indexed and older builds
+            may still exist.
+        """
+        branchBuilds = self._builders.get(builderName, {})
+        complete = self._complete.get(builderName, set())
+        builds = []
+        allIndexed = True
+        for branch in set([branch or "" for branch in branches]):
+            indexed = branchBuilds.get(branch, [])
+            builds.extend(indexed)
+            # Once builds have been dropped, older ones can't be served.
+            if branch not in complete or len(indexed) >= self.maxBuilds:
+                allIndexed = False
+        if len(builds) < count and not allIndexed:
+            return None
+        builds.sort(key=lambda build: build['number'], reverse=True)
+        return builds[:count]
+
+
+    def buildFinished(self, builderName, build, results):
+        self.record(builderName, build.getSourceStamp().branch,
+                    summarizeBuild(build))
@@ -0,0 +1,104 @@
+"""
+Fake status objects shared by the tests of the steps and status receivers.
+"""
+
+from buildbot.process.properties import Properties
+from buildbot.status.results import SUCCESS
+
+
+
+class FakeSourceStamp(object):
+    def __init__(self, branch=None):
+        self.branch = branch
+
+
+
+class FakeTestResult(object):
+    def __init__(self, results):
+        self.results = results
+
+    def getResults(self):
+        return self.results
+
+
+
+class FakeBuilderStatus(object):
+    """
+    @ivar builds: the builds returned by C{getBuild}, by number
+    @ivar requested: the numbers of the builds asked for
+    """
+
+    def __init__(self, basedir=None, builds=None, name="builder"):
+        self.basedir = basedir
+        if builds is None:
+            builds = {}
+        self.builds = builds
+        self.name = name
+        self.requested = []
+
+    def getName(self):
+        return self.name
+
+    def getBuild(self, number):
+        self.requested.append(number)
+        return self.builds.get(number)
+
+
+
+class FakeBuildStatus(object):
+    """
+    @param properties: the build's properties, besides C{branch}
+    """
+
+    def __init__(self, number=1, builder=None, branch=None, results=SUCCESS,
+                 previous=None, testResults=None, finished=True,
+                 **properties):
+        self.number = number
+        self.builder = builder
+        self.branch = branch
+        self.results = results
+        self.previous = previous
+        if testResults is None:
+            testResults = {}
+        self.testResults = testResults
+        self.finished = finished
+        self.properties = Properties()
+        self.properties.setProperty('branch', branch, 'test')
+        for name, value in properties.items():
+            self.properties.setProperty(name, value, 'test')
+
+    def getBuilder(self):
+        return self.builder
+
+    def getNumber(self):
+        return self.number
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def getProperties(self):
+        return self.properties
+
+    def getResults(self):
+        return self.results
+
+    def getText(self):
+        return ["build", "successful"]
+
+    def getSourceStamp(self):
+        return FakeSourceStamp(self.branch)
+
+    def getPreviousBuild(self):
+        return self.previous
+
+    def isFinished(self):
+        return self.finished
+
+    def getTestResults(self):
+        return self.testResults
+
+
+
+class FakeBuild(object):
+    def __init__(self, build_status):
+        self.build_status = build_status
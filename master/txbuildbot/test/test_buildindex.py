@@ -0,0 +1,152 @@
+import os
+
+from twisted.trial import unittest
+from buildbot.status.results import SUCCESS
+
+from txbuildbot.buildindex import TrunkBuildIndex, TrunkBuildIndexer
+from txbuildbot.test.fakes import FakeBuilderStatus, FakeBuildStatus
+
+
+
+class TrunkBuildIndexTests(unittest.TestCase):
+    """
+    Tests for L{TrunkBuildIndex}.
+    """
+
+    def setUp(self):
+        self.path = self.mktemp()
+
+
+    def test_lookupEmpty(self):
+        """
+        An index that has never been written doesn't know any revisions.
+        """
+        index = TrunkBuildIndex(self.path)
+        self.assertEqual(index.lookup('abc'), None)
+        self.assertEqual(index.latest(), None)
+
+
+    def test_lookupNone(self):
+        """
+        Looking up a C{None} revision finds nothing.
+        """
+        index = TrunkBuildIndex(self.path)
+        index.record('abc', 1)
+        self.assertEqual(index.lookup(None), None)
+
+
+    def test_recordPersists(self):
+        """
+        Revisions recorded in a L{TrunkBuildIndex} can be looked up through
+        another instance using the same file.
+        """
+        TrunkBuildIndex(self.path).record('abc', 12)
+        index = TrunkBuildIndex(self.path)
+        self.assertEqual(index.lookup('abc'), 12)
+        self.assertEqual(index.latest(), ('abc', 12))
+
+
+    def test_recordKeepsNewest(self):
+        """
+        If a revision is built more than once, the index remembers the most
+        recent build of it.
+        """
+        index = TrunkBuildIndex(self.path)
+        index.record('abc', 12)
+        index.record('abc', 10)
+        self.assertEqual(index.lookup('abc'), 12)
+        index.record('abc', 15)
+        self.assertEqual(TrunkBuildIndex(self.path).lookup('abc'), 15)
+
+
+    def test_latest(self):
+        """
+        L{TrunkBuildIndex.latest} returns the revision and number of the
+        highest-numbered build.
+        """
+        index = TrunkBuildIndex(self.path)
+        index.record('abc', 3)
+        index.record('def', 7)
+        index.record('ghi', 5)
+        self.assertEqual(index.latest(), ('def', 7))
+
+
+    def test_maxEntries(self):
+        """
+        Once more than C{maxEntries} revisions are recorded, the oldest builds
+        are forgotten.
+        """
+        index = TrunkBuildIndex(self.path)
+        index.maxEntries = 2
+        index.record('abc', 1)
+        index.record('def', 2)
+        index.record('ghi', 3)
+        index = TrunkBuildIndex(self.path)
+        self.assertEqual(index.lookup('abc'), None)
+        self.assertEqual(index.lookup('def'), 2)
+        self.assertEqual(index.lookup('ghi'), 3)
+
+
+    def test_corruptIndex(self):
+        """
+        An index file that can't be decoded is treated as empty.
+        """
+        f = open(self.path, 'wb')
+        f.write('{"abc": ')
+        f.close()
+        index = TrunkBuildIndex(self.path)
+        self.assertEqual(index.lookup('abc'), None)
+        self.assertEqual(len(self.flushLoggedErrors()), 1)
+
+
+
+class TrunkBuildIndexerTests(unittest.TestCase):
+    """
+    Tests for L{TrunkBuildIndexer}.
+    """
+
+    def setUp(self):
+        basedir = self.mktemp()
+        os.makedirs(basedir)
+        self.builder = FakeBuilderStatus(basedir)
+        self.indexer = TrunkBuildIndexer()
+
+
+    def test_builderAdded(self):
+        """
+        L{TrunkBuildIndexer} asks to be told about every builder's builds.
+        """
+        self.assertIdentical(
+            self.indexer.builderAdded('lint', self.builder), self.indexer)
+
+
+    def test_trunkBuildFinished(self):
+        """
+        When a build of trunk finishes, its revision is recorded in the
+        builder's index.
+        """
+        build = FakeBuildStatus(5, self.builder, got_revision='abc')
+        self.indexer.buildFinished('lint', build, SUCCESS)
+        self.assertEqual(
+            TrunkBuildIndex.forBuilder(self.builder).lookup('abc'), 5)
+
+
+    def test_branchBuildFinished(self):
+        """
+        Builds of branches are not indexed.
+        """
+        build = FakeBuildStatus(5, self.builder, got_revision='abc',
+                                branch='/branches/foo-1234')
+        self.indexer.buildFinished('lint', build, SUCCESS)
+        self.assertEqual(
+            TrunkBuildIndex.forBuilder(self.builder).latest(), None)
+
+
+    def test_unknownRevision(self):
+        """
+        Builds that didn't get a revision are not indexed.
+        """
+        build = FakeBuildStatus(5, self.builder)
+        self.indexer.buildFinished('lint', build, SUCCESS)
+        self.assertEqual(
+            TrunkBuildIndex.forBuilder(self.builder).latest(), None)
@@ -0,0 +1,139 @@
+import os
+
+from twisted.trial import unittest
+
+from txbuildbot.durations import TestDurationDatabase
+from txbuildbot.durations import moduleForTest, moduleDurations
+from txbuildbot.durations import slowestFirst, estimateDuration
+from txbuildbot.test.fakes import FakeBuilderStatus
+
+
+
+class ModuleDurationsTests(unittest.TestCase):
+    """
+    Tests for L{moduleForTest}, L{moduleDurations}, L{slowestFirst} and
+    L{estimateDuration}.
+    """
+
+    def test_moduleForTest(self):
+        """
+        The module of a test is its id without the class and method names.
+        """
+        self.assertEqual(
+            moduleForTest("twisted.test.test_defer.DeferredTests.test_a"),
+            "twisted.test.test_defer")
+        self.assertEqual(moduleForTest("doctest"), "doctest")
+
+
+    def test_moduleDurations(self):
+        """
+        The durations of the tests in a module are added up.
+        """
+        self.assertEqual(
+            moduleDurations([("a.test_b.BTests.test_one", 1.5),
+                             ("a.test_b.BTests.test_two", 0.5),
+                             ("a.test_c.CTests.test_one", 0.25)]),
+            {"a.test_b": 2.0, "a.test_c": 0.25})
+
+
+    def test_slowestFirst(self):
+        """
+        Modules without any history come first, then the slowest.
+        """
+        self.assertEqual(
+            slowestFirst({"a.test_b": 1.0, "a.test_c": 5.0},
+                         ["a.test_b", "a.test_c", "a.test_d"]),
+            ["a.test_d", "a.test_c", "a.test_b"])
+
+
+    def test_estimateDuration(self):
+        """
+        L{estimateDuration} adds up the medians of the modules, using
+        C{default} for modules with no history.
+        """
+        self.assertEqual(
+            estimateDuration({"a.test_b": 1.0, "a.test_c": 2.0},
+                             ["a.test_b", "a.test_d"], 10.0),
+            11.0)
+
+
+    def test_estimateDurationNoHistory(self):
+        """
+        Without the history of any of the modules, there is no estimate.
+        """
+        self.assertEqual(
+            estimateDuration({"a.test_b": 1.0}, ["a.test_c", "a.test_d"]),
+            None)
+
+
+
+class TestDurationDatabaseTests(unittest.TestCase):
+    """
+    Tests for L{TestDurationDatabase}.
+    """
+
+    def setUp(self):
+        self.database = TestDurationDatabase(self.mktemp())
+
+
+    def test_empty(self):
+        """
+        A builder without any recorded builds has no medians.
+        """
+        self.assertEqual(self.database.getMedians("lint"), {})
+
+
+    def test_medians(self):
+        """
+        L{TestDurationDatabase.getMedians} returns the median duration of each
+        module on a builder, ignoring other builders.
+        """
+        self.database.record("trial", 1, "trial", {"a.test_b": 1.0, "a.test_c": 4.0})
+        self.database.record("trial", 2, "trial", {"a.test_b": 3.0})
+        self.database.record("trial", 3, "trial", {"a.test_b": 2.0, "a.test_c": 5.0})
+        self.database.record("other", 1, "trial", {"a.test_b": 100.0})
+        self.assertEqual(self.database.getMedians("trial"),
+                         {"a.test_b": 2.0, "a.test_c": 4.5})
+
+
+    def test_recordReplaces(self):
+        """
+        Recording a build again replaces what was recorded for it before.
+        """
+        self.database.record("trial", 1, "trial", {"a.test_b": 1.0})
+        self.database.record("trial", 1, "trial", {"a.test_b": 3.0})
+        self.assertEqual(self.database.getMedians("trial"), {"a.test_b": 3.0})
+
+
+    def test_window(self):
+        """
+        Only the most recent C{window} builds of a builder are kept.
+        """
+        self.database.window = 2
+        self.database.record("trial", 1, "trial", {"a.test_b": 100.0})
+        self.database.record("trial", 2, "trial", {"a.test_b": 1.0})
+        self.database.record("trial", 3, "trial", {"a.test_b": 3.0})
+        self.assertEqual(self.database.getMedians("trial"), {"a.test_b": 2.0})
+
+
+    def test_steps(self):
+        """
+        Each step of a build is recorded separately, and a step being
+        recorded again only replaces its own durations.
+        """
+        self.database.record("trial", 1, "trial-select", {"a.test_b": 1.0})
+        self.database.record("trial", 1, "trial-poll", {"a.test_b": 2.0})
+        self.database.record("trial", 1, "trial-epoll", {"a.test_b": 5.0})
+        self.database.record("trial", 1, "trial-epoll", {"a.test_b": 3.0})
+        self.assertEqual(self.database.getMedians("trial"), {"a.test_b": 2.0})
+
+
+    def test_forBuilder(self):
+        """
+        The database for a builder is kept in the master's base directory.
+        """
+        masterdir = os.path.abspath(self.mktemp())
+        database = TestDurationDatabase.forBuilder(
+            FakeBuilderStatus(os.path.join(masterdir, "lint")))
+        self.assertEqual(database.path,
+                         os.path.join(masterdir, "test_durations.sqlite"))
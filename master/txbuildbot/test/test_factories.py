@@ -0,0 +1,66 @@
+from twisted.trial import unittest
+
+from twisted_steps import RemovePYCs
+from twisted_factories import TwistedCheckerBuildFactory
+from twisted_factories import TwistedReactorsBuildFactory, TwistedTrial
+
+
+
+class TwistedCheckerBuildFactoryTests(unittest.TestCase):
+    """
+    Tests for L{TwistedCheckerBuildFactory}.
+    """
+
+    def test_equal(self):
+        """
+        Factories built with the same arguments compare equal, so that
+        reconfiguring the master doesn't restart their builders.
+        """
+        self.assertEqual(TwistedCheckerBuildFactory([], incremental=True),
+                         TwistedCheckerBuildFactory([], incremental=True))
+
+
+
+
+class TwistedReactorsBuildFactoryTests(unittest.TestCase):
+    """
+    Tests for L{TwistedReactorsBuildFactory}.
+    """
+
+    def stepClasses(self, factory):
+        return [stepClass for stepClass, kwargs in factory.steps]
+
+
+    def test_equalImpactSelection(self):
+        """
+        Factories built with C{impactSelection} compare equal, so that
+        reconfiguring the master doesn't restart their builders.
+        """
+        self.assertEqual(
+            TwistedReactorsBuildFactory([], impactSelection=True),
+            TwistedReactorsBuildFactory([], impactSelection=True))
+
+
+    def test_cleanBytecode(self):
+        """
+        By default, the bytecode is removed before the tests for each reactor.
+        """
+        classes = self.stepClasses(TwistedReactorsBuildFactory(
+                [], reactors=["select", "poll"]))
+        self.assertEqual(classes.count(RemovePYCs), 2)
+        self.assertEqual(classes.count(TwistedTrial), 2)
+        self.assertEqual(classes.index(RemovePYCs) + 2,
+                         classes.index(TwistedTrial))
+
+
+    def test_cleanBytecodeOnce(self):
+        """
+        With C{cleanBytecodeOnce}, the bytecode is removed exactly once,
+        before the tests for the first reactor.
+        """
+        classes = self.stepClasses(TwistedReactorsBuildFactory(
+                [], reactors=["select", "poll"], cleanBytecodeOnce=True))
+        self.assertEqual(classes.count(RemovePYCs), 1)
+        self.assertEqual(classes.count(TwistedTrial), 2)
+        self.assertTrue(classes.index(RemovePYCs) <
+                        classes.index(TwistedTrial))
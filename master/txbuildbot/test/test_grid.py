@@ -0,0 +1,111 @@
+from twisted.trial import unittest
+from buildbot.status.results import SUCCESS, FAILURE
+
+from txbuildbot.grid import GridModel
+from txbuildbot.test.fakes import FakeBuildStatus
+
+
+
+def summary(number, revision, results=SUCCESS):
+    return {'number': number, 'revision': revision, 'results': results,
+            'text': []}
+
+
+
+class GridModelTests(unittest.TestCase):
+    """
+    Tests for L{GridModel}.
+    """
+
+    def test_getRows(self):
+        """
+        L{GridModel.getRows} returns the builds of each revision of a branch,
+        most recent revision first.
+        """
+        grid = GridModel()
+        grid.record("lint", "foo", summary(1, "a"))
+        grid.record("lint", "foo", summary(2, "b"))
+        grid.record("pyflakes", "foo", summary(7, "a", FAILURE))
+        grid.record("lint", "bar", summary(3, "c"))
+        self.assertEqual(grid.getRows("foo"), [
+            ("b", {"lint": summary(2, "b")}),
+            ("a", {"lint": summary(1, "a"),
+                   "pyflakes": summary(7, "a", FAILURE)})])
+        self.assertEqual([revision for revision, builds
+                          in grid.getRows("foo", 1)], ["b"])
+        self.assertEqual(grid.getRows("baz"), [])
+
+
+    def test_defaultBranch(self):
+        """
+        Builds without a branch are kept under the default branch.
+        """
+        grid = GridModel()
+        grid.record("lint", None, summary(1, "a"))
+        self.assertEqual(grid.getRows(None), [("a", {"lint": summary(1, "a")})])
+        self.assertEqual(grid.getRows(""), grid.getRows(None))
+
+
+    def test_latestBuild(self):
+        """
+        Only the latest build of a revision on each builder is kept, and
+        builds without a revision are ignored.
+        """
+        grid = GridModel()
+        grid.record("lint", "foo", summary(2, "a"))
+        grid.record("lint", "foo", summary(1, "a", FAILURE))
+        grid.record("lint", "foo", summary(3, None))
+        self.assertEqual(grid.getRows("foo"),
+                         [("a", {"lint": summary(2, "a")})])
+
+
+    def test_maxRevisions(self):
+        """
+        Only the C{maxRevisions} most recent revisions of a branch are kept.
+        """
+        grid = GridModel(maxRevisions=2)
+        for number, revision in enumerate("abc"):
+            grid.record("lint", "foo", summary(number, revision))
+        self.assertEqual([revision for revision, builds
+                          in grid.getRows("foo")], ["c", "b"])
+
+
+    def test_maxBranches(self):
+        """
+        Only the C{maxBranches} most recently built branches are kept.
+        """
+        grid = GridModel(maxBranches=2)
+        grid.record("lint", "foo", summary(1, "a"))
+        grid.record("lint", "bar", summary(2, "b"))
+        grid.record("lint", "foo", summary(3, "c"))
+        grid.record("lint", "baz", summary(4, "d"))
+        self.assertEqual(grid.getRows("bar"), [])
+        self.assertEqual(len(grid.getRows("foo")), 2)
+        self.assertEqual(len(grid.getRows("baz")), 1)
+
+
+    def test_buildFinished(self):
+        """
+        Builds are added to the grid as they finish.
+        """
+        grid = GridModel()
+        self.assertIdentical(grid.builderAdded("lint", None), grid)
+        grid.buildFinished(
+            "lint", FakeBuildStatus(5, branch="foo", got_revision="a"), SUCCESS)
+        self.assertEqual([(revision, builds["lint"]['number'])
+                          for revision, builds in grid.getRows("foo")],
+                         [("a", 5)])
+
+
+    def test_saveAndLoad(self):
+        """
+        A saved grid can be loaded again.
+        """
+        path = self.mktemp()
+        grid = GridModel()
+        grid.load(path)
+        grid.record("lint", "foo", summary(1, "a"))
+        grid.save()
+        loaded = GridModel()
+        loaded.load(path)
+        self.assertEqual(loaded.getRows("foo"), grid.getRows("foo"))
@@ -0,0 +1,345 @@
+import os
+import sys
+import subprocess
+
+from twisted.trial import unittest
+from buildbot.process.properties import Properties, WithProperties
+from buildbot.status.results import SUCCESS, FAILURE
+
+from txbuildbot.impact import FindImpactedTests, ImpactedTests
+from txbuildbot.impact import parseImpactedTests, testIdForResult
+from txbuildbot.impact import previousBuildsOfBranch, failedTests
+from txbuildbot.test.fakes import FakeTestResult, FakeBuildStatus
+
+
+
+class ParseImpactedTestsTests(unittest.TestCase):
+    """
+    Tests for L{parseImpactedTests}.
+    """
+
+    def test_modules(self):
+        """
+        Each line of the output names a test module.
+        """
+        self.assertEqual(
+            parseImpactedTests("twisted.test.test_a\ntwisted.test.test_b\n"),
+            set(["twisted.test.test_a", "twisted.test.test_b"]))
+
+
+    def test_wholeSuite(self):
+        """
+        A C{*} line, or no modules at all, means the whole suite should run.
+        """
+        self.assertEqual(parseImpactedTests("*\n"), None)
+        self.assertEqual(parseImpactedTests(""), None)
+
+
+
+class TestIdForResultTests(unittest.TestCase):
+    """
+    Tests for L{testIdForResult}.
+    """
+
+    def test_testId(self):
+        """
+        The parts of the name of a test result are joined into its id.
+        """
+        self.assertEqual(
+            testIdForResult(("twisted", "test", "test_a", "ATests",
+                             "test_one"), "twisted"),
+            "twisted.test.test_a.ATests.test_one")
+
+
+    def test_reactor(self):
+        """
+        The name of the reactor the test ran with is ignored.
+        """
+        self.assertEqual(
+            testIdForResult(("epoll", "twisted", "test", "test_a", "ATests",
+                             "test_one"), "twisted"),
+            "twisted.test.test_a.ATests.test_one")
+
+
+    def test_otherPackage(self):
+        """
+        Tests outside the package are ignored.
+        """
+        self.assertEqual(
+            testIdForResult(("other", "test_a", "ATests", "test_one"),
+                            "twisted"),
+            None)
+
+
+
+class HistoryTests(unittest.TestCase):
+    """
+    Tests for L{previousBuildsOfBranch} and L{failedTests}.
+    """
+
+    def test_previousBuildsOfBranch(self):
+        """
+        Only the most recent finished builds of the same branch are found.
+        """
+        first = FakeBuildStatus(branch="foo")
+        second = FakeBuildStatus(branch="foo", previous=first)
+        other = FakeBuildStatus(branch="bar", previous=second)
+        running = FakeBuildStatus(branch="foo", previous=other,
+                                  finished=False)
+        build = FakeBuildStatus(branch="foo", previous=running)
+        self.assertEqual(list(previousBuildsOfBranch(build, 1, 50)),
+                         [second])
+        self.assertEqual(list(previousBuildsOfBranch(build, 5, 50)),
+                         [second, first])
+        self.assertEqual(list(previousBuildsOfBranch(build, 5, 2)), [])
+
+
+    def test_failedTests(self):
+        """
+        L{failedTests} returns the ids of the failed tests of a build.
+        """
+        build = FakeBuildStatus(branch="foo", testResults={
+            ("select", "twisted", "test_a", "ATests", "test_one"):
+                FakeTestResult(FAILURE),
+            ("select", "twisted", "test_a", "ATests", "test_two"):
+                FakeTestResult(SUCCESS),
+            })
+        self.assertEqual(failedTests(build, "twisted"),
+                         set(["twisted.test_a.ATests.test_one"]))
+
+
+
+class ImpactedTestsTests(unittest.TestCase):
+    """
+    Tests for L{ImpactedTests}.
+    """
+
+    def test_impacted(self):
+        """
+        The impacted test modules are used if they were found.
+        """
+        props = Properties()
+        props.setProperty('impacted_tests', ['twisted.test.test_a'], 'test')
+        self.assertEqual(
+            ImpactedTests(['twisted']).getRenderingFor(props),
+            ['twisted.test.test_a'])
+
+
+    def test_default(self):
+        """
+        The default tests are rendered if no test modules were chosen.
+        """
+        props = Properties()
+        props.setProperty('test-case-name', 'twisted.web', 'test')
+        self.assertEqual(
+            ImpactedTests([WithProperties("%(test-case-name:~twisted)s")]
+                          ).getRenderingFor(props),
+            ['twisted.web'])
+
+
+
+class OrderModulesTests(unittest.TestCase):
+    """
+    Tests for L{FindImpactedTests.orderModules}.
+    """
+
+    def test_orderModules(self):
+        """
+        The impacted modules are put in the property slowest first, and the
+        step's text shows how long they should take.
+        """
+        step = FindImpactedTests()
+        properties = {}
+        step.setProperty = lambda name, value, source: properties.update(
+            {name: value})
+        step.addCompleteLog = lambda name, text: None
+        step.modules = set(["a.test_b", "a.test_c"])
+        step.orderModules({"a.test_b": 60.0, "a.test_c": 120.0})
+        self.assertEqual(properties,
+                         {"impacted_tests": ["a.test_c", "a.test_b"]})
+        self.assertEqual(step.describe(True),
+                         ["find", "impacted", "tests", "(~3 mins, 0 secs)"])
+
+
+    def test_noHistory(self):
+        """
+        Without the durations of any of the impacted modules, there is no
+        estimate in the step's text.
+        """
+        step = FindImpactedTests()
+        step.setProperty = lambda name, value, source: None
+        step.addCompleteLog = lambda name, text: None
+        step.modules = set(["a.test_b", "a.test_c"])
+        step.orderModules({})
+        self.assertEqual(step.describe(True), ["find", "impacted", "tests"])
+
+
+
+class SourceTests(unittest.TestCase):
+    """
+    Tests for the script run by L{FindImpactedTests} on the slave.
+    """
+
+    def setUp(self):
+        self.basedir = self.mktemp()
+        os.makedirs(self.basedir)
+        self.git('init', '-q')
+        self.write('pkg/__init__.py', '')
+        self.write('pkg/test/__init__.py', '')
+        self.write('pkg/base.py', '')
+        self.write('pkg/uses.py', 'from pkg import base\n')
+        self.write('pkg/tagged.py',
+                   '# -*- test-case-name: pkg.test.test_tagged -*-\n')
+        self.write('pkg/test/test_uses.py', 'import pkg.uses as uses\n')
+        self.write('pkg/test/test_tagged.py', '')
+        for i in range(4):
+            self.write('pkg/test/test_other%d.py' % (i,), '')
+        self.commit()
+
+
+    def git(self, *args):
+        subprocess.check_call(
+            ['git', '-c', 'user.name=test', '-c', 'user.email=test@example',
+             '--work-tree', '.', '--git-dir', '.git'] + list(args),
+            cwd=self.basedir)
+
+
+    def write(self, path, content):
+        path = os.path.join(self.basedir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'a')
+        f.write(content)
+        f.close()
+
+
+    def commit(self):
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', 'commit')
+
+
+    def findImpacted(self, base='HEAD~1'):
+        process = subprocess.Popen(
+            [sys.executable, '-c', FindImpactedTests.source, 'pkg', base],
+            stdout=subprocess.PIPE, cwd=self.basedir)
+        stdout = process.communicate()[0]
+        self.assertEqual(process.returncode, 0)
+        return stdout.splitlines()
+
+
+    def test_importers(self):
+        """
+        Test modules which import a changed module, directly or through other
+        modules, are affected.
+        """
+        self.write('pkg/base.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(), ['pkg.test.test_uses'])
+
+
+    def test_tags(self):
+        """
+        The test modules named in the C{test-case-name} tag of a changed
+        module are affected.
+        """
+        self.write('pkg/tagged.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(), ['pkg.test.test_tagged'])
+
+
+    def test_changedTests(self):
+        """
+        Changed test modules are affected.
+        """
+        self.write('pkg/test/test_other0.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(), ['pkg.test.test_other0'])
+
+
+    def test_notPython(self):
+        """
+        If something other than a Python file in the package changed, the
+        whole suite runs.
+        """
+        self.write('pkg/_speedups.c', '')
+        self.commit()
+        self.assertEqual(self.findImpacted(), ['*'])
+
+
+    def test_mostTests(self):
+        """
+        If most of the test modules are affected, the whole suite runs.
+        """
+        for i in range(3):
+            self.write('pkg/test/test_other%d.py' % (i,), 'x = 1\n')
+        self.write('pkg/base.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(), ['*'])
+
+
+    def test_multilineImports(self):
+        """
+        Imports in parentheses over several lines are found.
+        """
+        self.write('pkg/test/test_other1.py',
+                   'from pkg import (\n    tagged,\n    uses)\n')
+        self.commit()
+        self.write('pkg/uses.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(),
+                         ['pkg.test.test_other1', 'pkg.test.test_uses'])
+
+
+    def test_relativeImports(self):
+        """
+        Relative imports are found.
+        """
+        self.write('pkg/test/test_other1.py', 'from .. import tagged\n')
+        self.write('pkg/test/test_other2.py', 'from ..tagged import x\n')
+        self.commit()
+        self.write('pkg/tagged.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(), [
+                'pkg.test.test_other1', 'pkg.test.test_other2',
+                'pkg.test.test_tagged'])
+
+
+    def test_implicitRelativeImports(self):
+        """
+        Imports of modules in the same package without the package's name are
+        found.
+        """
+        self.write('pkg/test/test_other1.py', 'import test_other0\n')
+        self.commit()
+        self.write('pkg/test/test_other0.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(),
+                         ['pkg.test.test_other0', 'pkg.test.test_other1'])
+
+
+    def test_namedModules(self):
+        """
+        Modules in the package named in strings, as for C{namedAny} or in
+        plugins, are taken to be imported.
+        """
+        self.write('pkg/test/test_other1.py',
+                   'from twisted.python.reflect import namedAny\n'
+                   'base = namedAny("pkg.base")\n')
+        self.commit()
+        self.write('pkg/base.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(),
+                         ['pkg.test.test_other1', 'pkg.test.test_uses'])
+
+
+    def test_unparseable(self):
+        """
+        Modules which can't be parsed are affected, since their imports
+        can't be found.
+        """
+        self.write('pkg/test/test_other1.py', 'import (\n')
+        self.commit()
+        self.write('pkg/test/test_other0.py', 'x = 1\n')
+        self.commit()
+        self.assertEqual(self.findImpacted(),
+                         ['pkg.test.test_other0', 'pkg.test.test_other1'])
@@ -1,15 +1,25 @@
+import os
+import sys
+import time
+import subprocess
+
 from twisted.trial import unittest
+from twisted.internet import defer
 from buildbot.status.results import SUCCESS, WARNINGS
 from buildbot.test.util.steps import BuildStepMixin
 from buildbot.test.fake.remotecommand import ExpectShell
 
-from txbuildbot.lint import LintStep
+from txbuildbot.lint import LintStep, LintLogObserver
 from txbuildbot.lint import CheckDocumentation
 from txbuildbot.lint import CheckCodesByTwistedChecker, TwistedCheckerError
 from txbuildbot.lint import PyFlakes, PyFlakesError
+from txbuildbot.lint import moduleNameForPath, extractChangedModules
+from txbuildbot.lint import loadLintResults, BaselineCache
+from txbuildbot.buildindex import TrunkBuildIndex
+from txbuildbot.test.fakes import FakeBuilderStatus, FakeBuildStatus, FakeBuild
 
 
-## TODO: Add tests for getLastBuild/getPreviousLog
+## TODO: Add tests for getPreviousLog
 
 class TestComputeDiffference(unittest.TestCase):
     """
@@ -90,6 +100,10 @@ class LintStepMixin(BuildStepMixin):
         """
         BuildStepMixin.setupStep(self, step)
         self.step.getPreviousLog = lambda: oldText
+        basedir = self.mktemp()
+        os.makedirs(basedir)
+        self.step.build.build_status.getBuilder().basedir = basedir
+        self.step.build.build_status.getNumber.return_value = 1
         self.expectCommands(
                 ExpectShell(command=command or step.__class__.command, workdir='wkdir', usePTY='slave-config')
                 + ExpectShell.log('stdio', stdout=newText)
@@ -98,6 +112,23 @@ class LintStepMixin(BuildStepMixin):
 
 
 
+class FakeLintParser(object):
+    """
+    A L{LintParser} which hands all of the output to C{computeErrors}.
+    """
+
+    def __init__(self, computeErrors):
+        self.computeErrors = computeErrors
+        self.lines = []
+
+    def lineReceived(self, line):
+        self.lines.append(line)
+
+    def getErrors(self):
+        return self.computeErrors('\n'.join(self.lines))
+
+
+
 class FakeLintStep(LintStep):
     """
     A minimal L{LintStep} subclass for testing.
@@ -114,11 +145,14 @@ class FakeLintStep(LintStep):
         @param oldErrors: errors to return when C{logText} is C{'old'}
         @param newErrors: errors to return when C{logText} is C{'new'}
         """
+        self.oldErrors = oldErrors
+        self.newErrors = newErrors
         LintStep.__init__(self)
         self.factory[1].clear()
         self.addFactoryArguments(oldErrors=oldErrors, newErrors=newErrors)
-        self.oldErrors = oldErrors
-        self.newErrors = newErrors
+
+    def makeParser(self):
+        return FakeLintParser(self.computeErrors)
 
     def computeErrors(self, logText):
         if logText == 'old':
@@ -131,6 +165,522 @@ class FakeLintStep(LintStep):
 
 
 
+class GetLastBuildTests(unittest.TestCase):
+    """
+    Tests for L{LintStep._getLastBuild}.
+    """
+
+    def setUp(self):
+        basedir = self.mktemp()
+        os.makedirs(basedir)
+        self.builds = {}
+        self.builder = FakeBuilderStatus(basedir, self.builds)
+        self.index = TrunkBuildIndex.forBuilder(self.builder)
+
+
+    def addBuild(self, number, revision, branch=None):
+        build = FakeBuildStatus(number, self.builder, branch,
+                                got_revision=revision)
+        self.builds[number] = build
+        return build
+
+
+    def getLastBuild(self, number, lintRevision):
+        step = FakeLintStep(oldErrors={}, newErrors={})
+        step.build = FakeBuild(FakeBuildStatus(number, self.builder))
+        step.getProperty = {'lint_revision': lintRevision}.get
+        return step._getLastBuild()
+
+
+    def test_firstBuild(self):
+        """
+        The first build of a builder has no previous build.
+        """
+        self.assertIdentical(self.getLastBuild(0, 'abc'), None)
+
+
+    def test_indexedRevision(self):
+        """
+        If the trunk build of C{lint_revision} is in the builder's
+        L{TrunkBuildIndex}, it is fetched without looking at other builds.
+        """
+        expected = self.addBuild(3, 'abc')
+        self.addBuild(7, 'def')
+        self.index.record('abc', 3)
+        self.index.record('def', 7)
+        self.assertIdentical(self.getLastBuild(10, 'abc'), expected)
+        self.assertEqual(self.builder.requested, [3])
+
+
+    def test_indexedLatest(self):
+        """
+        If there is no trunk build of C{lint_revision} at all, the most recent
+        indexed trunk build is used.
+        """
+        self.addBuild(3, 'abc')
+        expected = self.addBuild(7, 'def')
+        self.index.record('abc', 3)
+        self.index.record('def', 7)
+        self.assertIdentical(self.getLastBuild(10, 'xyz'), expected)
+        self.assertEqual(self.builder.requested[-1], 7)
+
+
+    def test_unindexedRevision(self):
+        """
+        If C{lint_revision} isn't indexed, because it was built before the
+        index existed, the build history is searched for it before falling
+        back to the most recent indexed trunk build.
+        """
+        expected = self.addBuild(3, 'abc')
+        self.addBuild(7, 'def')
+        self.index.record('def', 7)
+        self.assertIdentical(self.getLastBuild(10, 'abc'), expected)
+        self.assertEqual(self.builder.requested, [9, 8, 7, 6, 5, 4, 3])
+
+
+    def test_unindexed(self):
+        """
+        If nothing has been indexed, the build history is searched for the
+        trunk build of C{lint_revision}.
+        """
+        expected = self.addBuild(3, 'abc')
+        self.addBuild(4, 'abc', branch='/branches/foo-1234')
+        self.assertIdentical(self.getLastBuild(5, 'abc'), expected)
+        self.assertEqual(self.builder.requested, [4, 3])
+
+
+
+class BaselineTests(unittest.TestCase):
+    """
+    Tests for L{LintStep.saveBaseline} and L{LintStep.loadBaseline}.
+    """
+
+    def setUp(self):
+        basedir = self.mktemp()
+        os.makedirs(basedir)
+        self.builder = FakeBuilderStatus(basedir, {})
+
+
+    def makeStep(self, stepClass, **properties):
+        step = stepClass()
+        step.build = FakeBuild(FakeBuildStatus(1, self.builder))
+        step.getProperty = properties.get
+        return step
+
+
+    def test_roundTrip(self):
+        """
+        Errors saved by a trunk build are loaded by later builds whose
+        C{lint_revision} is the trunk build's revision.
+        """
+        errors = CheckCodesByTwistedChecker.computeErrors(
+            "\n".join(CheckCodesByTwistedCheckerTests.logText))
+        self.makeStep(CheckCodesByTwistedChecker, got_revision='abc').saveBaseline(errors)
+        step = self.makeStep(CheckCodesByTwistedChecker, lint_revision='abc')
+        self.assertEqual(step.loadBaseline('abc'), errors)
+
+
+    def test_roundTripPyFlakes(self):
+        """
+        L{PyFlakes} errors survive being saved and loaded.
+        """
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        self.makeStep(PyFlakes, got_revision='abc').saveBaseline(errors)
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline('abc'), errors)
+
+
+    def test_branchNotSaved(self):
+        """
+        Builds of branches don't save a baseline.
+        """
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        self.makeStep(PyFlakes, got_revision='abc',
+                      branch='/branches/foo-1234').saveBaseline(errors)
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline('abc'), None)
+
+
+    def test_missing(self):
+        """
+        L{LintStep.loadBaseline} returns C{None} if no baseline was saved for
+        the revision.
+        """
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline('abc'), None)
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline(None), None)
+
+
+    def test_otherVersion(self):
+        """
+        Baselines saved with a different C{baselineVersion} are ignored.
+        """
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        step = self.makeStep(PyFlakes, got_revision='abc')
+        step.baselineVersion = 0
+        step.saveBaseline(errors)
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline('abc'), None)
+
+
+    def test_getPreviousErrorsUsesBaseline(self):
+        """
+        L{LintStep.getPreviousErrors} uses the baseline for C{lint_revision}
+        rather than parsing the output of the previous build.
+        """
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        self.makeStep(PyFlakes, got_revision='abc').saveBaseline(errors)
+        step = self.makeStep(PyFlakes, lint_revision='abc')
+        step.getPreviousLog = lambda: self.fail("Parsed previous log")
+        d = step.getPreviousErrors()
+        d.addCallback(self.assertEqual, errors)
+        return d
+
+
+    def test_getPreviousErrorsParsesOnce(self):
+        """
+        Without a baseline, steps comparing with the same C{lint_revision}
+        share one parse of the output of the previous build, including one
+        which is still running, and later steps reuse its result.
+        """
+        parsed = []
+        def makeStep():
+            step = self.makeStep(PyFlakes, lint_revision='abc')
+            def getPreviousLog():
+                parsed.append(step)
+                return "\n".join(PyFlakesTests.logText)
+            step.getPreviousLog = getPreviousLog
+            return step
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        d = defer.gatherResults([makeStep().getPreviousErrors(),
+                                 makeStep().getPreviousErrors()])
+        d.addCallback(self.assertEqual, [errors, errors])
+        d.addCallback(lambda ignored: makeStep().getPreviousErrors())
+        d.addCallback(self.assertEqual, errors)
+        d.addCallback(lambda ignored: self.assertEqual(len(parsed), 1))
+        return d
+
+
+    def test_cached(self):
+        """
+        Once a baseline has been loaded, other steps get it from
+        C{baselineCache} without reading it again.
+        """
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        step = self.makeStep(PyFlakes, got_revision='abc')
+        step.saveBaseline(errors)
+        loaded = self.makeStep(PyFlakes).loadBaseline('abc')
+        os.remove(step._getBaselinePath('abc'))
+        self.assertIdentical(self.makeStep(PyFlakes).loadBaseline('abc'), loaded)
+
+
+    def test_saveInvalidatesCache(self):
+        """
+        Saving a baseline replaces any cached copy of the previous one for the
+        same revision.
+        """
+        self.makeStep(PyFlakes, got_revision='abc').saveBaseline(
+            {'pyflakes': set()})
+        self.makeStep(PyFlakes).loadBaseline('abc')
+        errors = PyFlakes.computeErrors("\n".join(PyFlakesTests.logText))
+        self.makeStep(PyFlakes, got_revision='abc').saveBaseline(errors)
+        self.assertEqual(self.makeStep(PyFlakes).loadBaseline('abc'), errors)
+
+
+    def test_prune(self):
+        """
+        Only the most recent C{maxBaselines} baselines are kept.
+        """
+        for mtime, revision in enumerate(['abc', 'def', 'ghi']):
+            step = self.makeStep(PyFlakes, got_revision=revision)
+            step.maxBaselines = 2
+            step.saveBaseline({'pyflakes': set()})
+            os.utime(step._getBaselinePath(revision), (mtime, mtime))
+        step = self.makeStep(PyFlakes)
+        self.assertEqual(step.loadBaseline('abc'), None)
+        self.assertEqual(step.loadBaseline('def'), {'pyflakes': set()})
+        self.assertEqual(step.loadBaseline('ghi'), {'pyflakes': set()})
+
+
+
+class BaselineCacheTests(unittest.TestCase):
+    """
+    Tests for L{BaselineCache}.
+    """
+
+    def test_get(self):
+        """
+        L{BaselineCache.get} returns what was C{put}, or C{None}.
+        """
+        cache = BaselineCache()
+        errors = {'pyflakes': set()}
+        cache.put(('builder', 'pyflakes', 'abc'), errors)
+        self.assertIdentical(cache.get(('builder', 'pyflakes', 'abc')), errors)
+        self.assertIdentical(cache.get(('builder', 'pyflakes', 'def')), None)
+
+
+    def test_evictLeastRecentlyUsed(self):
+        """
+        When the cache is full, the least recently used entry is evicted.
+        """
+        cache = BaselineCache(maxEntries=2)
+        cache.put('a', {'a': set()})
+        cache.put('b', {'b': set()})
+        cache.get('a')
+        cache.put('c', {'c': set()})
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), {'a': set()})
+        self.assertEqual(cache.get('c'), {'c': set()})
+
+
+    def test_invalidate(self):
+        """
+        L{BaselineCache.invalidate} forgets an entry.
+        """
+        cache = BaselineCache()
+        cache.put('a', {'a': set()})
+        cache.invalidate('a')
+        cache.invalidate('b')
+        self.assertEqual(cache.get('a'), None)
+
+
+    def test_parse(self):
+        """
+        L{BaselineCache.parse} parses the errors of a key once, sharing a
+        parse which is still running, and caches them.
+        """
+        cache = BaselineCache()
+        parses = []
+        def parser():
+            parses.append(defer.Deferred())
+            return parses[-1]
+        results = []
+        cache.parse('a', parser).addCallback(results.append)
+        cache.parse('a', parser).addCallback(results.append)
+        self.assertEqual(len(parses), 1)
+        self.assertEqual(results, [])
+        errors = {'a': set()}
+        parses[0].callback(errors)
+        cache.parse('a', parser).addCallback(results.append)
+        self.assertEqual(len(parses), 1)
+        self.assertEqual(results, [errors, errors, errors])
+        self.assertIdentical(cache.get('a'), errors)
+
+
+    def test_parseFailed(self):
+        """
+        If parsing fails, everything waiting for it fails, and nothing is
+        cached.
+        """
+        cache = BaselineCache()
+        parse = defer.Deferred()
+        failures = []
+        cache.parse('a', lambda: parse).addErrback(failures.append)
+        cache.parse('a', lambda: parse).addErrback(failures.append)
+        parse.errback(ValueError("bad log"))
+        self.assertEqual([f.type for f in failures], [ValueError, ValueError])
+        self.assertEqual(cache.get('a'), None)
+        results = []
+        cache.parse('a', lambda: defer.succeed({})).addCallback(results.append)
+        self.assertEqual(results, [{}])
+
+
+
+class ResultsTests(unittest.TestCase):
+    """
+    Tests for L{LintStep.saveResults} and L{loadLintResults}.
+    """
+
+    def setUp(self):
+        self.basedir = self.mktemp()
+        os.makedirs(self.basedir)
+        self.builder = FakeBuilderStatus(self.basedir, {})
+
+
+    def saveResults(self, number, current, previous, name='pyflakes'):
+        step = PyFlakes(name=name)
+        step.build = FakeBuild(FakeBuildStatus(number, self.builder))
+        step.getProperty = {'lint_revision': 'abc'}.get
+        step.saveResults(current, previous)
+        return step
+
+
+    def test_roundTrip(self):
+        """
+        The new, fixed and unchanged errors saved by each lint step of a build
+        are loaded by L{loadLintResults}.
+        """
+        self.saveResults(3, {'pyflakes': set(['a', 'b'])},
+                         {'pyflakes': set(['b', 'c'])})
+        self.saveResults(3, {'other': set(['d'])}, {}, name='pyflakes-2')
+        self.saveResults(4, {}, {})
+        self.assertEqual(loadLintResults(self.basedir, 3), {
+            'pyflakes': {
+                'lint_revision': 'abc',
+                'new': {'pyflakes': ['a']},
+                'fixed': {'pyflakes': ['c']},
+                'unchanged': {'pyflakes': ['b']},
+                },
+            'pyflakes-2': {
+                'lint_revision': 'abc',
+                'new': {'other': ['d']},
+                'fixed': {},
+                'unchanged': {},
+                },
+            })
+
+
+    def test_missing(self):
+        """
+        A build with no saved results has no results.
+        """
+        self.assertEqual(loadLintResults(self.basedir, 3), {})
+
+
+    def test_prune(self):
+        """
+        Only the results of the most recent C{maxResults} builds are kept.
+        """
+        for number in range(3):
+            step = self.saveResults(number, {}, {})
+            path = os.path.join(self.basedir, step.resultsDirectory,
+                                '%d-pyflakes.json' % (number,))
+            os.utime(path, (number, number))
+        step.maxResults = 2
+        step.saveResults({}, {})
+        self.assertEqual(loadLintResults(self.basedir, 0), {})
+        self.assertNotEqual(loadLintResults(self.basedir, 1), {})
+
+
+
+class ChangedModulesTests(unittest.TestCase):
+    """
+    Tests for L{moduleNameForPath} and L{extractChangedModules}.
+    """
+
+    def test_moduleNameForPath(self):
+        """
+        L{moduleNameForPath} gives the name of the module or package defined by
+        a Python source file, and C{None} for other files.
+        """
+        self.assertEqual(moduleNameForPath('twisted/python/util.py'),
+                         'twisted.python.util')
+        self.assertEqual(moduleNameForPath('twisted/python/__init__.py'),
+                         'twisted.python')
+        self.assertEqual(moduleNameForPath('twisted/topfiles/NEWS'), None)
+
+
+    def test_extractChangedModules(self):
+        """
+        L{extractChangedModules} finds the Python files which were added,
+        modified or renamed, and the modules which were deleted or renamed
+        away.
+        """
+        stdout = "\n".join([
+            "M\ttwisted/python/util.py",
+            "A\ttwisted/python/test/test_new.py",
+            "D\ttwisted/python/old.py",
+            "R087\ttwisted/web/before.py\ttwisted/web/after.py",
+            "M\ttwisted/topfiles/NEWS",
+            ])
+        self.assertEqual(extractChangedModules(0, stdout, ''), {
+            'lint_changed_files': [
+                'twisted/python/test/test_new.py',
+                'twisted/python/util.py',
+                'twisted/web/after.py',
+                ],
+            'lint_deleted_modules': [
+                'twisted.python.old',
+                'twisted.web.before',
+                ],
+            })
+
+
+    def test_extractChangedModulesFailed(self):
+        """
+        If C{git diff} fails, no properties are set.
+        """
+        self.assertEqual(extractChangedModules(128, '', 'fatal: bad revision'), {})
+
+
+
+class IncrementalTwistedCheckerTests(unittest.TestCase):
+    """
+    Tests for incremental runs of L{CheckCodesByTwistedChecker}.
+    """
+
+    def setUp(self):
+        basedir = self.mktemp()
+        os.makedirs(basedir)
+        self.builder = FakeBuilderStatus(basedir, {})
+        self.baseline = CheckCodesByTwistedChecker.computeErrors(
+            "\n".join(CheckCodesByTwistedCheckerTests.logText))
+        trunk = self.makeStep(got_revision='abc')
+        trunk.saveBaseline(self.baseline)
+
+
+    def makeStep(self, **properties):
+        step = CheckCodesByTwistedChecker(incremental=True)
+        step.build = FakeBuild(FakeBuildStatus(1, self.builder))
+        step.command = ['twistedchecker', 'twisted']
+        step.getProperty = properties.get
+        return step
+
+
+    def test_incrementalPaths(self):
+        """
+        Only the changed files in the package being checked are checked.
+        """
+        step = self.makeStep(
+            branch='/branches/foo-1234', lint_revision='abc',
+            lint_changed_files=['doc/conf.py', 'twisted/python/util.py',
+                                'twisted/python/__init__.py'])
+        self.assertEqual(step.getIncrementalPaths(),
+                         ['twisted/python/util.py', 'twisted/python/__init__.py'])
+        self.assertEqual(step.checkedModules,
+                         set(['twisted.python.util', 'twisted.python']))
+        self.assertEqual(step.baseline, self.baseline)
+
+
+    def test_unknownChanges(self):
+        """
+        If the changed files aren't known, everything is checked.
+        """
+        step = self.makeStep(branch='/branches/foo-1234', lint_revision='abc')
+        self.assertEqual(step.getIncrementalPaths(), None)
+        self.assertEqual(step.baseline, None)
+
+
+    def test_noBaseline(self):
+        """
+        If there is no baseline for C{lint_revision}, everything is checked.
+        """
+        step = self.makeStep(branch='/branches/foo-1234', lint_revision='def',
+                             lint_changed_files=['twisted/python/util.py'])
+        self.assertEqual(step.getIncrementalPaths(), None)
+        self.assertEqual(step.baseline, None)
+
+
+    def test_mergeBaseline(self):
+        """
+        The errors for checked modules replace those in the baseline, and
+        deleted modules are dropped from it.
+        """
+        step = self.makeStep(
+            branch='/branches/foo-1234', lint_revision='abc',
+            lint_changed_files=['twisted/python/util.py',
+                                'twisted/python/__init__.py'],
+            lint_deleted_modules=['twisted.python.threadpool'])
+        step.getIncrementalPaths()
+        newError = TwistedCheckerError('W9208:  1,0: Missing docstring')
+        errors = step.mergeBaseline({'twisted.python.util': set([newError])})
+        self.assertEqual(sorted(errors.keys()), [
+            'twisted.python.util',
+            'twisted.trial._utilpy3',
+            'twisted.trial.test.test_test_visitor',
+            ])
+        self.assertEqual(errors['twisted.python.util'], set([newError]))
+        self.assertEqual(errors['twisted.trial._utilpy3'],
+                         self.baseline['twisted.trial._utilpy3'])
+
+
+
 class TestLintStep(LintStepMixin, unittest.TestCase):
     """
     Tests for L{LintStep}
@@ -170,6 +720,171 @@ class TestLintStep(LintStepMixin, unittest.TestCase):
         self.expectLogfile('test-lint errors', '%r' % {'old': set(['a', 'b', 'c']), 'new': set(['a', 'b'])}) 
         return self.runStep()
 
+class ShardTests(LintStepMixin, unittest.TestCase):
+    """
+    Tests for running a L{LintStep} in several processes.
+    """
+
+    setUp = LintStepMixin.setUpBuildStep
+    tearDown = LintStepMixin.tearDownBuildStep
+
+    def test_command(self):
+        """
+        With C{shards} greater than one, the command is run by
+        C{LintStep.shardSource}.
+        """
+        self.setupStep(PyFlakes(shards=3, python=['python2.7']), command=[
+            'python2.7', '-c',
+            'exec "%s".decode("hex")' % (PyFlakes.shardSource.encode('hex'),),
+            '3', '1', 'pyflakes', 'twisted'])
+        self.expectOutcome(result=SUCCESS, status_text=['pyflakes'])
+        return self.runStep()
+
+
+    def runShards(self, shards, targets):
+        """
+        Run C{LintStep.shardSource} with a tool which prints its arguments, and
+        exits with the number of them.
+        """
+        tool = [sys.executable, '-c',
+                'import sys; print "\\n".join(sys.argv[1:]); '
+                'sys.exit(len(sys.argv) - 1)']
+        process = subprocess.Popen(
+            [sys.executable, '-c', LintStep.shardSource, str(shards),
+             str(len(tool))] + tool + targets,
+            stdout=subprocess.PIPE, cwd=self.basedir)
+        stdout = process.communicate()[0]
+        return process.returncode, stdout.splitlines()
+
+
+    def test_shardScript(self):
+        """
+        Packages are split into their modules and subpackages, which are
+        divided between the shards in order, and the output of the shards is
+        written in order.
+        """
+        self.basedir = self.mktemp()
+        for path in ['pkg/sub', 'pkg/data']:
+            os.makedirs(os.path.join(self.basedir, path))
+        for path in ['pkg/__init__.py', 'pkg/a.py', 'pkg/b.py', 'pkg/c.py',
+                     'pkg/sub/__init__.py', 'pkg/README']:
+            open(os.path.join(self.basedir, path), 'w').close()
+        rc, lines = self.runShards(2, ['pkg', 'other.py'])
+        self.assertEqual(lines, [
+            os.path.join('pkg', '__init__.py'),
+            os.path.join('pkg', 'a.py'),
+            os.path.join('pkg', 'b.py'),
+            os.path.join('pkg', 'c.py'),
+            os.path.join('pkg', 'sub'),
+            'other.py'])
+        self.assertEqual(rc, 3)
+
+
+
+class LintLogObserverTests(unittest.TestCase):
+    """
+    Tests for L{LintLogObserver}.
+    """
+
+    def test_lines(self):
+        """
+        Output from the command is handed to the parser a line at a time,
+        without the newlines, regardless of how it is chunked.
+        """
+        parser = FakeLintParser(None)
+        observer = LintLogObserver(parser)
+        observer.outReceived("first\nsec")
+        observer.errReceived("error\n")
+        observer.outReceived("ond\nthird")
+        self.assertEqual(parser.lines, ["first", "error", "second"])
+
+
+    def test_partialLastLine(self):
+        """
+        L{LintLogObserver.getErrors} parses output after the final newline
+        before returning the parser's errors.
+        """
+        parser = FakeLintParser(lambda text: text)
+        observer = LintLogObserver(parser)
+        observer.outReceived("first\nlast")
+        self.assertEqual(observer.getErrors(), "first\nlast")
+
+
+    def test_pyflakes(self):
+        """
+        Streaming the output of pyflakes through a L{LintLogObserver} finds the
+        same errors as L{PyFlakes.computeErrors}.
+        """
+        logText = ("twisted/a.py:1: 'os' imported but unused\n"
+                   "twisted/b.py:2: undefined name 'foo'")
+        observer = LintLogObserver(PyFlakes.makeParser())
+        for i in range(0, len(logText), 7):
+            observer.outReceived(logText[i:i + 7])
+        self.assertEqual(observer.getErrors(), PyFlakes.computeErrors(logText))
+
+
+
+class LintErrorTests(unittest.TestCase):
+    """
+    Tests for L{TwistedCheckerError} and L{PyFlakesError}.
+    """
+
+    def test_twistedCheckerIdentity(self):
+        """
+        L{TwistedCheckerError}s with the same type and text are equal, and hash
+        equally, even when they are on different lines.
+        """
+        a = TwistedCheckerError('W9208:  1,0: Missing docstring')
+        b = TwistedCheckerError('W9208: 18,0: Missing docstring')
+        c = TwistedCheckerError('W9208: 18,0: Missing whitespace')
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, c)
+        self.assertEqual(len(set([a, b, c])), 2)
+
+
+    def test_twistedCheckerOrder(self):
+        """
+        L{TwistedCheckerError}s are ordered by their location.
+        """
+        errors = [
+            TwistedCheckerError('W9208: 18,4: Missing docstring'),
+            TwistedCheckerError('C0301: 18,0: Line too long (81/79)'),
+            TwistedCheckerError('W9208:  1,0: Missing docstring'),
+            ]
+        self.assertEqual(map(str, sorted(errors)), [
+            'W9208:  1,0: Missing docstring',
+            'C0301: 18,0: Line too long (81/79)',
+            'W9208: 18,4: Missing docstring',
+            ])
+
+
+    def test_pyFlakesIdentity(self):
+        """
+        L{PyFlakesError}s with the same file and text are equal even when they
+        are on different lines, but not equal to errors of another type.
+        """
+        a = PyFlakesError.fromLine("twisted/a.py:1: 'os' imported but unused")
+        b = PyFlakesError.fromLine("twisted/a.py:3: 'os' imported but unused")
+        c = PyFlakesError.fromLine("twisted/b.py:1: 'os' imported but unused")
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(a, TwistedCheckerError('W9208:  1,0: Missing docstring'))
+
+
+    def test_compact(self):
+        """
+        Errors don't carry an instance dictionary.
+        """
+        self.assertFalse(hasattr(
+            TwistedCheckerError('W9208:  1,0: Missing docstring'), '__dict__'))
+        self.assertFalse(hasattr(
+            PyFlakesError.fromLine("twisted/a.py:1: undefined name 'x'"),
+            '__dict__'))
+
+
+
 class PydoctorTests(LintStepMixin, unittest.TestCase):
     """
     Tests for L{CheckDocumentation}
@@ -342,6 +1057,97 @@ class CheckCodesByTwistedCheckerTests(LintStepMixin, unittest.TestCase):
             ]))
         return self.runStep()
 
+    def test_multilineErrors(self):
+        """
+        Lines which don't start a new error are part of the previous error.
+        """
+        errors = CheckCodesByTwistedChecker.computeErrors("\n".join([
+            '************* Module twisted.python',
+            'C0301: 19,0: Line too long (81/79)',
+            'E1101: 20,4: Instance of "Foo" has no "bar" member',
+            '    self.bar()',
+            '    ^',
+            ]))
+        self.assertEqual(
+            sorted(map(str, errors['twisted.python'])),
+            ['C0301: 19,0: Line too long (81/79)',
+             'E1101: 20,4: Instance of "Foo" has no "bar" member\n'
+             '    self.bar()\n'
+             '    ^'])
+
+    def test_computeErrorsThroughput(self):
+        """
+        L{CheckCodesByTwistedChecker.computeErrors} parses a large log at a
+        reasonable rate.
+        """
+        lines = []
+        module = 0
+        while len(lines) < 100000:
+            lines.append('************* Module twisted.test%d' % (module,))
+            for line in range(1, 10):
+                lines.append('W9208:%3d,0:Foo%d: Missing docstring' % (line, line))
+                if line % 3 == 0:
+                    lines.append('    continuation of the error')
+            module += 1
+        logText = "\n".join(lines)
+
+        start = time.time()
+        errors = CheckCodesByTwistedChecker.computeErrors(logText)
+        elapsed = time.time() - start
+
+        self.assertEqual(len(errors), module)
+        self.assertEqual(sum(map(len, errors.values())), module * 9)
+        # Very conservative; parsing is usually an order of magnitude
+        # faster than this.
+        self.assertTrue(len(lines) / elapsed > 20000,
+                        "Parsed %d lines in %.2fs" % (len(lines), elapsed))
+
+    def test_toplevelLogs(self):
+        """
+        L{CheckCodesByTwistedChecker.addToplevelLogs} writes one finished log
+        per top-level package, containing the errors of its modules as
+        formatted by L{CheckCodesByTwistedChecker.formatErrors}.
+        """
+        logs = {}
+        class FakeLog(object):
+            def __init__(self, name):
+                self.text = ''
+                self.finished = False
+                logs[name] = self
+            def addStdout(self, text):
+                self.text += text
+            def finish(self):
+                self.finished = True
+        step = CheckCodesByTwistedChecker()
+        step.addLog = FakeLog
+        errors = CheckCodesByTwistedChecker.computeErrors("\n".join(self.logText))
+        errors['twisted.web.server'] = set()
+        step.addToplevelLogs(errors)
+        self.assertEqual(sorted(logs.keys()), [
+            'twistedchecker twisted.python errors',
+            'twistedchecker twisted.trial errors',
+            'twistedchecker twisted.web errors'])
+        for name, logObj in logs.items():
+            self.assertTrue(logObj.finished)
+            toplevel = name.split()[1]
+            self.assertEqual(logObj.text, '\n'.join(step.formatErrors(dict([
+                (module, moduleErrors)
+                for module, moduleErrors in errors.items()
+                if '.'.join(module.split('.')[:2]) == toplevel]))))
+        self.assertEqual(logs['twistedchecker twisted.web errors'].text,
+                         '************* Module twisted.web.server')
+        self.assertEqual(logs['twistedchecker twisted.trial errors'].text, '\n'.join([
+            '************* Module twisted.trial._utilpy3',
+            'W9201: 17,0:acquireAttribute: The opening/closing of docstring should be on a line by themselves',
+            'W9202: 17,0:acquireAttribute: Missing epytext markup @param for argument "attr"',
+            'W9202: 17,0:acquireAttribute: Missing epytext markup @param for argument "objects"',
+            'W9013: 28,0: Expected 3 blank lines, found 2',
+            '************* Module twisted.trial.test.test_test_visitor',
+            'W9208:  1,0: Missing docstring',
+            'W9208:  8,0:MockVisitor: Missing docstring',
+            'W9208: 18,0:TestTestVisitor: Missing docstring',
+            ]))
+
 class PyFlakesTests(LintStepMixin, unittest.TestCase):
     """
     Tests for L{PyFlakes}
@@ -0,0 +1,63 @@
+import threading
+
+from twisted.trial import unittest
+from twisted.internet import defer
+
+from txbuildbot import postprocess
+
+
+
+class DeferToPostProcessorTests(unittest.TestCase):
+    """
+    Tests for L{postprocess.deferToPostProcessor}.
+    """
+
+    def setUp(self):
+        self.addCleanup(postprocess.setConcurrency, 2)
+
+
+    def test_result(self):
+        """
+        The L{Deferred} fires with the result of the function, which is called
+        in another thread.
+        """
+        def f(a, b):
+            return a + b, threading.currentThread()
+        d = postprocess.deferToPostProcessor(f, 1, b=2)
+        def check(returned):
+            result, thread = returned
+            self.assertEqual(result, 3)
+            self.assertNotIdentical(thread, threading.currentThread())
+        return d.addCallback(check)
+
+
+    def test_error(self):
+        """
+        Exceptions raised by the function are delivered as failures.
+        """
+        def f():
+            raise ZeroDivisionError()
+        d = postprocess.deferToPostProcessor(f)
+        return self.assertFailure(d, ZeroDivisionError)
+
+
+    def test_concurrency(self):
+        """
+        No more than the configured number of functions run at once.
+        """
+        postprocess.setConcurrency(1)
+        lock = threading.Lock()
+        running = []
+        overlaps = []
+        def f():
+            with lock:
+                running.append(None)
+                if len(running) > 1:
+                    overlaps.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.pop()
+        d = defer.gatherResults([
+            postprocess.deferToPostProcessor(f) for i in range(5)])
+        d.addCallback(lambda ignored: self.assertEqual(overlaps, []))
+        return d
@@ -0,0 +1,69 @@
+from twisted.trial import unittest
+
+from txbuildbot.receiver import BuilderWatcher
+
+
+
+class FakeStatus(object):
+    """
+    @ivar receivers: the receivers subscribed
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.receivers = []
+
+    def getName(self):
+        return self.name
+
+    def subscribe(self, receiver):
+        self.receivers.append(receiver)
+
+    def unsubscribe(self, receiver):
+        self.receivers.remove(receiver)
+
+
+
+class BuilderWatcherTests(unittest.TestCase):
+    """
+    Tests for L{BuilderWatcher}.
+    """
+
+    def setUp(self):
+        self.status = FakeStatus()
+        self.watcher = BuilderWatcher()
+        self.status.subscribe(self.watcher)
+
+
+    def addBuilder(self, name):
+        """
+        Tell the watcher about a builder, subscribing it to the builder if it
+        asks to be, as L{buildbot.status.master.Status} does.
+        """
+        builder = FakeStatus(name)
+        receiver = self.watcher.builderAdded(name, builder)
+        if receiver is not None:
+            builder.subscribe(receiver)
+        return builder
+
+
+    def test_stopWatching(self):
+        """
+        L{BuilderWatcher.stopWatching} unsubscribes the watcher from the
+        status and from every builder it subscribed to.
+        """
+        builders = [self.addBuilder("one"), self.addBuilder("two")]
+        self.watcher.stopWatching(self.status)
+        self.assertEqual(self.status.receivers, [])
+        self.assertEqual([builder.receivers for builder in builders], [[], []])
+        self.assertEqual(self.watcher.watched, [])
+
+
+    def test_builderRemoved(self):
+        """
+        A removed builder is forgotten, since it is gone from the status.
+        """
+        self.addBuilder("one")
+        two = self.addBuilder("two")
+        self.watcher.builderRemoved("one")
+        self.assertEqual(self.watcher.watched, [two])
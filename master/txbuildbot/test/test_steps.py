@@ -0,0 +1,404 @@
+import os
+import sys
+import subprocess
+
+from twisted.trial import unittest
+from buildbot.status.results import SUCCESS, FAILURE, SKIPPED
+from buildbot.test.util.steps import BuildStepMixin
+from buildbot.test.fake.remotecommand import ExpectShell
+
+from twisted_factories import TwistedTrial, TwistedReactorsTrial
+from twisted_factories import TwistedPreviousFailuresTrial
+from twisted_steps import ReactorsTrial
+from txbuildbot.durations import TestDurationDatabase
+from txbuildbot.slavescript import pythonScript
+from txbuildbot.trial import loadTestDurations
+from txbuildbot.test.fakes import FakeSourceStamp, FakeTestResult
+from txbuildbot.test.fakes import FakeBuildStatus
+
+
+
+TIMING_OUTPUT = """\
+twisted.test.test_a.ATests.test_one ... [OK]
+(1.500 secs)
+twisted.test.test_a.ATests.test_two ... [OK]
+(0.250 secs)
+
+-------------------------------------------------------------------------------
+Ran 2 tests in 1.750s
+
+PASSED (successes=2)
+"""
+
+
+
+FAILING_OUTPUT = """\
+twisted.test.test_a.ATests.test_one ... [OK]
+(1.500 secs)
+twisted.test.test_a.ATests.test_two ... [FAIL]
+(0.250 secs)
+
+===============================================================================
+FAILURE: test_two (twisted.test.test_a.ATests)
+-------------------------------------------------------------------------------
+FailTest: 1 != 2
+-------------------------------------------------------------------------------
+Ran 2 tests in 1.750s
+
+FAILED (failures=1, successes=1)
+"""
+
+
+
+class TrialStepMixin(BuildStepMixin):
+    """
+    Mixin for running a L{twisted_steps.Trial} step against a fake slave.
+    """
+
+    def setUp(self):
+        return self.setUpBuildStep()
+
+
+    def tearDown(self):
+        return self.tearDownBuildStep()
+
+
+    def setupStep(self, step):
+        BuildStepMixin.setupStep(self, step)
+        # BuildStepMixin replaces addLogObserver once the step is built, so
+        # register the test counter with the fake again.
+        self.step.addLogObserver('stdio', self.step.testCounter)
+        masterdir = self.mktemp()
+        basedir = os.path.join(masterdir, 'builder')
+        os.makedirs(basedir)
+        self.step.build.build_status.getBuilder().basedir = basedir
+        self.step.build.build_status.getBuilder().getName.return_value = 'builder'
+        self.step.build.build_status.getNumber.return_value = 1
+
+
+
+class TrialCommandTests(unittest.TestCase):
+    """
+    Tests for the command run by L{twisted_steps.Trial}.
+    """
+
+    def test_subunit(self):
+        """
+        In subunit mode, only the reporter of C{trialMode} is replaced, and
+        its other flags are kept.
+        """
+        step = TwistedTrial(
+            python=["python"], subunit=True,
+            trialMode=["--reporter=timing", "--unclean-warnings",
+                       "--force-gc"])
+        self.assertEqual(step.command, [
+                "python", "./bin/trial", "--reporter=subunit",
+                "--unclean-warnings", "--force-gc"])
+
+
+
+class TrialJobsTests(TrialStepMixin, unittest.TestCase):
+    """
+    Tests for the C{jobs} argument of L{twisted_steps.Trial}.
+    """
+
+
+    def test_serial(self):
+        """
+        Without C{jobs}, trial runs the tests in one process, and the slowest
+        tests are reported.
+        """
+        self.setupStep(TwistedTrial())
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=['./bin/trial', '--reporter=timing',
+                                 'twisted'],
+                        logfiles={'test.log': '_trial_temp/test.log'})
+            + ExpectShell.log('stdio', stdout=TIMING_OUTPUT)
+            + 0)
+        self.expectOutcome(result=SUCCESS, status_text=['2 tests', 'passed'])
+        self.expectLogfile('slowest tests', "     1.500s twisted.test.test_a.ATests.test_one\n"
+                                            "     0.250s twisted.test.test_a.ATests.test_two\n")
+        return self.runStep()
+
+
+    def test_jobs(self):
+        """
+        With C{jobs}, trial runs that many workers, the log of each worker is
+        collected, and no durations are reported, since the timing reporter
+        can't measure them under disttrial.
+        """
+        self.setupStep(TwistedTrial(jobs=2))
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=['./bin/trial', '--reporter=timing',
+                                 '--jobs=2', 'twisted'],
+                        logfiles={'test.log': '_trial_temp/test.log',
+                                  'test.log-0': '_trial_temp/0/test.log',
+                                  'test.log-1': '_trial_temp/1/test.log'})
+            + ExpectShell.log('stdio', stdout=TIMING_OUTPUT.replace(
+                    "1.500", "0.000").replace("0.250", "0.000"))
+            + 0)
+        self.expectOutcome(result=SUCCESS, status_text=['2 tests', 'passed'])
+        d = self.runStep()
+        d.addCallback(lambda ignored: self.assertNotIn(
+                'slowest tests', self.step_status.logs))
+        return d
+
+
+
+class PreviousFailuresTrialTests(TrialStepMixin, unittest.TestCase):
+    """
+    Tests for L{twisted_steps.PreviousFailuresTrial}.
+    """
+
+    def setupStep(self, step, failed=(), maxTests=2):
+        TrialStepMixin.setupStep(self, step)
+        self.step.maxTests = maxTests
+        testResults = dict(
+            (tuple(testId.split('.')), FakeTestResult(FAILURE))
+            for testId in failed)
+        buildStatus = self.step.build.build_status
+        buildStatus.getSourceStamp.return_value = FakeSourceStamp('branch')
+        buildStatus.getPreviousBuild.return_value = FakeBuildStatus(
+            branch='branch', testResults=testResults)
+
+
+    def test_noFailures(self):
+        """
+        If no tests failed in the previous build of the branch, the step is
+        skipped.
+        """
+        self.setupStep(TwistedPreviousFailuresTrial())
+        self.expectOutcome(result=SKIPPED, status_text=['tests', 'skipped'])
+        return self.runStep()
+
+
+    def test_tooManyFailures(self):
+        """
+        If more than C{maxTests} tests failed in the previous build of the
+        branch, the step is skipped.
+        """
+        self.setupStep(TwistedPreviousFailuresTrial(), failed=[
+                'twisted.test.test_a.ATests.test_one',
+                'twisted.test.test_a.ATests.test_two',
+                'twisted.test.test_b.BTests.test_one'])
+        self.expectOutcome(result=SKIPPED, status_text=['tests', 'skipped'])
+        return self.runStep()
+
+
+    def test_failures(self):
+        """
+        The tests which failed in the previous build of the branch are run,
+        but their results aren't recorded, since only the full run's are.
+        """
+        self.setupStep(TwistedPreviousFailuresTrial(), failed=[
+                'twisted.test.test_a.ATests.test_two',
+                'twisted.test.test_a.ATests.test_one'])
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=['./bin/trial', '--reporter=timing',
+                                 'twisted.test.test_a.ATests.test_one',
+                                 'twisted.test.test_a.ATests.test_two'],
+                        logfiles={'test.log': '_trial_temp/test.log'})
+            + ExpectShell.log('stdio', stdout=FAILING_OUTPUT)
+            + 1)
+        self.expectOutcome(result=FAILURE,
+                           status_text=['tests', '1 failure'])
+        d = self.runStep()
+        def checkResults(ignored):
+            self.assertIn('problems', self.step_status.logs)
+            self.assertEqual(
+                self.step.build.build_status.addTestResult.call_args_list, [])
+        d.addCallback(checkResults)
+        return d
+
+
+
+class ReactorsTrialTests(TrialStepMixin, unittest.TestCase):
+    """
+    Tests for L{twisted_steps.ReactorsTrial}.
+    """
+
+    def setupStep(self, step):
+        TrialStepMixin.setupStep(self, step)
+        for reactor in self.step.reactors:
+            self.step.addLogObserver("stdio (%s)" % (reactor,),
+                                     self.step.testCounters[reactor])
+
+
+    def test_command(self):
+        """
+        The trial command is run by L{ReactorsTrial.launcherSource}, which is
+        told how many processes to run at once, the reactors, and where the
+        reactor options go in the trial command. Each reactor's output and
+        C{test.log} are collected as logs of their own, and each reactor gets
+        its own results.
+        """
+        self.setupStep(TwistedReactorsTrial(
+                reactors=["select", "poll"], parallel=1,
+                python=["python2.7"]))
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=pythonScript(
+                            ["python2.7"], ReactorsTrial.launcherSource,
+                            "1", "2", "2", "select", "poll",
+                            "python2.7", "./bin/trial", "--reporter=timing",
+                            "twisted"),
+                        logfiles={
+                            'stdio (select)': '_trial_temp-select.out',
+                            'test.log (select)': '_trial_temp-select/test.log',
+                            'stdio (poll)': '_trial_temp-poll.out',
+                            'test.log (poll)': '_trial_temp-poll/test.log'})
+            + ExpectShell.log('stdio', stdout=(
+                    "Started select\nFinished select: exit code 0\n"
+                    "Started poll\nFinished poll: exit code 1\n"))
+            + ExpectShell.log('stdio (select)', stdout=TIMING_OUTPUT)
+            + ExpectShell.log('stdio (poll)', stdout=FAILING_OUTPUT)
+            + 1)
+        self.expectOutcome(
+            result=FAILURE,
+            status_text=['2 tests', 'passed', '(select)',
+                         'tests', '1 failure', '(poll)'])
+        d = self.runStep()
+        def checkResults(ignored):
+            self.assertIn('FailTest: 1 != 2',
+                          self.step_status.logs['problems (poll)'].getText())
+            self.assertEqual(
+                [call[0][0].getName() for call in
+                 self.step.build.build_status.addTestResult.call_args_list],
+                [("poll", "twisted", "test", "test_a", "ATests", "test_two")])
+        d.addCallback(checkResults)
+        return d
+
+
+    def test_durations(self):
+        """
+        The durations of the tests run under each reactor are reported on
+        their own: in a log of the slowest tests for each reactor, and saved
+        and recorded with the reactor appended to the step name, so that a
+        test run under both reactors is neither listed twice nor counted
+        twice in its module's duration.
+        """
+        self.setupStep(TwistedReactorsTrial(
+                reactors=["select", "poll"], parallel=1))
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=pythonScript(
+                            ["python"], ReactorsTrial.launcherSource,
+                            "1", "2", "1", "select", "poll", "./bin/trial",
+                            "--reporter=timing", "twisted"),
+                        logfiles={
+                            'stdio (select)': '_trial_temp-select.out',
+                            'test.log (select)': '_trial_temp-select/test.log',
+                            'stdio (poll)': '_trial_temp-poll.out',
+                            'test.log (poll)': '_trial_temp-poll/test.log'})
+            + ExpectShell.log('stdio', stdout=(
+                    "Started select\nFinished select: exit code 0\n"
+                    "Started poll\nFinished poll: exit code 0\n"))
+            + ExpectShell.log('stdio (select)', stdout=TIMING_OUTPUT)
+            + ExpectShell.log('stdio (poll)', stdout=TIMING_OUTPUT.replace(
+                    "(1.500 secs)", "(2.500 secs)"))
+            + 0)
+        self.expectOutcome(
+            result=SUCCESS,
+            status_text=['2 tests', 'passed', '(select)',
+                         '2 tests', 'passed', '(poll)'])
+        self.expectLogfile(
+            'slowest tests (select)',
+            "     1.500s twisted.test.test_a.ATests.test_one\n"
+            "     0.250s twisted.test.test_a.ATests.test_two\n")
+        self.expectLogfile(
+            'slowest tests (poll)',
+            "     2.500s twisted.test.test_a.ATests.test_one\n"
+            "     0.250s twisted.test.test_a.ATests.test_two\n")
+        d = self.runStep()
+        def checkDurations(ignored):
+            builder = self.step.build.build_status.getBuilder()
+            self.assertEqual(
+                loadTestDurations(builder.basedir, 1, 'trial-reactors-select'),
+                {'twisted.test.test_a.ATests.test_one': 1.5,
+                 'twisted.test.test_a.ATests.test_two': 0.25})
+            self.assertEqual(
+                loadTestDurations(builder.basedir, 1, 'trial-reactors-poll'),
+                {'twisted.test.test_a.ATests.test_one': 2.5,
+                 'twisted.test.test_a.ATests.test_two': 0.25})
+            database = TestDurationDatabase.forBuilder(builder)
+            self.assertEqual(database.getMedians('builder'),
+                             {'twisted.test.test_a': 2.25})
+        d.addCallback(checkDurations)
+        return d
+
+
+    def test_jobs(self):
+        """
+        With C{jobs}, the log of each worker is collected from the temp
+        directory of each reactor.
+        """
+        self.setupStep(TwistedReactorsTrial(reactors=["select", "poll"],
+                                            jobs=2))
+        self.expectCommands(
+            ExpectShell(workdir='wkdir', usePTY='slave-config',
+                        command=pythonScript(
+                            ["python"], ReactorsTrial.launcherSource,
+                            "2", "2", "1", "select", "poll", "./bin/trial",
+                            "--reporter=timing", "--jobs=2", "twisted"),
+                        logfiles={
+                            'stdio (select)': '_trial_temp-select.out',
+                            'test.log (select)': '_trial_temp-select/test.log',
+                            'test.log-0 (select)':
+                                '_trial_temp-select/0/test.log',
+                            'test.log-1 (select)':
+                                '_trial_temp-select/1/test.log',
+                            'stdio (poll)': '_trial_temp-poll.out',
+                            'test.log (poll)': '_trial_temp-poll/test.log',
+                            'test.log-0 (poll)': '_trial_temp-poll/0/test.log',
+                            'test.log-1 (poll)': '_trial_temp-poll/1/test.log'})
+            + ExpectShell.log('stdio', stdout=(
+                    "Finished select: exit code 0\n"
+                    "Finished poll: exit code 0\n"))
+            + ExpectShell.log('stdio (select)', stdout=TIMING_OUTPUT)
+            + ExpectShell.log('stdio (poll)', stdout=TIMING_OUTPUT)
+            + 0)
+        self.expectOutcome(
+            result=SUCCESS,
+            status_text=['2 tests', 'passed', '(select)',
+                         '2 tests', 'passed', '(poll)'])
+        return self.runStep()
+
+
+
+class LauncherTests(unittest.TestCase):
+    """
+    Tests for L{ReactorsTrial.launcherSource}.
+    """
+
+    def test_launch(self):
+        """
+        The launcher runs the command once for each reactor, adding the
+        reactor and the temp directory after the given number of words, and
+        writing the output of each to a file named after the temp directory.
+        It exits with the first failing exit code.
+        """
+        workdir = self.mktemp()
+        os.makedirs(workdir)
+        script = ("import sys\n"
+                  "print ' '.join(sys.argv[1:])\n"
+                  "sys.exit(sys.argv[1] == '--reactor=poll')\n")
+        launcher = subprocess.Popen(
+            pythonScript([sys.executable], ReactorsTrial.launcherSource,
+                         "1", "2", "3", "select", "poll",
+                         sys.executable, "-c", script, "twisted"),
+            cwd=workdir, stdout=subprocess.PIPE)
+        output = launcher.communicate()[0]
+        self.assertEqual(launcher.returncode, 1)
+        self.assertEqual(output.splitlines(), [
+                "Started select", "Finished select: exit code 0",
+                "Started poll", "Finished poll: exit code 1"])
+        for reactor in ["select", "poll"]:
+            out = open(os.path.join(workdir, "_trial_temp-%s.out" % (reactor,)))
+            self.assertEqual(
+                out.read(),
+                "--reactor=%s --temp-directory=_trial_temp-%s twisted\n" % (
+                    reactor, reactor))
+            out.close()
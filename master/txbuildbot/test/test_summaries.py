@@ -0,0 +1,152 @@
+from twisted.trial import unittest
+from buildbot.status.results import SUCCESS, FAILURE
+
+from txbuildbot.summaries import BranchSummaries, summarizeBuild
+from txbuildbot.test.fakes import FakeBuildStatus
+
+
+
+def summary(number):
+    return {'number': number, 'revision': None, 'results': SUCCESS,
+            'text': []}
+
+
+
+class SummarizeBuildTests(unittest.TestCase):
+    """
+    Tests for L{summarizeBuild}.
+    """
+
+    def test_summarizeBuild(self):
+        """
+        The summary of a build has its number, revision, results and text.
+        """
+        self.assertEqual(
+            summarizeBuild(FakeBuildStatus(3, results=FAILURE,
+                                           got_revision="abc")),
+            {'number': 3, 'revision': "abc", 'results': FAILURE,
+             'text': ["build", "successful"]})
+
+
+    def test_noRevision(self):
+        """
+        The revision of a build without C{got_revision} is C{None}.
+        """
+        self.assertEqual(summarizeBuild(FakeBuildStatus(3))['revision'],
+                         None)
+
+
+
+class BranchSummariesTests(unittest.TestCase):
+    """
+    Tests for L{BranchSummaries}.
+    """
+
+    def test_getBuilds(self):
+        """
+        L{BranchSummaries.getBuilds} returns the most recent builds of any of
+        the branches, most recent first.
+        """
+        summaries = BranchSummaries()
+        summaries.record("lint", None, summary(1))
+        summaries.record("lint", "trunk", summary(3))
+        summaries.record("lint", "foo", summary(2))
+        summaries.record("other", None, summary(4))
+        self.assertEqual(
+            [build['number']
+             for build in summaries.getBuilds("lint", [None, "trunk"], 2)],
+            [3, 1])
+
+
+    def test_notEnoughBuilds(self):
+        """
+        If fewer builds than were asked for are indexed, C{None} is returned.
+        """
+        summaries = BranchSummaries()
+        summaries.record("lint", "foo", summary(1))
+        self.assertEqual(summaries.getBuilds("lint", ["foo"], 2), None)
+        self.assertEqual(summaries.getBuilds("other", ["foo"], 1), None)
+
+
+    def test_maxBuilds(self):
+        """
+        Only the C{maxBuilds} most recent builds of each branch are kept, and
+        each only once.
+        """
+        summaries = BranchSummaries(maxBuilds=2)
+        for number in [2, 1, 3, 3]:
+            summaries.record("lint", "foo", summary(number))
+        self.assertEqual(
+            [build['number']
+             for build in summaries.getBuilds("lint", ["foo"], 2)],
+            [3, 2])
+        self.assertEqual(summaries.getBuilds("lint", ["foo"], 3), None)
+
+
+    def test_complete(self):
+        """
+        Once the history of some branches has been searched, their builds are
+        returned even if there are fewer than were asked for, including none.
+        """
+        summaries = BranchSummaries()
+        summaries.record("lint", "foo", summary(1))
+        summaries.markComplete("lint", ["foo", "bar"])
+        self.assertEqual(
+            [build['number']
+             for build in summaries.getBuilds("lint", ["foo"], 2)],
+            [1])
+        self.assertEqual(summaries.getBuilds("lint", ["bar"], 2), [])
+        self.assertEqual(summaries.getBuilds("lint", ["foo", "baz"], 2),
+                         None)
+        self.assertEqual(summaries.getBuilds("other", ["foo"], 2), None)
+
+
+    def test_completeDefaultBranch(self):
+        """
+        The default branch may be given as C{None} or C{""}.
+        """
+        summaries = BranchSummaries()
+        summaries.markComplete("lint", [None])
+        self.assertEqual(summaries.getBuilds("lint", [""], 1), [])
+
+
+    def test_completeDropped(self):
+        """
+        Once builds of a complete branch have been dropped from the index,
+        more builds than are left can't be returned.
+        """
+        summaries = BranchSummaries(maxBuilds=2)
+        summaries.markComplete("lint", ["foo"])
+        for number in [1, 2, 3]:
+            summaries.record("lint", "foo", summary(number))
+        self.assertEqual(summaries.getBuilds("lint", ["foo"], 3), None)
+
+
+    def test_buildFinished(self):
+        """
+        Builds are indexed as they finish.
+        """
+        summaries = BranchSummaries()
+        self.assertIdentical(summaries.builderAdded("lint", None), summaries)
+        summaries.buildFinished("lint", FakeBuildStatus(5, branch="foo"),
+                                SUCCESS)
+        self.assertEqual(
+            [build['number']
+             for build in summaries.getBuilds("lint", ["foo"], 1)],
+            [5])
+
+
+    def test_saveAndLoad(self):
+        """
+        Saved summaries can be loaded again.
+        """
+        path = self.mktemp()
+        summaries = BranchSummaries()
+        summaries.load(path)
+        summaries.record("lint", "foo", summary(1))
+        summaries.markComplete("lint", ["foo"])
+        summaries.save()
+        loaded = BranchSummaries()
+        loaded.load(path)
+        self.assertEqual(loaded.getBuilds("lint", ["foo"], 1), [summary(1)])
+        self.assertEqual(loaded.getBuilds("lint", ["foo"], 2), [summary(1)])
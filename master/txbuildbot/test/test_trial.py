@@ -0,0 +1,377 @@
+import os
+import time
+
+from twisted.trial import unittest
+from buildbot.status.results import SUCCESS, FAILURE, WARNINGS, SKIPPED
+
+from txbuildbot.trial import SubunitParser, parseTrialOutput
+from txbuildbot.trial import formatSlowestTests, saveTestDurations
+from txbuildbot.trial import loadTestDurations, testDurationsPath
+from txbuildbot.trial import workerLogFiles
+
+
+
+class SubunitParserTests(unittest.TestCase):
+    """
+    Tests for L{SubunitParser}.
+    """
+
+    def parse(self, lines):
+        parser = SubunitParser()
+        for line in lines:
+            parser.lineReceived(line)
+        return parser
+
+
+    def test_outcomes(self):
+        """
+        Each outcome is recorded against the test it was reported for, in
+        order.
+        """
+        parser = self.parse([
+            "test: twisted.test.test_a.ATests.test_one",
+            "success: twisted.test.test_a.ATests.test_one",
+            "test: twisted.test.test_a.ATests.test_two",
+            "skip: twisted.test.test_a.ATests.test_two",
+            "test: twisted.test.test_a.ATests.test_three",
+            "xfail: twisted.test.test_a.ATests.test_three",
+            "test: twisted.test.test_a.ATests.test_four",
+            "uxsuccess: twisted.test.test_a.ATests.test_four",
+            "test: twisted.test.test_a.ATests.test_five",
+            "successful: twisted.test.test_a.ATests.test_five",
+            ])
+        self.assertEqual(
+            [(result.testId, result.outcome) for result in parser.results], [
+                ("twisted.test.test_a.ATests.test_one", "success"),
+                ("twisted.test.test_a.ATests.test_two", "skip"),
+                ("twisted.test.test_a.ATests.test_three", "xfail"),
+                ("twisted.test.test_a.ATests.test_four", "uxsuccess"),
+                ("twisted.test.test_a.ATests.test_five", "success"),
+                ])
+
+
+    def test_details(self):
+        """
+        The bracketed details following an outcome are kept with the result,
+        with escaped closing brackets restored.
+        """
+        parser = self.parse([
+            "test: twisted.test.test_a.ATests.test_one",
+            "failure: twisted.test.test_a.ATests.test_one [",
+            "Traceback (most recent call last):",
+            "  File \"twisted/test/test_a.py\", line 3, in test_one",
+            " ]",
+            "FailTest: 1 != 2",
+            "]",
+            "test: twisted.test.test_a.ATests.test_two",
+            "error: twisted.test.test_a.ATests.test_two",
+            ])
+        failure, error = parser.results
+        self.assertEqual(failure.outcome, "failure")
+        self.assertEqual(failure.details, "\n".join([
+            "Traceback (most recent call last):",
+            "  File \"twisted/test/test_a.py\", line 3, in test_one",
+            "]",
+            "FailTest: 1 != 2",
+            ""]))
+        self.assertEqual(error.outcome, "error")
+        self.assertEqual(error.details, "")
+
+
+    def test_durations(self):
+        """
+        The time between the C{time:} lines preceding the start and end of a
+        test is its duration.
+        """
+        parser = self.parse([
+            "time: 2013-03-01 10:00:00.000000Z",
+            "test: twisted.test.test_a.ATests.test_one",
+            "time: 2013-03-01 10:00:01.500000Z",
+            "success: twisted.test.test_a.ATests.test_one",
+            "test: twisted.test.test_a.ATests.test_two",
+            "success: twisted.test.test_a.ATests.test_two",
+            ])
+        self.assertAlmostEqual(parser.results[0].duration, 1.5)
+        self.assertEqual(parser.results[1].duration, 0.0)
+
+
+    def test_noTime(self):
+        """
+        Without C{time:} lines, durations are unknown.
+        """
+        parser = self.parse([
+            "test: twisted.test.test_a.ATests.test_one",
+            "success: twisted.test.test_a.ATests.test_one",
+            ])
+        self.assertIdentical(parser.results[0].duration, None)
+
+
+    def test_otherOutput(self):
+        """
+        Lines which aren't part of the protocol are ignored.
+        """
+        parser = self.parse([
+            "twisted/python/foo.py:3: DeprecationWarning: bar",
+            "  import baz",
+            "test: twisted.test.test_a.ATests.test_one",
+            "success: twisted.test.test_a.ATests.test_one",
+            ])
+        self.assertEqual(len(parser.results), 1)
+
+
+    def test_counts(self):
+        """
+        L{SubunitParser.getCounts} counts the tests by outcome.
+        """
+        parser = self.parse([
+            "success: a", "success: b", "failure: c", "error: d", "skip: e",
+            "xfail: f", "uxsuccess: g"])
+        self.assertEqual(parser.getCounts(), {
+            'total': 7,
+            'successes': 2,
+            'failures': 1,
+            'errors': 1,
+            'skips': 1,
+            'expectedFailures': 1,
+            'unexpectedSuccesses': 1,
+            })
+
+
+    def test_countsNoTests(self):
+        """
+        If no tests were reported, the total is C{None}.
+        """
+        self.assertIdentical(self.parse([]).getCounts()['total'], None)
+
+
+    def test_status(self):
+        """
+        L{SubunitParser.getStatus} gives the buildbot status for an outcome.
+        """
+        self.assertEqual(
+            map(SubunitParser.getStatus,
+                ['success', 'failure', 'error', 'skip', 'xfail', 'uxsuccess']),
+            [SUCCESS, FAILURE, FAILURE, SKIPPED, SUCCESS, WARNINGS])
+
+
+
+class ParseTrialOutputTests(unittest.TestCase):
+    """
+    Tests for L{parseTrialOutput}.
+    """
+
+    output = "".join([
+        "twisted.test.test_a\n",
+        "  ATests\n",
+        "    test_one ...                                                   [OK]\n",
+        "twisted/python/foo.py:3: DeprecationWarning: bar is deprecated\n",
+        "  import bar\n",
+        "twisted/python/foo.py:7: RuntimeWarning: baz\n",
+        "    test_two ...                                              [FAIL]\n",
+        "    test_three ...                                           [ERROR]\n",
+        "    test_four ...                                          [SKIPPED]\n",
+        "\n",
+        "=" * 79 + "\n",
+        "[FAIL]\n",
+        "Traceback (most recent call last):\n",
+        "FailTest: 1 != 2\n",
+        "\n",
+        "twisted.test.test_a.ATests.test_two\n",
+        "=" * 79 + "\n",
+        "FAILURE: test_two (twisted.test.test_a.ATests)\n",
+        "-" * 79 + "\n",
+        "FailTest: 1 != 2\n",
+        "=" * 79 + "\n",
+        "ERROR: test_three (twisted.test.test_a.ATests)\n",
+        "-" * 79 + "\n",
+        "Traceback (most recent call last):\n",
+        "ZeroDivisionError: integer division or modulo by zero\n",
+        "-" * 79 + "\n",
+        "Ran 4 tests in 0.012s\n",
+        "\n",
+        "FAILED (skips=1, failures=1, errors=1, successes=1)\n",
+        ])
+
+    def test_problems(self):
+        """
+        The problems section starts at the first separator line.
+        """
+        problems, warnings, tests = parseTrialOutput(self.output)
+        self.assertEqual(problems,
+                         self.output[self.output.index("=" * 79):])
+
+
+    def test_warnings(self):
+        """
+        Warnings are counted, along with the source line which follows a
+        C{DeprecationWarning}.
+        """
+        problems, warnings, tests = parseTrialOutput(self.output)
+        self.assertEqual(warnings, {
+            "twisted/python/foo.py:3: DeprecationWarning: bar is deprecated\n"
+            "  import bar\n": 1,
+            "twisted/python/foo.py:7: RuntimeWarning: baz\n": 1,
+            })
+
+
+    def test_tests(self):
+        """
+        Each test described in the problems section gets a result, with its
+        part of the section as its log.
+        """
+        problems, warnings, tests = parseTrialOutput(self.output)
+        self.assertEqual(tests, [
+            (("twisted", "test", "test_a", "ATests", "test_two"), FAILURE,
+             ["failure"],
+             "FAILURE: test_two (twisted.test.test_a.ATests)\n" +
+             "-" * 79 + "\n" +
+             "FailTest: 1 != 2\n"),
+            (("twisted", "test", "test_a", "ATests", "test_three"), FAILURE,
+             ["error"],
+             "ERROR: test_three (twisted.test.test_a.ATests)\n" +
+             "-" * 79 + "\n" +
+             "Traceback (most recent call last):\n"
+             "ZeroDivisionError: integer division or modulo by zero\n"),
+            ])
+
+
+    def test_disttrial(self):
+        """
+        The output of C{trial --jobs}, where the tests finish out of order,
+        is parsed like that of a single process.
+        """
+        output = "".join([
+            "Running 2 tests.\n",
+            "twisted.test.test_b.BTests.test_one ... [OK]\n",
+            "(0.001 secs)\n",
+            "twisted.test.test_a.ATests.test_two ... [FAIL]\n",
+            "(0.002 secs)\n",
+            "\n",
+            "=" * 79 + "\n",
+            "FAILURE: test_two (twisted.test.test_a.ATests)\n",
+            "-" * 79 + "\n",
+            "FailTest: 1 != 2\n",
+            "-" * 79 + "\n",
+            "Ran 2 tests in 0.012s\n",
+            "\n",
+            "FAILED (failures=1, successes=1)\n",
+            ])
+        problems, warnings, tests = parseTrialOutput(output)
+        self.assertEqual(warnings, {})
+        self.assertEqual(
+            [(testname, results) for testname, results, text, log in tests],
+            [(("twisted", "test", "test_a", "ATests", "test_two"), FAILURE)])
+
+
+    def test_noProblems(self):
+        """
+        Output without a separator has no problems.
+        """
+        self.assertEqual(
+            parseTrialOutput("Ran 0 tests in 0.000s\n\nPASSED\n"),
+            ("", {}, []))
+
+
+    def test_throughput(self):
+        """
+        L{parseTrialOutput} handles a 50MB log with thousands of failures at a
+        reasonable rate.
+        """
+        passed = "".join([
+            "    test_%d ...                                           [OK]\n"
+            % (i,) for i in range(1000)])
+        failure = "".join([
+            "=" * 79 + "\n",
+            "FAILURE: test_fail (twisted.test.test_broken.BrokenTests)\n",
+            "-" * 79 + "\n",
+            "Traceback (most recent call last):\n",
+            ] + ["  File \"twisted/internet/base.py\", line 1, in run\n"] * 20 + [
+            "FailTest: broken\n"])
+        size = 50 * 1024 * 1024
+        output = passed * (size // 2 // len(passed))
+        failures = (size - len(output)) // len(failure)
+        output += failure * failures
+
+        start = time.time()
+        problems, warnings, tests = parseTrialOutput(output)
+        elapsed = time.time() - start
+
+        self.assertEqual(len(tests), failures)
+        # Very conservative; parsing is usually several times faster.
+        self.assertTrue(len(output) / elapsed > 5 * 1024 * 1024,
+                        "Parsed %d bytes in %.2fs" % (len(output), elapsed))
+
+
+
+class TestDurationsTests(unittest.TestCase):
+    """
+    Tests for L{formatSlowestTests}, L{saveTestDurations} and
+    L{loadTestDurations}.
+    """
+
+    def test_formatSlowestTests(self):
+        """
+        L{formatSlowestTests} lists only the slowest tests, slowest first.
+        """
+        durations = [('a.test_fast', 0.001), ('a.test_slow', 12.5),
+                     ('a.test_medium', 1.25)]
+        self.assertEqual(formatSlowestTests(durations, 2),
+                         "    12.500s a.test_slow\n"
+                         "     1.250s a.test_medium\n")
+
+
+    def test_saveAndLoad(self):
+        """
+        Durations saved for a build can be loaded again by build number.
+        """
+        basedir = self.mktemp()
+        saveTestDurations(basedir, 3, 'trial', [('a.test_one', 0.5)])
+        self.assertEqual(loadTestDurations(basedir, 3, 'trial'),
+                         {'a.test_one': 0.5})
+        self.assertEqual(loadTestDurations(basedir, 4, 'trial'), None)
+
+
+    def test_savePrunes(self):
+        """
+        Only the durations of the C{keep} most recent builds of a step are
+        kept.
+        """
+        basedir = self.mktemp()
+        saveTestDurations(basedir, 1, 'trial', [('a.test_one', 0.5)], keep=1)
+        os.utime(testDurationsPath(basedir, 1, 'trial'), (0, 0))
+        saveTestDurations(basedir, 1, 'other', [('a.test_one', 0.5)], keep=1)
+        saveTestDurations(basedir, 2, 'trial', [('a.test_one', 0.5)], keep=1)
+        self.assertFalse(
+            os.path.exists(testDurationsPath(basedir, 1, 'trial')))
+        self.assertTrue(
+            os.path.exists(testDurationsPath(basedir, 1, 'other')))
+        self.assertTrue(
+            os.path.exists(testDurationsPath(basedir, 2, 'trial')))
+
+
+
+class WorkerLogFilesTests(unittest.TestCase):
+    """
+    Tests for L{workerLogFiles}.
+    """
+
+    def test_workerLogFiles(self):
+        """
+        Each worker's C{test.log} is in a directory named after its number.
+        """
+        self.assertEqual(workerLogFiles(2), {
+            "test.log-0": "_trial_temp/0/test.log",
+            "test.log-1": "_trial_temp/1/test.log",
+            })
+
+
+    def test_temp(self):
+        """
+        The workers run in the temp directory given, and the log names get
+        the suffix given.
+        """
+        self.assertEqual(
+            workerLogFiles(2, "_trial_temp-select", " (select)"), {
+                "test.log-0 (select)": "_trial_temp-select/0/test.log",
+                "test.log-1 (select)": "_trial_temp-select/1/test.log",
+                })
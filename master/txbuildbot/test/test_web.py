@@ -0,0 +1,426 @@
+import json
+
+from twisted.trial import unittest
+from twisted.internet import defer
+
+from txbuildbot.test.fakes import FakeBuildStatus
+
+from txbuildbot.web import BoxesCache, TenBoxesPerBuilder, BoxesJSON
+from txbuildbot.web import ForceBranch
+from txbuildbot.web import groupForceSchedulers
+
+
+
+class FakeParameter(object):
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+
+
+class FakeForceScheduler(object):
+    """
+    @ivar buildsets: the keyword arguments of each call to
+        C{addBuildsetForLatest}
+    """
+
+    def __init__(self, builderNames, project="", properties=(),
+                 name="force"):
+        self.name = name
+        self.builderNames = builderNames
+        self.repository = FakeParameter("repository", "")
+        self.project = FakeParameter("project", project)
+        self.forcedProperties = [FakeParameter(name, default)
+                                 for name, default in properties]
+        self.buildsets = []
+
+    def addBuildsetForLatest(self, **kwargs):
+        self.buildsets.append(kwargs)
+        return defer.succeed((len(self.buildsets), {}))
+
+
+
+class FakeAuthz(object):
+    def __init__(self, allowed):
+        self.allowed = allowed
+
+    def actionAllowed(self, action, request):
+        return defer.succeed(self.allowed)
+
+    def getUsername(self, request):
+        return "alice"
+
+
+
+class FakeMaster(object):
+    def __init__(self, schedulers):
+        self.schedulers = schedulers
+
+    def allSchedulers(self):
+        return self.schedulers
+
+
+
+class FakeBuilder(object):
+    """
+    A builder with no running builds, whose finished builds are C{builds}.
+    """
+
+    def __init__(self, name, builds=()):
+        self.name = name
+        self.builds = builds
+
+    def getName(self):
+        return self.name
+
+    def getState(self):
+        return ("idle", [])
+
+    def getCurrentBuilds(self):
+        return []
+
+    def generateFinishedBuilds(self, branches, num_builds):
+        return iter(self.builds[:num_builds])
+
+
+
+class FakeStatus(object):
+    def __init__(self, builders):
+        self.builders = dict((builder.getName(), builder)
+                             for builder in builders)
+
+    def getBuilderNames(self, categories=None):
+        return sorted(self.builders)
+
+    def getBuilder(self, name):
+        return self.builders[name]
+
+
+
+class FakeService(object):
+    def __init__(self, authz, master, status=None):
+        self.authz = authz
+        self.master = master
+        self.status = status
+
+    def getStatus(self):
+        return self.status
+
+
+
+class FakeSite(object):
+    def __init__(self, buildbot_service):
+        self.buildbot_service = buildbot_service
+
+
+
+class FakeRequest(object):
+    def __init__(self, prepath, method="GET", args=None, site=None):
+        self.prepath = prepath
+        self.method = method
+        if args is None:
+            args = {}
+        self.args = args
+        self.site = site
+        self.code = 200
+
+    def setResponseCode(self, code):
+        self.code = code
+
+
+
+class BoxesCacheTests(unittest.TestCase):
+    """
+    Tests for L{BoxesCache}.
+    """
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = BoxesCache(ttl=60, maxEntries=2, clock=lambda: self.now)
+
+
+    def test_get(self):
+        """
+        A rendered page is returned until it is invalidated.
+        """
+        self.assertEqual(self.cache.get('a'), None)
+        self.cache.put('a', '<div/>')
+        self.assertEqual(self.cache.get('a'), '<div/>')
+
+
+    def test_ttl(self):
+        """
+        Rendered pages expire after C{ttl} seconds.
+        """
+        self.cache.put('a', '<div/>')
+        self.now += 61
+        self.assertEqual(self.cache.get('a'), None)
+
+
+    def test_maxEntries(self):
+        """
+        The oldest page is evicted once there are more than C{maxEntries}.
+        """
+        self.cache.put('a', '1')
+        self.cache.put('b', '2')
+        self.cache.put('c', '3')
+        self.assertEqual(
+            [self.cache.get(key) for key in 'abc'], [None, '2', '3'])
+
+
+    def test_buildEvents(self):
+        """
+        Builds starting or finishing, and builders changing state, empty the
+        cache.
+        """
+        for event, args in [
+            (self.cache.buildStarted, ('builder', None)),
+            (self.cache.buildFinished, ('builder', None, None)),
+            (self.cache.builderChangedState, ('builder', 'idle')),
+            ]:
+            self.cache.put('a', '<div/>')
+            event(*args)
+            self.assertEqual(self.cache.get('a'), None)
+
+
+    def test_builderAdded(self):
+        """
+        L{BoxesCache} subscribes to the builds of every builder.
+        """
+        self.assertIdentical(self.cache.builderAdded('builder', None),
+                             self.cache)
+
+
+    def test_waitForChange(self):
+        """
+        L{BoxesCache.waitForChange} fires with the new version when the cache
+        is next invalidated.
+        """
+        version = self.cache.version
+        fired = []
+        self.cache.waitForChange().addCallback(fired.append)
+        self.assertEqual(fired, [])
+        self.cache.buildStarted('builder', None)
+        self.assertEqual(self.cache.version, version + 1)
+        self.assertEqual(fired, [version + 1])
+
+
+    def test_stopWaiting(self):
+        """
+        L{BoxesCache.stopWaiting} forgets a L{Deferred} without firing it.
+        """
+        fired = []
+        d = self.cache.waitForChange()
+        d.addCallback(fired.append)
+        self.cache.stopWaiting(d)
+        self.cache.invalidate()
+        self.assertEqual(fired, [])
+
+
+
+class CacheKeyTests(unittest.TestCase):
+    """
+    Tests for L{TenBoxesPerBuilder.getCacheKey}.
+    """
+
+    def test_categories(self):
+        """
+        The boxes of different categories have different keys.
+        """
+        request = FakeRequest(['boxes'])
+        self.assertNotEqual(
+            TenBoxesPerBuilder(['a']).getCacheKey(request, 10),
+            TenBoxesPerBuilder(['b']).getCacheKey(request, 10))
+
+
+    def test_depth(self):
+        """
+        The boxes requested at different depths have different keys, since
+        their links are relative to the request, but they are shared by pages
+        at the same depth.
+        """
+        boxes = TenBoxesPerBuilder(['a'])
+        self.assertEqual(
+            boxes.getCacheKey(FakeRequest(['boxes']), 10),
+            boxes.getCacheKey(FakeRequest(['boxes-all']), 10))
+        self.assertNotEqual(
+            boxes.getCacheKey(FakeRequest(['boxes']), 10),
+            boxes.getCacheKey(FakeRequest(['boxes', 'json']), 10))
+
+
+
+class BoxesJSONTests(unittest.TestCase):
+    """
+    Tests for L{BoxesJSON}.
+    """
+
+    def setUp(self):
+        builder = FakeBuilder("lint", [
+                FakeBuildStatus(3, branch="trunk", got_revision="abc")])
+        self.site = FakeSite(FakeService(
+                FakeAuthz(False), FakeMaster([]), FakeStatus([builder])))
+        self.json = BoxesJSON(TenBoxesPerBuilder(cache=BoxesCache()))
+
+
+    def test_links(self):
+        """
+        The links in the rows are relative to the root of the web status,
+        whatever the depth of the boxes page polling them.
+        """
+        for prepath in [["boxes", "json"], ["boxes", "", "json"]]:
+            rows = json.loads(self.json.getJSON(
+                    FakeRequest(prepath, site=self.site)))['builders']
+            self.assertEqual(
+                [(row['url'], [box['url'] for box in row['boxes']])
+                 for row in rows],
+                [("builders/lint", ["builders/lint/builds/3"])])
+
+
+
+class GroupForceSchedulersTests(unittest.TestCase):
+    """
+    Tests for L{groupForceSchedulers}.
+    """
+
+    def test_sameSourceStamp(self):
+        """
+        Schedulers building the same source stamp with the same properties
+        are grouped, with all of their builders.
+        """
+        supported = FakeForceScheduler(
+            ["a", "b"], properties=[("test-case-name", "twisted")])
+        unsupported = FakeForceScheduler(
+            ["c", "a"], properties=[("test-case-name", "twisted")])
+        self.assertEqual(groupForceSchedulers([supported, unsupported]),
+                         [(supported, ["a", "b", "c"])])
+
+
+    def test_differentSourceStamps(self):
+        """
+        Schedulers building different projects, or with different
+        properties, are kept apart.
+        """
+        supported = FakeForceScheduler(
+            ["a"], properties=[("test-case-name", "twisted")])
+        other = FakeForceScheduler(
+            ["b"], properties=[("test-case-name", "twisted.web")])
+        pyopenssl = FakeForceScheduler(["c"], project="pyopenssl")
+        self.assertEqual(
+            groupForceSchedulers([supported, other, pyopenssl]),
+            [(supported, ["a"]), (other, ["b"]), (pyopenssl, ["c"])])
+
+
+
+class ForceBranchTests(unittest.TestCase):
+    """
+    Tests for L{ForceBranch}.
+    """
+
+    def setUp(self):
+        self.supported = FakeForceScheduler(
+            ["lint", "pyflakes"], name="force-supported",
+            properties=[("test-case-name", "twisted")])
+        self.unsupported = FakeForceScheduler(
+            ["windows"], name="force-unsupported",
+            properties=[("test-case-name", "twisted")])
+        self.other = FakeForceScheduler(
+            ["docs"], name="force-other", project="docs")
+        self.authz = FakeAuthz(True)
+        self.site = FakeSite(FakeService(self.authz, FakeMaster(
+                    [self.supported, self.unsupported, self.other])))
+
+
+    def force(self, method="POST", **args):
+        """
+        Request a branch to be forced.
+
+        @return: the request and the parsed JSON response
+        """
+        request = FakeRequest(["force-branch"], method, args, self.site)
+        responses = []
+        ForceBranch().content(request, {}).addCallback(responses.append)
+        self.assertEqual(len(responses), 1)
+        return request, json.loads(responses[0])
+
+
+    def allBuildsets(self):
+        return (self.supported.buildsets + self.unsupported.buildsets +
+                self.other.buildsets)
+
+
+    def test_force(self):
+        """
+        The builders of the categories which force the same source stamp
+        with the same properties get one buildset of the latest revision of
+        the branch, and the ids of the buildsets and the names of the
+        builders are returned.
+        """
+        request, response = self.force(
+            branch=["/branches/foo-1"],
+            category=["supported", "unsupported", "other"])
+        self.assertEqual(request.code, 200)
+        self.assertEqual(response, {
+                "branch": "/branches/foo-1",
+                "buildsets": [1, 1],
+                "builders": ["lint", "pyflakes", "windows", "docs"]})
+        self.assertEqual(self.unsupported.buildsets, [])
+        [buildset] = self.supported.buildsets
+        self.assertEqual(buildset["branch"], "/branches/foo-1")
+        self.assertEqual(buildset["builderNames"],
+                         ["lint", "pyflakes", "windows"])
+        self.assertEqual(buildset["project"], "")
+        properties = buildset["properties"]
+        self.assertEqual(properties.getProperty("test-case-name"), "twisted")
+        self.assertEqual(properties.getProperty("owner"), "alice")
+        self.assertEqual(properties.getProperty("reason"), buildset["reason"])
+        [buildset] = self.other.buildsets
+        self.assertEqual(buildset["builderNames"], ["docs"])
+        self.assertEqual(buildset["project"], "docs")
+
+
+    def test_get(self):
+        """
+        Builds are only forced by a POST.
+        """
+        request, response = self.force(
+            "GET", branch=["/branches/foo-1"], category=["supported"])
+        self.assertEqual(request.code, 405)
+        self.assertIn("error", response)
+        self.assertEqual(self.allBuildsets(), [])
+
+
+    def test_notAllowed(self):
+        """
+        Builds are only forced by users allowed to force all builds.
+        """
+        self.authz.allowed = False
+        request, response = self.force(
+            branch=["/branches/foo-1"], category=["supported"])
+        self.assertEqual(request.code, 403)
+        self.assertIn("error", response)
+        self.assertEqual(self.allBuildsets(), [])
+
+
+    def test_missingArguments(self):
+        """
+        A branch and a category are needed.
+        """
+        for args in [{"category": ["supported"]},
+                     {"branch": ["/branches/foo-1"]},
+                     {"branch": ["/branches/foo-1"], "category": [""]}]:
+            request, response = self.force(**args)
+            self.assertEqual(request.code, 400)
+            self.assertIn("error", response)
+        self.assertEqual(self.allBuildsets(), [])
+
+
+    def test_unknownCategory(self):
+        """
+        If any of the categories has no force scheduler, nothing is forced.
+        """
+        request, response = self.force(
+            branch=["/branches/foo-1"], category=["supported", "bogus"])
+        self.assertEqual(request.code, 404)
+        self.assertEqual(response,
+                         {"error": "No such scheduler: force-bogus"})
+        self.assertEqual(self.allBuildsets(), [])
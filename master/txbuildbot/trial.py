@@ -0,0 +1,403 @@
+"""
+Parsers for the output of trial.
+"""
+
+import os
+import re
+import heapq
+import calendar
+from datetime import datetime
+from operator import itemgetter
+
+from twisted.python import log
+
+from buildbot.status.builder import SUCCESS, FAILURE, WARNINGS, SKIPPED
+
+from txbuildbot.buildindex import readJSON, writeJSONAndPrune
+from txbuildbot.logobserver import PartialLineObserver
+
+
+
+class SubunitTestResult(object):
+    """
+    The outcome of a single test, as reported by subunit.
+
+    @ivar testId: the id of the test, like
+        C{twisted.test.test_defer.DeferredTests.test_callback}
+    @ivar outcome: the subunit outcome, such as C{'success'} or C{'failure'}
+    @ivar details: the traceback or reason given with the outcome, or C{''}
+    @ivar duration: seconds the test took to run, or C{None} if the stream
+        didn't have C{time:} lines around it, as trial's subunit reporter
+        doesn't
+    """
+
+    def __init__(self, testId, outcome, details, duration):
+        self.testId = testId
+        self.outcome = outcome
+        self.details = details
+        self.duration = duration
+
+
+    def __repr__(self):
+        return "<SubunitTestResult %s %s>" % (self.testId, self.outcome)
+
+
+
+class SubunitParser(object):
+    """
+    An incremental parser for version 1 of the subunit protocol, which is what
+    trial's C{--reporter=subunit} writes.
+
+    Lines which aren't part of the protocol, such as warnings printed while
+    importing tests, are ignored.
+
+    @cvar outcomes: mapping of the outcome keywords of the protocol to the
+        canonical name of the outcome and the status of a test with that
+        outcome.
+
+    @ivar results: L{list} of L{SubunitTestResult}s, in the order the tests
+        finished
+    """
+
+    outcomes = {
+        'success': ('success', SUCCESS),
+        'successful': ('success', SUCCESS),
+        'failure': ('failure', FAILURE),
+        'error': ('error', FAILURE),
+        'skip': ('skip', SKIPPED),
+        'xfail': ('xfail', SUCCESS),
+        'uxsuccess': ('uxsuccess', WARNINGS),
+        }
+
+    _outcomePattern = re.compile(
+        r'^(%s):? (\S+)( \[( multipart)?)?\s*$' % (
+            '|'.join(sorted(outcomes, reverse=True)),))
+    _testPattern = re.compile(r'^(?:test|testing):? (\S+)\s*$')
+    _timePattern = re.compile(
+        r'^time: (\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(\d+))?Z?\s*$')
+
+    def __init__(self):
+        self.results = []
+        self._time = None
+        self._started = {}
+        self._details = None
+        self._pending = None
+
+
+    def lineReceived(self, line):
+        """
+        @type line: L{str}
+        @param line: a line of output, without the trailing newline
+        """
+        if self._details is not None:
+            if line.rstrip('\r') == ']':
+                self._finish(''.join(self._details))
+            else:
+                # A ] in the details is escaped with a leading space.
+                if line.startswith(' ]'):
+                    line = line[1:]
+                self._details.append(line + '\n')
+            return
+
+        match = self._outcomePattern.match(line)
+        if match:
+            keyword, testId, bracket, multipart = match.groups()
+            self._pending = (testId, keyword)
+            if bracket:
+                self._details = []
+            else:
+                self._finish('')
+            return
+
+        match = self._testPattern.match(line)
+        if match:
+            self._started[match.group(1)] = self._time
+            return
+
+        match = self._timePattern.match(line)
+        if match:
+            self._time = self._parseTime(match.groups())
+
+
+    def _parseTime(self, fields):
+        """
+        @return: the time described by the fields of a C{time:} line, in
+            seconds since the epoch
+        """
+        fraction = fields[-1] or '0'
+        try:
+            when = datetime(*map(int, fields[:-1]))
+        except ValueError:
+            log.msg("Ignoring bad subunit time %r" % (fields,))
+            return self._time
+        return calendar.timegm(when.timetuple()) + float('0.' + fraction)
+
+
+    def _finish(self, details):
+        testId, keyword = self._pending
+        self._pending = None
+        self._details = None
+        started = self._started.pop(testId, None)
+        if started is None or self._time is None:
+            duration = None
+        else:
+            duration = max(0.0, self._time - started)
+        outcome = self.outcomes[keyword][0]
+        self.results.append(
+            SubunitTestResult(testId, outcome, details, duration))
+
+
+    def getCounts(self):
+        """
+        Count the tests by outcome.
+
+        @return: a L{dict} like the one returned by
+            L{twisted_steps.countFailedTests}; C{total} is C{None} if no tests
+            were reported.
+        """
+        counts = {
+            'total': len(self.results) or None,
+            'successes': 0,
+            'failures': 0,
+            'errors': 0,
+            'skips': 0,
+            'expectedFailures': 0,
+            'unexpectedSuccesses': 0,
+            }
+        keys = {
+            'success': 'successes',
+            'failure': 'failures',
+            'error': 'errors',
+            'skip': 'skips',
+            'xfail': 'expectedFailures',
+            'uxsuccess': 'unexpectedSuccesses',
+            }
+        for result in self.results:
+            counts[keys[result.outcome]] += 1
+        return counts
+
+
+    @classmethod
+    def getStatus(cls, outcome):
+        """
+        @return: the buildbot status of a test with C{outcome}
+        """
+        return cls.outcomes[outcome][1]
+
+
+
+class SubunitObserver(PartialLineObserver):
+    """
+    Feed the output of C{trial --reporter=subunit} to a L{SubunitParser} as it
+    arrives, and report progress in the C{tests} metric.
+    """
+
+    def __init__(self, parser):
+        PartialLineObserver.__init__(self)
+        self.parser = parser
+
+
+    def outLineReceived(self, line):
+        finished = len(self.parser.results)
+        self.parser.lineReceived(line)
+        if len(self.parser.results) != finished:
+            self.step.setProgress('tests', len(self.parser.results))
+
+
+    def finish(self):
+        """
+        Parse any output after the last newline.
+        """
+        self.flushLines()
+
+
+
+_problemResults = {
+    'SKIPPED': SKIPPED,
+    'EXPECTED FAILURE': SUCCESS,
+    'UNEXPECTED SUCCESS': WARNINGS,
+    'FAILURE': FAILURE,
+    'ERROR': FAILURE,
+    'SUCCESS': SUCCESS, # not reported
+    }
+
+# the first line after the === is like:
+# EXPECTED FAILURE: testLackOfTB (twisted.test.test_failure.FailureTestCase)
+# SKIPPED: testRETR (twisted.test.test_ftp.TestFTPServer)
+# FAILURE: testBatchFile (twisted.conch.test.test_sftp.TestOurServerBatchFile)
+_problemHeader = re.compile(r'^([^:]+): (\w+) \(([\w\.]+)\)')
+
+_doubleSeparator = "=" * 60
+_singleSeparator = "-" * 60
+
+
+
+def _iterLines(text, start=0):
+    """
+    Split C{text} into lines, keeping the newlines, like repeatedly calling
+    C{readline} on a C{StringIO}.
+
+    @return: an iterator of C{(offset, line)}
+    """
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start) + 1 or length
+        yield start, text[start:end]
+        start = end
+
+
+
+def workerLogFiles(jobs, temp="_trial_temp", suffix=""):
+    """
+    Get the logs of the workers of a C{trial --jobs} run.
+
+    Each worker runs in a directory of trial's temp directory named after its
+    number, and logs to its own C{test.log} there.
+
+    @type jobs: L{int}
+    @param jobs: the number of workers
+
+    @type temp: L{str}
+    @param temp: trial's temp directory
+
+    @type suffix: L{str}
+    @param suffix: added to the name of each log
+
+    @return: a L{dict} mapping log names to paths, suitable for the
+        C{logfiles} of a L{ShellCommand}
+    """
+    return dict(("test.log-%d%s" % (worker, suffix),
+                 "%s/%d/test.log" % (temp, worker))
+                for worker in range(jobs))
+
+
+
+def parseTrialOutput(output):
+    """
+    Find the warnings, and the problems reported for each test, in the output
+    of C{trial --reporter=bwverbose}.
+
+    This is a single pass over the output, so that builds with thousands of
+    failures don't block the master for long.
+
+    The output of C{trial --jobs} is handled too: disttrial writes the output
+    of each test in one piece when the test finishes, and prints the usual
+    problems section and summary once all the workers are done.
+
+    @type output: L{str}
+    @param output: the output of trial
+
+    @return: a tuple of the problems section of the output (or C{""} if there
+        isn't one); a L{dict} mapping each warning to the number of times it
+        was emitted; and a L{list} of C{(testname, results, text, log)} for each
+        test described in the problems section, where C{testname} is a
+        L{tuple} of the parts of the test's name.
+    """
+    warnings = {}
+    problemsStart = None
+    lines = _iterLines(output)
+    for offset, line in lines:
+        if " exceptions.DeprecationWarning: " in line:
+            # no source
+            warning = line # TODO: consider stripping basedir prefix here
+            warnings[warning] = warnings.get(warning, 0) + 1
+        elif " DeprecationWarning: " in line or " UserWarning: " in line:
+            # next line is the source
+            warning = line + next(lines, (None, ""))[1]
+            warnings[warning] = warnings.get(warning, 0) + 1
+        elif "Warning: " in line:
+            warning = line
+            warnings[warning] = warnings.get(warning, 0) + 1
+
+        if (line.startswith(_doubleSeparator) or
+            line.startswith(_singleSeparator)):
+            problemsStart = offset
+            break
+
+    if problemsStart is None:
+        return "", warnings, []
+
+    tests = []
+    testname = None
+    lines = _iterLines(output, problemsStart)
+    # eat the first separator line
+    next(lines)
+    for offset, line in lines:
+        if line.startswith(_doubleSeparator):
+            if testname:
+                tests.append((testname, results, text, "".join(loog)))
+                testname = None
+            continue
+        if line.startswith(_singleSeparator):
+            # the last case has --- as a separator before the
+            # summary counts are printed
+            break
+        if testname is None:
+            r = _problemHeader.match(line)
+            if not r:
+                # TODO: cleanup, if there are no problems,
+                # we hit here
+                continue
+            result, name, case = r.groups()
+            testname = tuple(case.split(".") + [name])
+            results = _problemResults.get(result, WARNINGS)
+            text = result.lower().split()
+            # the next line is all dashes
+            loog = [line, next(lines, (None, ""))[1]]
+        else:
+            # the rest goes into the log
+            loog.append(line)
+    if testname:
+        tests.append((testname, results, text, "".join(loog)))
+
+    return output[problemsStart:], warnings, tests
+
+
+
+def formatSlowestTests(durations, count):
+    """
+    @type durations: L{list} of C{(testId, seconds)}
+    @param durations: how long each test took
+
+    @param count: number of tests to list
+
+    @return: a report of the C{count} slowest tests, slowest first, one per
+        line
+    """
+    slowest = heapq.nlargest(count, durations, key=itemgetter(1))
+    return "".join([
+        "%10.3fs %s\n" % (seconds, testId) for (testId, seconds) in slowest])
+
+
+
+def testDurationsPath(basedir, number, stepName):
+    """
+    @type basedir: L{str}
+    @param basedir: directory of the builder
+
+    @return: the path of the test durations saved by the trial step
+        C{stepName} of build C{number}
+    """
+    return os.path.join(basedir, 'test-durations',
+                        '%d-%s.json' % (number, stepName))
+
+
+
+def saveTestDurations(basedir, number, stepName, durations, keep=1000):
+    """
+    Save how long each test took in a build, keeping the durations for only
+    the C{keep} most recent builds of the step.
+
+    @type durations: L{list} of C{(testId, seconds)}
+    """
+    writeJSONAndPrune(testDurationsPath(basedir, number, stepName),
+                      dict(durations), '*-%s.json' % (stepName,), keep)
+
+
+
+def loadTestDurations(basedir, number, stepName):
+    """
+    @return: a L{dict} mapping test ids to the seconds they took in build
+        C{number}, or C{None} if none were saved
+    """
+    return readJSON(testDurationsPath(basedir, number, stepName))
@@ -1,16 +1,24 @@
+import os
 import time
+import json
+from collections import OrderedDict
 
-from buildbot.status.web.base import HtmlResource, map_branches, build_get_class, path_to_builder, path_to_build
+from buildbot.status.web.base import HtmlResource, map_branches, build_get_class, path_to_builder, path_to_build, path_to_root, css_classes
 from buildbot.status.builder import SUCCESS, WARNINGS, FAILURE, SKIPPED, EXCEPTION, RETRY
 from buildbot.status.web.waterfall import WaterfallStatusResource
 from buildbot.status import html
 from buildbot.util import formatInterval
+from buildbot.process.properties import Properties
 
-from twisted.web.util import Redirect
-from twisted.internet import defer
+from twisted.internet import defer, task
 
 from twisted.web.template import tags, flattenString
 
+from txbuildbot.lint import loadLintResults
+from txbuildbot.receiver import BuilderWatcher
+from txbuildbot.summaries import BranchSummaries, summarizeBuild
+from txbuildbot.grid import GridModel
+
 _backgroundColors = {
     SUCCESS: "green",
     WARNINGS: "orange",
@@ -23,6 +31,121 @@ _backgroundColors = {
     None: "yellow",
     }
 
+class BoxesCache(BuilderWatcher):
+    """
+    The rendered bodies of the boxes pages, shared by all of them.
+
+    Subscribed to the status, it is emptied whenever a build starts or
+    finishes or a builder changes state. Entries also expire after C{ttl}
+    seconds, since the ETAs of running builds go stale.
+
+    @ivar ttl: seconds a rendered page is used for
+    @ivar maxEntries: number of pages to keep; the least recently rendered is
+        evicted first.
+    @ivar version: number of times the boxes have changed, which clients of
+        L{BoxesJSON} use to wait for the next change.
+    """
+
+    def __init__(self, ttl=60, maxEntries=100, clock=time.time):
+        BuilderWatcher.__init__(self)
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.clock = clock
+        self.version = 0
+        self._entries = OrderedDict()
+        self._waiting = []
+
+
+    def get(self, key):
+        """
+        @return: the body rendered for C{key}, or C{None}
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        rendered, body = entry
+        if self.clock() - rendered > self.ttl:
+            del self._entries[key]
+            return None
+        return body
+
+
+    def put(self, key, body):
+        """
+        Cache C{body}, evicting the oldest entry if the cache is full.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (self.clock(), body)
+        while len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+
+
+    def invalidate(self):
+        """
+        Forget all the rendered pages, and tell everything waiting for the
+        boxes to change that they have.
+        """
+        self._entries.clear()
+        self.version += 1
+        waiting, self._waiting = self._waiting, []
+        for d in waiting:
+            d.callback(self.version)
+
+
+    def waitForChange(self):
+        """
+        @return: a L{Deferred} which fires with the new L{version} the next
+            time the boxes change
+        """
+        d = defer.Deferred()
+        self._waiting.append(d)
+        return d
+
+
+    def stopWaiting(self, d):
+        """
+        Forget a L{Deferred} returned by L{waitForChange}, without firing it.
+        """
+        if d in self._waiting:
+            self._waiting.remove(d)
+
+
+    def builderAdded(self, name, builder):
+        self.invalidate()
+        return BuilderWatcher.builderAdded(self, name, builder)
+
+
+    def builderRemoved(self, name):
+        BuilderWatcher.builderRemoved(self, name)
+        self.invalidate()
+
+
+    def builderChangedState(self, name, state):
+        self.invalidate()
+
+
+    def buildStarted(self, builderName, build):
+        self.invalidate()
+
+
+    def buildFinished(self, builderName, build, results):
+        self.invalidate()
+
+
+
+def _boxLabel(revision, number):
+    """
+    @return: the label of the box of a build: its revision, or its number if
+        it doesn't have a sensible one.
+    """
+    # Label should never be "None", but sometimes
+    # buildbot has disgusting bugs.
+    if not revision or revision == "None" or len(str(revision)) > 20:
+        return "#%d" % (number,)
+    return revision
+
+
+
 # /boxes[-things]
 #  accepts builder=, branch=, num_builds=
 class TenBoxesPerBuilder(HtmlResource):
@@ -33,13 +156,19 @@ class TenBoxesPerBuilder(HtmlResource):
 
     builder=: show only builds for this builder. Multiple builder= arguments
               can be used to see builds from any builder in the set.
+
+    The same boxes are available as JSON from the json child, which
+    txbuildbot.js polls to update the page in place.
     """
 
     title = "Latest Build"
 
-    def __init__(self, categories=None):
+    def __init__(self, categories=None, cache=None, summaries=None):
         HtmlResource.__init__(self)
         self.categories = categories
+        self.cache = cache
+        self.summaries = summaries
+        self.putChild("json", BoxesJSON(self))
 
 
     @defer.inlineCallbacks
@@ -50,11 +179,12 @@ class TenBoxesPerBuilder(HtmlResource):
         defer.returnValue(template.render(**context))
 
 
-    @defer.inlineCallbacks
-    def body(self, req):
+    def getArguments(self, req):
+        """
+        @return: the names of the builders, the branches and the number of
+            finished builds of them to show, from the request's arguments
+        """
         status = self.getStatus(req)
-        authz = self.getAuthz(req)
-        
         builders = req.args.get("builder", status.getBuilderNames(categories=self.categories))
         branches = [b for b in req.args.get("branch", []) if b]
         if not branches:
@@ -64,6 +194,34 @@ class TenBoxesPerBuilder(HtmlResource):
         else:
             defaultCount = "10"
         num_builds = int(req.args.get("num_builds", [defaultCount])[0])
+        return builders, branches, num_builds
+
+
+    def getCacheKey(self, req, *parts):
+        """
+        Get the key of a rendering of the boxes in C{self.cache}.
+
+        The links in the boxes are relative to the requested page, so the
+        renderings for pages at different depths are kept apart.
+
+        @param parts: whatever else the rendering depends on
+        """
+        return (path_to_root(req), tuple(self.categories or ())) + parts
+
+
+    @defer.inlineCallbacks
+    def body(self, req):
+        authz = self.getAuthz(req)
+
+        builders, branches, num_builds = self.getArguments(req)
+        forceAllowed = yield authz.actionAllowed('forceAllBuilds', req)
+
+        key = self.getCacheKey(req, tuple(builders), tuple(branches),
+                               num_builds, bool(forceAllowed))
+        if self.cache is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                defer.returnValue(body)
 
         tag = tags.div()
         
@@ -74,81 +232,520 @@ class TenBoxesPerBuilder(HtmlResource):
                          onsubmit="return checkBranch(branch.value)")
         form(tags.input(type="test", name="branch", placeholder=branches[0], size="40"))
         form(tags.input(type="submit", value="View"))
-        if (yield authz.actionAllowed('forceAllBuilds', req)):
+        if forceAllowed:
             # XXX: Unsafe interpolation
             form(tags.button(type="button",
-                onclick="forceBranch(branch.value || %r, %r)"
+                onclick="forceBranch(branch.value || %r, %r, this)"
                         % (branches[0], self.categories,)
                 )("Force"))
         tag(form)
 
 
-        table = tags.table(style="clear:both")
+        version = ""
+        if self.cache is not None:
+            version = str(self.cache.version)
+        # The boxes from the json child are updated in place with links
+        # relative to the root, which txbuildbot.js finds from data-root.
+        table = tags.table(id="boxes", style="clear:both",
+                           **{"data-version": version,
+                              "data-root": path_to_root(req)})
         tag(table)
 
-        for bn in builders:
-            builder = status.getBuilder(bn)
-            state = builder.getState()[0]
-            if state == 'building':
-                state = 'idle'
-            row = tags.tr()
+        for builderRow in self.getRows(req, builders, branches, num_builds):
+            row = tags.tr(**{"data-builder": builderRow['name']})
             table(row)
-            builderLink = path_to_builder(req, builder)
-            row(tags.td(class_="box %s" % (state,))(tags.a(href=builderLink)(bn)))
-
-            builds = sorted([
-                    build for build in builder.getCurrentBuilds()
-                    if build.getSourceStamp().branch in map_branches(branches)
-                    ], key=lambda build: build.getNumber(), reverse=True)
-
-            builds.extend(builder.generateFinishedBuilds(map_branches(branches),
-                                                         num_builds=num_builds))
-            if builds:
-                for b in builds:
-                    url = path_to_build(req, b)
-                    try:
-                        label = b.getProperty("got_revision")
-                    except KeyError:
-                        label = None
-                    # Label should never be "None", but sometimes
-                    # buildbot has disgusting bugs.
-                    if not label or label == "None" or len(str(label)) > 20:
-                        label = "#%d" % b.getNumber()
-                    if b.isFinished():
-                        text = b.getText()
-                    else:
-                        when = b.getETA()
-                        if when:
-                            text = [
-                                "%s" % (formatInterval(when),),
-                                "%s" % (time.strftime("%H:%M:%S", time.localtime(time.time() + when)),)
-                                ]
-                        else:
-                            text = []
+            row(tags.td(class_="box %s" % (builderRow['state'],))(
+                    tags.a(href=builderRow['url'])(builderRow['name'])))
 
+            boxes = builderRow['boxes']
+            if boxes:
+                for box in boxes:
                     row(tags.td(
                             align="center",
-                            bgcolor=_backgroundColors[b.getResults()],
-                            class_=("LastBuild box ", build_get_class(b)))([
+                            bgcolor=box['color'],
+                            class_=("LastBuild box ", box['class']))([
                                 (element, tags.br)
                                 for element
-                                in [tags.a(href=url)(label)] + text]) )
+                                in [tags.a(href=box['url'])(box['label'])] + box['text']]) )
             else:
                 row(tags.td(class_="LastBuild box")("no build"))
-        defer.returnValue((yield flattenString(req, tag)))
+        body = yield flattenString(req, tag)
+        if self.cache is not None:
+            self.cache.put(key, body)
+        defer.returnValue(body)
+
+
+    def getRows(self, req, builders, branches, num_builds):
+        """
+        Describe the row of boxes of each builder.
+
+        @return: a L{list} of L{dict}s with the C{name}, C{url} and C{state}
+            of each builder, and its C{boxes} as returned by L{getBoxes}
+        """
+        status = self.getStatus(req)
+        rows = []
+        for bn in builders:
+            builder = status.getBuilder(bn)
+            state = builder.getState()[0]
+            if state == 'building':
+                state = 'idle'
+            rows.append({
+                    'name': bn,
+                    'url': path_to_builder(req, builder),
+                    'state': state,
+                    'boxes': self.getBoxes(req, builder, branches, num_builds),
+                    })
+        return rows
+
+
+    def getBoxes(self, req, builder, branches, num_builds):
+        """
+        Describe the boxes for a builder's running builds of some branches,
+        followed by its C{num_builds} most recent finished builds of them.
+
+        The finished builds come from the L{BranchSummaries} if they are
+        indexed there. Otherwise they are loaded, and added to the index.
+
+        @return: a L{list} of L{dict}s with the C{url} of each build, the
+            C{label} and C{text} to show, its C{results}, and the background
+            C{color} and CSS C{class} of its box
+        """
+        branches = map_branches(branches)
+        current = sorted([
+                build for build in builder.getCurrentBuilds()
+                if build.getSourceStamp().branch in branches
+                ], key=lambda build: build.getNumber(), reverse=True)
+
+        boxes = []
+        for b in current:
+            try:
+                revision = b.getProperty("got_revision")
+            except KeyError:
+                revision = None
+            when = b.getETA()
+            if when:
+                text = [
+                    "%s" % (formatInterval(when),),
+                    "%s" % (time.strftime("%H:%M:%S", time.localtime(time.time() + when)),)
+                    ]
+            else:
+                text = []
+            boxes.append({
+                    'url': path_to_build(req, b),
+                    'label': _boxLabel(revision, b.getNumber()),
+                    'text': text,
+                    'results': b.getResults(),
+                    'color': _backgroundColors[b.getResults()],
+                    'class': build_get_class(b),
+                    })
+
+        builderName = builder.getName()
+        finished = None
+        if self.summaries is not None:
+            finished = self.summaries.getBuilds(builderName, branches,
+                                                num_builds)
+        if finished is None:
+            finished = []
+            for b in builder.generateFinishedBuilds(branches,
+                                                    num_builds=num_builds):
+                summary = summarizeBuild(b)
+                if self.summaries is not None:
+                    self.summaries.record(
+                        builderName, b.getSourceStamp().branch, summary)
+                finished.append(summary)
+            if self.summaries is not None and len(finished) < num_builds:
+                # That was all of them, so don't search again next time.
+                self.summaries.markComplete(builderName, branches)
+
+        builderLink = path_to_builder(req, builder)
+        for summary in finished:
+            boxes.append({
+                    'url': "%s/builds/%d" % (builderLink, summary['number']),
+                    'label': _boxLabel(summary['revision'], summary['number']),
+                    'text': summary['text'],
+                    'results': summary['results'],
+                    'color': _backgroundColors[summary['results']],
+                    'class': css_classes.get(summary['results'], ""),
+                    })
+        return boxes
+
+
+
+class _RootRequest(object):
+    """
+    A request as seen by a page at the root of the web status, so that the
+    links worked out for it are relative to the root.
+    """
+
+    prepath = []
+
+    def __init__(self, request):
+        self._request = request
+
+
+    def __getattr__(self, name):
+        return getattr(self._request, name)
+
+
+
+# /boxes[-things]/json
+#  accepts builder=, branch=, num_builds=, version=
+class BoxesJSON(HtmlResource):
+    """
+    The rows of boxes of a L{TenBoxesPerBuilder} page, as a JSON object with
+    the C{version} of the boxes and the C{builders}, as returned by
+    L{TenBoxesPerBuilder.getRows}.
+
+    The links in the rows are relative to the root of the web status rather
+    than to this resource, since the boxes page they are put in may be at a
+    different depth: C{/boxes} or C{/boxes/}.
+
+    version=: if this is the current version, wait until the boxes change,
+              or for C{pollTimeout} seconds, before responding.
+
+    @cvar pollTimeout: the longest a request waits for the boxes to change,
+        so that clients still see the ETAs of running builds go down.
+    """
+
+    contentType = "application/json"
+    pollTimeout = 30
+
+    def __init__(self, boxes):
+        HtmlResource.__init__(self)
+        self.boxes = boxes
+
+
+    def content(self, req, context):
+        cache = self.boxes.cache
+        if cache is None:
+            return self.getJSON(req)
+        d = defer.succeed(None)
+        if req.args.get("version", [None])[0] == str(cache.version):
+            d = self.waitForChange(req, cache)
+        d.addCallback(lambda ignored: self.getJSON(req))
+        return d
+
+
+    def waitForChange(self, req, cache):
+        """
+        @return: a L{Deferred} which fires when the boxes change or the
+            request times out. It never fires if the client goes away first.
+        """
+        from twisted.internet import reactor
+        d = cache.waitForChange()
+
+        def timedOut():
+            cache.stopWaiting(d)
+            d.callback(cache.version)
+        timeout = reactor.callLater(self.pollTimeout, timedOut)
+
+        def finished(result):
+            if timeout.active():
+                timeout.cancel()
+            # Render the boxes once the status has finished telling
+            # everything about the change.
+            return task.deferLater(reactor, 0, lambda: result)
+        d.addBoth(finished)
+
+        def disconnected(reason):
+            cache.stopWaiting(d)
+            if timeout.active():
+                timeout.cancel()
+        req.notifyFinish().addErrback(disconnected)
+        return d
+
+
+    def getJSON(self, req):
+        req = _RootRequest(req)
+        builders, branches, num_builds = self.boxes.getArguments(req)
+        cache = self.boxes.cache
+        key = self.boxes.getCacheKey(req, "json", tuple(builders),
+                                     tuple(branches), num_builds)
+        if cache is not None:
+            body = cache.get(key)
+            if body is not None:
+                return body
+        body = json.dumps({
+                'version': cache.version if cache is not None else None,
+                'builders': self.boxes.getRows(req, builders, branches,
+                                               num_builds),
+                })
+        if cache is not None:
+            cache.put(key, body)
+        return body
+
+
+
+# /grid, /tgrid
+#  accepts branch=, category=, width=
+class RevisionGrid(HtmlResource):
+    """The results of each builder's latest build of each of the most recent
+    revisions of a branch, as kept by a L{GridModel}. Revisions are columns
+    and builders rows, or the other way around if transposed.
+
+    branch=: the branch to show, defaulting to trunk.
+    category=: show only builders in this category. Multiple category=
+               arguments can be used.
+    width=: the number of revisions to show, defaulting to 5.
+    """
+
+    title = "Grid"
+
+    def __init__(self, model, transposed=False):
+        HtmlResource.__init__(self)
+        self.model = model
+        self.transposed = transposed
+
+
+    @defer.inlineCallbacks
+    def content(self, req, context):
+        body = yield self.body(req)
+        context['content'] = body
+        template = req.site.buildbot_service.templates.get_template("empty.html")
+        defer.returnValue(template.render(**context))
+
+
+    def body(self, req):
+        status = self.getStatus(req)
+        categories = req.args.get("category") or None
+        builderNames = status.getBuilderNames(categories=categories)
+        branch = (req.args.get("branch", [""])[0]) or "trunk"
+        width = int(req.args.get("width", ["5"])[0])
+
+        for candidate in map_branches([branch]):
+            rows = self.model.getRows(candidate, width)
+            if rows:
+                break
+
+        cells = {}
+        builderLinks = {}
+        for builderName in builderNames:
+            builderLinks[builderName] = path_to_builder(
+                req, status.getBuilder(builderName))
+            cells[builderName] = tags.th(
+                tags.a(href=builderLinks[builderName])(builderName))
+        revisions = []
+        for revision, builds in rows:
+            revisions.append(tags.th(revision[:12]))
+            for builderName in builderNames:
+                summary = builds.get(builderName)
+                if summary is None:
+                    cells[builderName, revision] = tags.td()
+                    continue
+                url = "%s/builds/%d" % (builderLinks[builderName],
+                                        summary['number'])
+                cells[builderName, revision] = tags.td(
+                    align="center",
+                    bgcolor=_backgroundColors[summary['results']],
+                    class_=("LastBuild box ", css_classes.get(summary['results'], "")))([
+                        (element, tags.br)
+                        for element
+                        in [tags.a(href=url)("#%d" % (summary['number'],))] + summary['text']])
+
+        table = tags.table(style="clear:both")
+        if self.transposed:
+            table(tags.tr(tags.th(), [cells[name] for name in builderNames]))
+            for heading, (revision, builds) in zip(revisions, rows):
+                table(tags.tr(heading, [cells[name, revision]
+                                        for name in builderNames]))
+        else:
+            table(tags.tr(tags.th(), revisions))
+            for name in builderNames:
+                table(tags.tr(cells[name], [cells[name, revision]
+                                            for revision, builds in rows]))
+
+        tag = tags.div()
+        tag(tags.h2("Latest revisions: ", branch))
+        tag(table)
+        return flattenString(req, tag)
+
+
+
+# /lint-results
+#  accepts builder=, number=, step=
+class LintResults(HtmlResource):
+    """
+    The lint errors which were new, fixed and unchanged in a build, as saved
+    by L{txbuildbot.lint.LintStep.saveResults}, as a JSON object mapping
+    step names to results.
+
+    builder=: name of the builder.
+    number=: number of the build.
+    step=: show only the results of this step. Multiple step= arguments can
+           be used.
+    """
+
+    contentType = "application/json"
+
+    def content(self, req, context):
+        status = self.getStatus(req)
+        try:
+            builder = status.getBuilder(req.args["builder"][0])
+            number = int(req.args["number"][0])
+        except (KeyError, IndexError, ValueError):
+            req.setResponseCode(404)
+            return json.dumps({"error": "No such build"})
+
+        results = loadLintResults(builder.basedir, number)
+        steps = req.args.get("step")
+        if steps:
+            results = dict([(step, results[step])
+                            for step in steps if step in results])
+        return json.dumps(results, sort_keys=True)
+
+
+
+def groupForceSchedulers(schedulers):
+    """
+    Group force schedulers which build the same source stamp with the same
+    properties, so that each group's builds can be requested in one buildset.
+
+    @param schedulers: L{ForceScheduler}s, whose repository, project and
+        forced properties are all taken from their defaults
+
+    @return: a L{list} of C{(scheduler, builderNames)}, where C{scheduler} is
+        the first scheduler of a group and C{builderNames} are the builders
+        of every scheduler in it, in the order the schedulers were given
+    """
+    groups = OrderedDict()
+    for scheduler in schedulers:
+        properties = tuple(sorted([
+                    (parameter.name, parameter.default)
+                    for parameter in scheduler.forcedProperties]))
+        key = (scheduler.repository.default, scheduler.project.default,
+               properties)
+        first, builderNames = groups.setdefault(key, (scheduler, []))
+        for builderName in scheduler.builderNames:
+            if builderName not in builderNames:
+                builderNames.append(builderName)
+    return groups.values()
+
+
+
+# /force-branch
+#  accepts branch=, category=
+class ForceBranch(HtmlResource):
+    """
+    Force a build of a branch on every builder of some categories, as the
+    force-<category> schedulers would, as a JSON object with the ids of the
+    C{buildsets} and the C{builders} they were requested on.
+
+    Builds which use the same source stamp and properties are requested in a
+    single buildset, whose build requests are all added in one database
+    transaction.
+
+    branch=: the branch to build.
+    category=: the category of builders to build it on. Multiple category=
+               arguments can be used.
+    """
+
+    contentType = "application/json"
+
+    @defer.inlineCallbacks
+    def content(self, req, context):
+        if req.method != "POST":
+            req.setResponseCode(405)
+            defer.returnValue(json.dumps({"error": "Use POST"}))
+
+        authz = self.getAuthz(req)
+        allowed = yield authz.actionAllowed('forceAllBuilds', req)
+        if not allowed:
+            req.setResponseCode(403)
+            defer.returnValue(json.dumps({"error": "Not allowed"}))
+
+        branch = req.args.get("branch", [""])[0]
+        categories = [c for c in req.args.get("category", []) if c]
+        if not branch or not categories:
+            req.setResponseCode(400)
+            defer.returnValue(json.dumps(
+                    {"error": "A branch and a category are needed"}))
+
+        master = self.getBuildmaster(req)
+        schedulers = dict([(scheduler.name, scheduler)
+                           for scheduler in master.allSchedulers()])
+        try:
+            forceSchedulers = [schedulers["force-" + category]
+                               for category in categories]
+        except KeyError, e:
+            req.setResponseCode(404)
+            defer.returnValue(json.dumps(
+                    {"error": "No such scheduler: %s" % (e.args[0],)}))
+
+        owner = authz.getUsername(req)
+        reason = "The web-page 'force branch' button was pressed by '%s'" % (
+            owner,)
+        buildsets = []
+        builders = []
+        for scheduler, builderNames in groupForceSchedulers(forceSchedulers):
+            properties = Properties()
+            for parameter in scheduler.forcedProperties:
+                properties.setProperty(parameter.name, parameter.default,
+                                       "Force Build Form")
+            properties.setProperty("reason", reason, "Force Build Form")
+            properties.setProperty("owner", owner, "Force Build Form")
+            # A source stamp of the latest revision of the branch, as the
+            # force build form makes when no revision is given.
+            bsid, brids = yield scheduler.addBuildsetForLatest(
+                reason=reason, branch=branch,
+                repository=scheduler.repository.default,
+                project=scheduler.project.default,
+                builderNames=builderNames, properties=properties)
+            buildsets.append(bsid)
+            builders.extend(builderNames)
+        defer.returnValue(json.dumps(
+                {"branch": branch, "buildsets": buildsets,
+                 "builders": builders}))
+
+
 
 class TwistedWebStatus(html.WebStatus):
     def __init__(self, **kwargs):
         html.WebStatus.__init__(self, **kwargs)
-        self.putChild("boxes-supported", TenBoxesPerBuilder(categories=['supported']))
-        self.putChild("boxes-unsupported", TenBoxesPerBuilder(categories=['unsupported']))
-        self.putChild("boxes-all", TenBoxesPerBuilder(categories=['supported', 'unsupported']))
-        self.putChild("boxes-pyopenssl", TenBoxesPerBuilder(categories=['pyopenssl']))
+        self.boxesCache = BoxesCache()
+        self.branchSummaries = BranchSummaries()
+        for name, categories in [
+                ("boxes-supported", ['supported']),
+                ("boxes-unsupported", ['unsupported']),
+                ("boxes-all", ['supported', 'unsupported']),
+                ("boxes-pyopenssl", ['pyopenssl']),
+                ]:
+            self.putChild(name, TenBoxesPerBuilder(
+                    categories=categories, cache=self.boxesCache,
+                    summaries=self.branchSummaries))
         self.putChild("supported", WaterfallStatusResource(categories=['supported']))
         self.putChild("waterfall", WaterfallStatusResource(categories=['supported', 'unsupported']))
         self.putChild("waterfall-pyopenssl", WaterfallStatusResource(categories=['pyopenssl']))
+        self.putChild("lint-results", LintResults())
+        self.putChild("force-branch", ForceBranch())
+
+        # Buildbot's own grids are too expensive
+        # (http://trac.buildbot.net/ticket/2268), so use ones that are kept
+        # up to date as builds finish.
+        self.grid = GridModel()
+        self.putChild("grid", RevisionGrid(self.grid))
+        self.putChild("tgrid", RevisionGrid(self.grid, transposed=True))
+
+
+    def setServiceParent(self, parent):
+        html.WebStatus.setServiceParent(self, parent)
+        self.branchSummaries.load(
+            os.path.join(self.master.basedir, BranchSummaries.filename))
+        self.grid.load(os.path.join(self.master.basedir, GridModel.filename))
+        for receiver in self._receivers():
+            self.getStatus().subscribe(receiver)
+
+
+    def disownServiceParent(self):
+        for receiver in self._receivers():
+            receiver.stopWatching(self.getStatus())
+        return html.WebStatus.disownServiceParent(self)
+
+
+    def stopService(self):
+        self.branchSummaries.save()
+        self.grid.save()
+        return html.WebStatus.stopService(self)
+
 
-        # These are are expensive, so disable them
-        # http://trac.buildbot.net/ticket/2268
-        self.putChild("grid", Redirect("boxes-supported"))
-        self.putChild("tgrid", Redirect("boxes-supported"))
+    def _receivers(self):
+        return [self.boxesCache, self.branchSummaries, self.grid]